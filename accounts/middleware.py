@@ -0,0 +1,138 @@
+"""
+Authentication with a per-process cache of resolved users.
+
+CachedAuthenticationMiddleware replaces Django's AuthenticationMiddleware.
+``request.user`` is resolved the same way (the session's user id, the
+backend, and the session auth hash verified against the user), but a user
+loaded for a session is kept for AUTH_USER_CACHE_TIMEOUT seconds, keyed by
+user id, backend and the session's auth hash, so the following requests of
+that session skip the user query.
+
+A user only enters the cache after Django verified the session's hash. A
+save or delete of the user (a password or profile change, deactivation)
+drops their entries in the process that made it (see accounts.signals);
+other processes keep serving the old user until the entry expires, so
+keep the timeout short. Logging out flushes the session, which then has no
+user to look up. With a timeout of 0 the middleware behaves exactly like
+Django's.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+
+
+# Sessions cached per process at most
+MAX_CACHED_USERS = 10000
+
+
+class UserCache:
+    """Thread-safe LRU of users with an expiry per entry."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, user = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        # Requests may change their user; never hand out the cached instance
+        return copy.copy(user)
+
+    def set(self, key, user, timeout):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, copy.copy(user))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def forget(self, user_id):
+        """Drop every entry of ``user_id``."""
+        user_id = str(user_id)
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache(MAX_CACHED_USERS)
+
+
+def cache_key(user_id, backend, session_hash):
+    if user_id is None or backend is None or not session_hash:
+        return None
+    return (str(user_id), backend, session_hash)
+
+
+def session_cache_key(session):
+    return cache_key(session.get(SESSION_KEY), session.get(BACKEND_SESSION_KEY), session.get(HASH_SESSION_KEY))
+
+
+async def asession_cache_key(session):
+    return cache_key(
+        await session.aget(SESSION_KEY),
+        await session.aget(BACKEND_SESSION_KEY),
+        await session.aget(HASH_SESSION_KEY),
+    )
+
+
+def get_user(request):
+    timeout = settings.AUTH_USER_CACHE_TIMEOUT
+    key = session_cache_key(request.session) if timeout else None
+    user = user_cache.get(key) if key else None
+    if user is None:
+        user = auth.get_user(request)
+        # Verifying the hash against a fallback secret rotates it
+        key = session_cache_key(request.session) if timeout else None
+        if key and user.is_authenticated:
+            user_cache.set(key, user, timeout)
+    return user
+
+
+async def aget_user(request):
+    timeout = settings.AUTH_USER_CACHE_TIMEOUT
+    key = await asession_cache_key(request.session) if timeout else None
+    user = user_cache.get(key) if key else None
+    if user is None:
+        user = await auth.aget_user(request)
+        key = await asession_cache_key(request.session) if timeout else None
+        if key and user.is_authenticated:
+            user_cache.set(key, user, timeout)
+    return user
+
+
+def get_request_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = get_user(request)
+    return request._cached_user
+
+
+async def aget_request_user(request):
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await aget_user(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_request_user(request))
+        request.auser = partial(aget_request_user, request)
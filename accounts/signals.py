@@ -0,0 +1,18 @@
+"""
+Signals for user writes.
+
+A saved or deleted user is dropped from this process's cache of resolved
+users (``accounts.middleware``), so a password change, deactivation or
+profile edit is seen by the next request.
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .middleware import user_cache
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    user_cache.forget(instance.pk)
@@ -1,3 +1,69 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from .middleware import user_cache
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='alice', email='alice@example.com', password='test-password',
+        )
+        self.client.login(username='alice', password='test-password')
+        self.url = reverse('contacts:api_contact_stats')
+
+    def user_queries(self):
+        """Requests the page; returns its status and the number of user queries."""
+        with CaptureQueriesContext(connection) as queries:
+            status = self.client.get(self.url).status_code
+        return status, sum('"accounts_user"' in query['sql'] for query in queries)
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=60)
+    def test_later_requests_reuse_the_user(self):
+        self.assertEqual(self.user_queries(), (200, 1))
+        self.assertEqual(self.user_queries(), (200, 0))
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_timeout_zero_loads_the_user_every_time(self):
+        self.assertEqual(self.user_queries(), (200, 1))
+        self.assertEqual(self.user_queries(), (200, 1))
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=60)
+    def test_password_change_logs_other_sessions_out(self):
+        self.assertEqual(self.user_queries()[0], 200)
+        self.user.set_password('new-password')
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=60)
+    def test_deactivation_is_seen_by_the_next_request(self):
+        self.assertEqual(self.user_queries()[0], 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=60)
+    def test_cached_user_is_not_shared_between_requests(self):
+        self.client.get(self.url)
+        key = next(iter(user_cache.entries))
+        first, second = user_cache.get(key), user_cache.get(key)
+        first.first_name = 'Changed'
+        self.assertNotEqual(second.first_name, 'Changed')
+        self.assertNotEqual(user_cache.get(key).first_name, 'Changed')
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+class SignedCookieSessionTests(TestCase):
+    def test_login_and_logout(self):
+        get_user_model().objects.create_user(username='bob', email='bob@example.com', password='test-password')
+        response = self.client.post(reverse('accounts:login'), {'username': 'bob', 'password': 'test-password'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.get(reverse('contacts:contact_list')).status_code, 200)
+
+        self.client.post(reverse('accounts:logout'))
+        response = self.client.get(reverse('contacts:contact_list'))
+        self.assertEqual(response.status_code, 302)
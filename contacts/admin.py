@@ -1,16 +1,124 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR
+from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.http import StreamingHttpResponse
+from django.utils.functional import cached_property
+
+from .exporters import stream_export
+from .formats import EXPORT_FIELDS, EXPORT_HEADER, CSVFormat, export_row
 from .models import Contact
+from .search import search_contacts
+
+
+def estimated_count(model, using='default'):
+    """
+    The planner's estimate of the number of rows of ``model``: PostgreSQL's
+    ``pg_class.reltuples`` (kept current by autovacuum) or SQLite's
+    ``sqlite_stat1`` (written by ANALYZE). None when there is no estimate.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            # -1 until the table is first analyzed
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            try:
+                # The first number of each index's stat is the table's row count
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            except DatabaseError:
+                return None
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator reporting the planner's estimate for the unfiltered changelist
+    of a large table, instead of counting every row on every page. Filtered
+    changelists (owner, search, favorites) are counted exactly, from their
+    indexes.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.CONTACTS_ADMIN_ESTIMATED_COUNT_MIN:
+                return estimate
+        return super().count
+
+
+class OwnerFilter(admin.SimpleListFilter):
+    """
+    Filter by owner without listing every account: the sidebar has a search
+    box backed by the admin's user autocomplete, and only the selected owner
+    is listed.
+    """
+    title = 'owner'
+    parameter_name = 'owner'
+    template = 'admin/contacts/owner_filter.html'
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if not value or not value.isdigit():
+            return []
+        return [(str(user.pk), str(user)) for user in get_user_model().objects.filter(pk=value)]
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        if not value.isdigit():
+            raise IncorrectLookupParameters(f'Invalid owner: {value}')
+        return queryset.filter(user_id=value)
+
+
+class OwnerCSVFormat(CSVFormat):
+    """The user export's CSV with the owner's username in front."""
+    fields = ('user__username', *EXPORT_FIELDS)
+
+    def header(self):
+        return self.writer.writerow(['Owner', *EXPORT_HEADER])
+
+    def record(self, values):
+        return self.writer.writerow([values[0], *export_row(values[1:])])
 
 
 @admin.register(Contact)
 class ContactAdmin(admin.ModelAdmin):
-    """Contact admin configuration."""
+    """
+    Contact admin configuration. Built for large tables: owners are joined
+    rather than fetched per row and picked with autocompletes, the
+    unfiltered changelist shows an estimated count, search uses the search
+    index and exports stream.
+    """
     list_display = ['name', 'phone', 'email', 'company', 'is_favorite', 'user', 'created_at']
-    list_filter = ['is_favorite', 'created_at', 'user']
+    list_filter = ['is_favorite', 'created_at', OwnerFilter]
+    list_select_related = ['user']
     search_fields = ['name', 'phone', 'email', 'company']
     readonly_fields = ['created_at', 'updated_at']
     list_editable = ['is_favorite']  # Allow quick toggle from list view
-    
+    autocomplete_fields = ['user']
+    # Newest first, read from the primary key instead of sorting the table
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['export_csv']
+
     fieldsets = (
         ('Contact Information', {
             'fields': ('name', 'phone', 'email', 'company', 'notes')
@@ -26,3 +134,20 @@ class ContactAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Use the full-text search index instead of OR-ed icontains lookups."""
+        results = search_contacts(queryset, search_term)
+        # Rank matches unless a column sort was chosen
+        if search_term.strip() and ORDER_VAR not in request.GET:
+            results = results.order_by('-search_rank', *results.query.order_by)
+        return results, False
+
+    @admin.action(description='Export selected contacts as CSV', permissions=['view'])
+    def export_csv(self, request, queryset):
+        """Stream the selection (or every match, with "select all") as CSV."""
+        response = StreamingHttpResponse(
+            stream_export(queryset.order_by('pk'), OwnerCSVFormat()), content_type='text/csv',
+        )
+        response['Content-Disposition'] = 'attachment; filename="zenvio_contacts_admin.csv"'
+        return response
@@ -0,0 +1,326 @@
+"""
+JSON API for contacts.
+
+    GET     api/contacts/                  list, cursor paginated
+    POST    api/contacts/                  create
+    GET     api/contacts/stats/            per-user counters
+    GET     api/contacts/sync/             changes since a sync token, CSV or NDJSON
+    GET     api/contacts/<pk>/             detail
+    PUT     api/contacts/<pk>/             replace
+    PATCH   api/contacts/<pk>/             partial update
+    DELETE  api/contacts/<pk>/             delete
+    POST    api/contacts/<pk>/favorite/    toggle favorite
+    POST    api/contacts/bulk/             bulk favorite/unfavorite/delete/set_company
+
+Requests use the session login and CSRF protection of the HTML views.
+``?fields=name,phone`` limits both the columns read and the keys returned.
+
+GET responses carry a strong ETag built from the ids and ``updated_at`` of
+the rows in the response, so a matching ``If-None-Match`` gets a 304 before
+anything is serialized. Writes honour ``If-Match`` to avoid lost updates.
+
+With CONTACTS_ASYNC_VIEWS the read paths are served by the async
+subclasses in contacts.async_views.
+"""
+import json
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.forms.models import model_to_dict
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.views.generic import View
+
+from .bulk import BulkActionError, apply_bulk_action, select_contacts
+from .conditional import make_etag
+from .forms import ContactForm
+from .models import Contact
+from .pagination import CursorPaginator, InvalidCursor
+from .search import search_filter
+from .stats import get_contact_stats
+from . import sync
+
+
+API_FIELDS = (
+    'id', 'name', 'phone', 'email', 'company', 'notes',
+    'is_favorite', 'created_at', 'updated_at',
+)
+# Always loaded: ETags need id/updated_at, cursors need the list order keys
+ETAG_FIELDS = ('id', 'updated_at')
+CURSOR_FIELDS = ('is_favorite', 'created_at')
+
+
+class APIError(Exception):
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.payload = {'detail': message, **extra}
+
+
+def serialize(contact, fields):
+    return {field: getattr(contact, field) for field in fields}
+
+
+def contact_etag(contact, fields):
+    return make_etag(fields, contact.pk, contact.updated_at.isoformat())
+
+
+class ContactAPIView(LoginRequiredMixin, View):
+    """Base view: JSON errors, ``?fields=`` parsing and body decoding."""
+
+    def handle_no_permission(self):
+        return JsonResponse({'detail': 'Authentication required.'}, status=401)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except APIError as e:
+            return JsonResponse(e.payload, status=e.status)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = super().http_method_not_allowed(request, *args, **kwargs)
+        return JsonResponse({'detail': 'Method not allowed.'}, status=405, headers={'Allow': response['Allow']})
+
+    def get_fields(self):
+        raw = self.request.GET.get('fields', '')
+        if not raw:
+            return API_FIELDS
+        fields = tuple(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+        unknown = [field for field in fields if field not in API_FIELDS]
+        if unknown:
+            raise APIError(400, f'Unknown fields: {", ".join(unknown)}', allowed=API_FIELDS)
+        return fields
+
+    def get_queryset(self):
+        return Contact.objects.filter(user=self.request.user)
+
+    def get_payload(self):
+        try:
+            payload = json.loads(self.request.body or b'{}')
+        except ValueError:
+            raise APIError(400, 'Request body must be valid JSON.')
+        if not isinstance(payload, dict):
+            raise APIError(400, 'Request body must be a JSON object.')
+        return payload
+
+    def save_contact(self, contact, payload):
+        """Validate ``payload`` like ContactForm and save ``contact``."""
+        data = {field: payload.get(field, '') for field in ContactForm.Meta.fields}
+        form = ContactForm(data=data, instance=contact)
+        errors = form.errors.get_json_data() if not form.is_valid() else {}
+
+        is_favorite = payload.get('is_favorite', contact.is_favorite)
+        if not isinstance(is_favorite, bool):
+            errors['is_favorite'] = [{'message': 'Must be true or false.', 'code': 'invalid'}]
+        if errors:
+            raise APIError(400, 'Invalid contact.', errors=errors)
+
+        form.instance.is_favorite = is_favorite
+        return form.save()
+
+    def contact_response(self, contact, status=200):
+        fields = self.get_fields()
+        response = JsonResponse(serialize(contact, fields), status=status)
+        response['ETag'] = contact_etag(contact, fields)
+        return response
+
+
+class ContactListAPIView(ContactAPIView):
+    """
+    List contacts in list order (favorites first, newest first).
+    ``?search=`` and ``?filter=favorites`` narrow the list without changing
+    its order, so cursors stay valid.
+    """
+    page_size = 50
+    max_page_size = 200
+
+    def get_page_size(self):
+        try:
+            page_size = int(self.request.GET.get('limit', self.page_size))
+        except ValueError:
+            raise APIError(400, 'limit must be an integer.')
+        return max(1, min(page_size, self.max_page_size))
+
+    def page_url(self, cursor):
+        if not cursor:
+            return None
+        params = self.request.GET.copy()
+        params['cursor'] = cursor
+        return f'{self.request.path}?{params.urlencode()}'
+
+    def get_list_queryset(self, fields):
+        queryset = self.get_queryset()
+        if self.request.GET.get('filter') == 'favorites':
+            queryset = queryset.filter(is_favorite=True)
+        search_query = self.request.GET.get('search', '').strip()
+        if search_query:
+            queryset = queryset.filter(search_filter(search_query, queryset.db))
+        return queryset.only(*dict.fromkeys(fields + ETAG_FIELDS + CURSOR_FIELDS))
+
+    def get_paginator(self, fields):
+        return CursorPaginator(self.get_list_queryset(fields), self.get_page_size())
+
+    def list_response(self, page, fields):
+        etag = make_etag(
+            fields,
+            [(contact.pk, contact.updated_at.isoformat()) for contact in page],
+            page.has_next(),
+            page.has_previous(),
+        )
+        not_modified = get_conditional_response(self.request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+
+        response = JsonResponse({
+            'results': [serialize(contact, fields) for contact in page],
+            'next': self.page_url(page.next_cursor),
+            'previous': self.page_url(page.previous_cursor),
+        })
+        response['ETag'] = etag
+        return response
+
+    def get(self, request):
+        fields = self.get_fields()
+        try:
+            page = self.get_paginator(fields).page(request.GET.get('cursor', ''))
+        except InvalidCursor:
+            raise APIError(400, 'Invalid cursor.')
+        return self.list_response(page, fields)
+
+    def post(self, request):
+        contact = self.save_contact(Contact(user=request.user), self.get_payload())
+        response = self.contact_response(contact, status=201)
+        response['Location'] = reverse('contacts:api_contact_detail', args=[contact.pk])
+        return response
+
+
+class ContactDetailAPIView(ContactAPIView):
+    """Read, replace, update or delete one contact."""
+
+    def contact_queryset(self, pk, fields=None):
+        queryset = self.get_queryset()
+        if fields is not None:
+            queryset = queryset.only(*dict.fromkeys(fields + ETAG_FIELDS))
+        return queryset.filter(pk=pk)
+
+    def get_contact(self, pk, fields=None):
+        contact = self.contact_queryset(pk, fields).first()
+        if contact is None:
+            raise APIError(404, 'Contact not found.')
+        return contact
+
+    def check_preconditions(self, contact):
+        """Return a 304/412 response if the request's conditions say so."""
+        etag = contact_etag(contact, self.get_fields())
+        response = get_conditional_response(self.request, etag=etag)
+        if response is not None:
+            response['ETag'] = etag
+        return response
+
+    def get(self, request, pk):
+        contact = self.get_contact(pk, self.get_fields())
+        return self.check_preconditions(contact) or self.contact_response(contact)
+
+    def put(self, request, pk):
+        contact = self.get_contact(pk)
+        return self.check_preconditions(contact) or self.contact_response(
+            self.save_contact(contact, self.get_payload())
+        )
+
+    def patch(self, request, pk):
+        contact = self.get_contact(pk)
+        precondition_failed = self.check_preconditions(contact)
+        if precondition_failed:
+            return precondition_failed
+
+        payload = model_to_dict(contact, fields=ContactForm.Meta.fields + ['is_favorite'])
+        payload.update(self.get_payload())
+        return self.contact_response(self.save_contact(contact, payload))
+
+    def delete(self, request, pk):
+        contact = self.get_contact(pk)
+        precondition_failed = self.check_preconditions(contact)
+        if precondition_failed:
+            return precondition_failed
+
+        contact.delete()
+        return HttpResponse(status=204)
+
+
+class ContactFavoriteAPIView(ContactDetailAPIView):
+    """Toggle a contact's favorite flag."""
+    http_method_names = ['post', 'options']
+
+    def post(self, request, pk):
+        contact = self.get_contact(pk)
+        precondition_failed = self.check_preconditions(contact)
+        if precondition_failed:
+            return precondition_failed
+
+        contact.is_favorite = not contact.is_favorite
+        contact.save(update_fields=['is_favorite', 'updated_at'])
+        return self.contact_response(contact)
+
+
+class ContactStatsAPIView(ContactAPIView):
+    """The user's counters: total, favorites, companies and recent (7 days)."""
+    http_method_names = ['get', 'head', 'options']
+
+    def get(self, request):
+        return JsonResponse(get_contact_stats(request.user))
+
+
+class ContactSyncAPIView(ContactAPIView):
+    """
+    Stream the contacts changed and deleted since ``?since=<sync token>``,
+    or every contact without it, as ``?format=ndjson`` (default) or
+    ``?format=csv``. The token for the next sync is in ``X-Sync-Token``;
+    an expired token gets a 410, after which the client starts over
+    without ``since``. See contacts.sync.
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    def get(self, request):
+        format = request.GET.get('format', 'ndjson')
+        if format not in sync.FORMATS:
+            raise APIError(400, f'Unknown format "{format}".', allowed=list(sync.FORMATS))
+        try:
+            since = sync.decode_token(request.GET['since']) if request.GET.get('since') else None
+            changes = sync.Changes(request.user, since)
+        except sync.InvalidToken:
+            raise APIError(400, 'Invalid sync token.')
+        except sync.ExpiredToken:
+            raise APIError(410, 'Sync token expired; sync again without "since".')
+
+        response = StreamingHttpResponse(sync.stream(changes, format), content_type=sync.FORMATS[format])
+        response['X-Sync-Token'] = changes.token
+        response['X-Sync-Full'] = 'true' if changes.full else 'false'
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+
+class ContactBulkAPIView(ContactAPIView):
+    """
+    Apply ``action`` to the contacts in ``ids``, or to every contact
+    matching ``search``/``filter`` when ``ids`` is omitted::
+
+        {"action": "set_company", "ids": [1, 2, 3], "company": "Acme"}
+        {"action": "favorite", "search": "acme"}
+    """
+    http_method_names = ['post', 'options']
+
+    def post(self, request):
+        payload = self.get_payload()
+        action = payload.get('action')
+        try:
+            contacts = select_contacts(
+                request.user,
+                ids=payload.get('ids'),
+                search=str(payload.get('search') or ''),
+                filter_type=payload.get('filter') or '',
+            )
+            count = apply_bulk_action(request.user, contacts, action, company=payload.get('company', ''))
+        except BulkActionError as e:
+            raise APIError(400, str(e))
+        return JsonResponse({'action': action, 'affected': count})
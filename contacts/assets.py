@@ -0,0 +1,283 @@
+"""
+The static asset build, run by ``collectstatic``.
+
+AssetStorage is WhiteNoise's CompressedManifestStaticFilesStorage: files
+are copied under names fingerprinted with a hash of their content (served
+with ``Cache-Control: immutable``), with gzip and Brotli variants next to
+them. In front of that, the project stylesheets in ASSET_BUILD_CSS are:
+
+- minified;
+- purged: a selector naming a class or id that appears in no template and
+  no project module (form widgets get their classes in Python) is dropped,
+  and so is a rule left without selectors. Classes a template builds
+  (``alert-{{ message.tags }}``) are kept by prefix; classes only scripts
+  add go in ASSET_PURGE_SAFELIST;
+- split for critical CSS: for each page template (one that extends
+  another), the rules its own markup can use, with that of the templates it
+  extends and includes, and of the partials views render for it in Python
+  (ASSET_PAGE_PARTIALS). They are saved as ``<stylesheet>.critical.json``,
+  which ``{% stylesheet %}`` (contacts/templatetags/assets.py) inlines
+  before loading the whole stylesheet without blocking rendering.
+
+Before collectstatic has run (development, tests, benchmarks) there is no
+manifest and static URLs are the plain file names, as with Django's
+StaticFilesStorage.
+"""
+import functools
+import json
+import posixpath
+import re
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from django.template import engines
+from django.template.loader import get_template
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+# Quoted strings (kept verbatim) and comments (dropped)
+STRING_OR_COMMENT = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+PLACEHOLDER = re.compile(r'\x00(\d+)\x00')
+# At-rules holding rules to purge; other at-rules (@keyframes, @font-face) are kept
+GROUPING_RULES = ('@media', '@supports', '@layer', '@container')
+# Attribute selectors and pseudo-class arguments: :not(.x) doesn't need .x
+SELECTOR_IGNORED = re.compile(r'\[[^\]]*\]|\([^)]*\)')
+SELECTOR_NAME = re.compile(r'[.#](-?[_a-zA-Z][\w-]*)')
+TOKEN = re.compile(r'[\w-]+')
+# A class name completed by the template or a script: alert-{{ ... }}, 'alert-' + ...
+DYNAMIC_PREFIX = re.compile(r'''([\w-]+-)(?:\{\{|\{%|['"]\s*\+)''')
+TEMPLATE_REFERENCE = re.compile(r'''\{%\s*(?:extends|include)\s+["']([^"']+)["']''')
+# Whose critical CSS pages without their own get
+BASE_TEMPLATE = 'base.html'
+
+
+def minify(css):
+    """``css`` without comments and without whitespace that doesn't change its meaning."""
+    strings = []
+
+    def protect(match):
+        if match.group(1) is None:
+            return ''
+        strings.append(match.group(1))
+        return f'\x00{len(strings) - 1}\x00'
+
+    css = STRING_OR_COMMENT.sub(protect, css)
+    css = re.sub(r'\s+', ' ', css)
+    # Not around + and -, which calc() needs spaced
+    css = re.sub(r' ?([{};,>]) ?', r'\1', css)
+    css = css.replace(': ', ':').replace(';}', '}')
+    return PLACEHOLDER.sub(lambda match: strings[int(match.group(1))], css).strip()
+
+
+def parse(css):
+    """``(prelude, body)`` per top-level rule of ``css``; body is None for statements (@import)."""
+    rules = []
+    start = prelude_end = 0
+    depth, quote = 0, None
+    for i, char in enumerate(css):
+        if quote:
+            if char == quote and css[i - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            if not depth:
+                prelude_end = i
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if not depth:
+                rules.append((css[start:prelude_end].strip(), css[prelude_end + 1:i]))
+                start = i + 1
+        elif char == ';' and not depth:
+            rules.append((css[start:i + 1].strip(), None))
+            start = i + 1
+    return rules
+
+
+def serialize(rules):
+    return ''.join(prelude if body is None else f'{prelude}{{{body}}}' for prelude, body in rules)
+
+
+def split_selectors(prelude):
+    """The selectors of a selector list, leaving commas inside :is(...) alone."""
+    selectors, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and not depth:
+            selectors.append(prelude[start:i])
+            start = i + 1
+    selectors.append(prelude[start:])
+    return selectors
+
+
+class Vocabulary:
+    """The class names and ids some templates and modules can put in a page."""
+
+    def __init__(self, texts, safelist=()):
+        self.tokens = set(safelist)
+        prefixes = set()
+        for text in texts:
+            self.tokens.update(TOKEN.findall(text))
+            prefixes.update(DYNAMIC_PREFIX.findall(text))
+        self.prefixes = tuple(prefixes)
+
+    def __contains__(self, name):
+        return name in self.tokens or name.startswith(self.prefixes)
+
+    def matches(self, selector):
+        """Whether every class and id ``selector`` requires is known."""
+        names = SELECTOR_NAME.findall(SELECTOR_IGNORED.sub('', selector))
+        return all(name in self for name in names)
+
+
+def purge(css, vocabulary, keep_at_rules=True):
+    """
+    The minified ``css`` without the selectors ``vocabulary`` can't match,
+    nor the rules and groups left empty. ``keep_at_rules=False`` also drops
+    at-rules that aren't groups (@keyframes, @font-face, @import).
+    """
+    kept = []
+    for prelude, body in parse(css):
+        if prelude.startswith(GROUPING_RULES):
+            body = purge(body, vocabulary, keep_at_rules)
+            if body:
+                kept.append((prelude, body))
+        elif prelude.startswith('@') or body is None:
+            if keep_at_rules:
+                kept.append((prelude, body))
+        else:
+            selectors = [selector for selector in split_selectors(prelude) if vocabulary.matches(selector)]
+            if selectors:
+                kept.append((','.join(selectors), body))
+    return serialize(kept)
+
+
+def template_files():
+    """Every file in the template directories of the template engines, apps' included."""
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for path in sorted(Path(directory).rglob('*')):
+                if path.is_file():
+                    yield path
+
+
+def project_modules():
+    """The Python modules of the project's own apps, tests aside (they render nothing)."""
+    base = Path(settings.BASE_DIR).resolve()
+    for app in apps.get_app_configs():
+        path = Path(app.path).resolve()
+        if base in path.parents:
+            yield from (
+                module for module in sorted(path.rglob('*.py'))
+                if module.name != 'tests.py' and not module.name.startswith('test_')
+            )
+
+
+def read(path):
+    return path.read_text(encoding='utf-8', errors='replace')
+
+
+def template_sources(name, seen=None):
+    """
+    The source of template ``name`` and of the templates it extends,
+    includes and has rendered for it (ASSET_PAGE_PARTIALS).
+    """
+    seen = set() if seen is None else seen
+    if name in seen:
+        return []
+    seen.add(name)
+    source = get_template(name).template.source
+    sources = [source]
+    for reference in [*TEMPLATE_REFERENCE.findall(source), *settings.ASSET_PAGE_PARTIALS.get(name, ())]:
+        sources.extend(template_sources(reference, seen))
+    return sources
+
+
+def page_templates():
+    """Names of the project's page templates: those extending another one, and what they extend."""
+    names = set()
+    for directory in settings.TEMPLATES[0]['DIRS']:
+        for path in Path(directory).rglob('*.html'):
+            source = read(path)
+            if '{% extends' in source:
+                names.add(path.relative_to(directory).as_posix())
+                names.update(re.findall(r'''\{%\s*extends\s+["']([^"']+)["']''', source))
+    return sorted(names)
+
+
+def critical_name(name):
+    return f'{posixpath.splitext(name)[0]}.critical.json'
+
+
+def build_css(source):
+    """``(css, critical)``: the minified, purged stylesheet and its critical CSS per page template."""
+    modules = [read(path) for path in project_modules()]
+    safelist = settings.ASSET_PURGE_SAFELIST
+    css = purge(minify(source), Vocabulary([*map(read, template_files()), *modules], safelist))
+    critical = {
+        page: purge(css, Vocabulary([*template_sources(page), *modules], safelist), keep_at_rules=False)
+        for page in page_templates()
+    }
+    return css, critical
+
+
+class AssetStorage(CompressedManifestStaticFilesStorage):
+    """
+    Fingerprinted, precompressed static files, with the ASSET_BUILD_CSS
+    stylesheets built first (see the module docstring).
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            # collectstatic hasn't run
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            paths = dict(paths)
+            for name in settings.ASSET_BUILD_CSS:
+                if name in paths:
+                    storage, path = paths[name]
+                    with storage.open(path) as source:
+                        css, critical = build_css(source.read().decode('utf-8'))
+                    self.replace(name, css)
+                    self.replace(critical_name(name), json.dumps(critical))
+                    # Fingerprint the built file rather than the source
+                    paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run, **options)
+
+    def replace(self, name, content):
+        if self.exists(name):
+            self.delete(name)
+        self._save(name, ContentFile(content.encode('utf-8')))
+
+
+@functools.lru_cache(maxsize=None)
+def load_critical(path):
+    try:
+        with open(path, encoding='utf-8') as critical:
+            return json.load(critical)
+    except FileNotFoundError:
+        return None
+
+
+def critical_css(name, template_name):
+    """
+    The critical CSS of stylesheet ``name`` for page ``template_name`` (the
+    base template's when the page has none), or None before collectstatic.
+    """
+    pages = load_critical(staticfiles_storage.path(critical_name(name)))
+    if not pages:
+        return None
+    css = pages.get(template_name)
+    if css is None:
+        css = pages.get(BASE_TEMPLATE)
+    return css
@@ -0,0 +1,200 @@
+"""
+Async versions of the contacts hot paths, used instead of the sync views
+when CONTACTS_ASYNC_VIEWS is on. Serve the project with an ASGI server
+(``uvicorn zenvio.asgi:application``) to benefit: reads go through the
+async ORM, so a worker keeps serving other requests while one waits on
+the database or on a slow client, without a thread hop per view.
+
+Each class subclasses the sync view and only replaces the parts that do
+I/O; writes that run model signals in a transaction (create, update,
+delete) are handed to the sync implementation with ``sync_to_async``.
+Under WSGI keep the setting off: every async view would then be run
+through ``async_to_sync``.
+"""
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404
+
+from . import render_cache
+from .api import (
+    APIError,
+    ContactDetailAPIView,
+    ContactFavoriteAPIView,
+    ContactListAPIView,
+    ContactStatsAPIView,
+)
+from .exporters import agzip_stream, astream_export
+from .models import Contact
+from .pagination import CursorPaginator, InvalidCursor
+from .search import asearch_index_kind
+from .stats import aget_contact_stats
+from .suggest import asuggest
+from .views import (
+    ContactDetailView,
+    ContactListView,
+    ContactSuggestView,
+    ExportContactsView,
+    ToggleFavoriteView,
+)
+
+
+class AsyncLoginRequiredMixin:
+    """
+    Load the user with ``request.auser()`` before LoginRequiredMixin checks
+    it, so the check does not hit the database from the event loop.
+    """
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        response = super().dispatch(request, *args, **kwargs)
+        # A redirect (or 401) from handle_no_permission is not awaitable
+        return await response if inspect.isawaitable(response) else response
+
+
+class AsyncContactListView(AsyncLoginRequiredMixin, ContactListView):
+    async def get(self, request, *args, **kwargs):
+        version = await render_cache.alist_version(request.user.pk)
+        # Messages may be stored in the session
+        has_messages = await sync_to_async(render_cache.has_pending_messages)(request)
+        not_modified = self.prepare_caching(version, has_messages)
+        if not_modified is not None:
+            return not_modified
+
+        html = await render_cache.aget_page(self.page_cache_key) if self.page_cache_key else None
+        if html is not None:
+            return self.cached_response(html)
+        # Building a search filter needs the index kind, checked once per process
+        await asearch_index_kind(Contact.objects.db)
+        self.object_list = self.get_queryset()
+        self.page = await self.apaginate_queryset(self.object_list, self.get_paginate_by(self.object_list))
+        self.stats = await aget_contact_stats(request.user)
+        return self.cache_response(self.render_to_response(self.get_context_data()))
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """Async ListView.paginate_queryset(): one COUNT and one page query."""
+        if self.get_pagination_mode() == 'cursor':
+            paginator = CursorPaginator(queryset, page_size)
+            try:
+                page = await paginator.apage(self.request.GET.get('cursor', ''))
+            except InvalidCursor:
+                raise Http404('Invalid cursor.')
+            return (paginator, page, page.object_list, page.has_other_pages())
+
+        paginator = self.get_paginator(queryset, page_size, allow_empty_first_page=self.get_allow_empty())
+        # Paginator.count is a cached property; fill it so page() runs no query
+        paginator.count = await queryset.acount()
+        number = self.request.GET.get(self.page_kwarg) or 1
+        try:
+            page = paginator.page(paginator.num_pages if number == 'last' else int(number))
+        except (ValueError, InvalidPage):
+            raise Http404('Invalid page.')
+        page.object_list = [contact async for contact in page.object_list]
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.page
+
+    def get_stats(self):
+        return self.stats
+
+
+class AsyncContactDetailView(AsyncLoginRequiredMixin, ContactDetailView):
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(self.get_queryset(), pk=kwargs['pk'])
+        has_messages = await sync_to_async(render_cache.has_pending_messages)(request)
+        return self.conditional_render(self.get_validators(has_messages))
+
+
+class AsyncToggleFavoriteView(AsyncLoginRequiredMixin, ToggleFavoriteView):
+    async def post(self, request, pk):
+        contact = await aget_object_or_404(Contact, pk=pk, user=request.user)
+        contact.is_favorite = not contact.is_favorite
+        await contact.asave(update_fields=['is_favorite', 'updated_at'])
+        return self.toggled_response(request, contact)
+
+
+class AsyncExportContactsView(AsyncLoginRequiredMixin, ExportContactsView):
+    async def get(self, request):
+        format = self.get_format()
+        compression = self.get_compression()
+        content = astream_export(self.get_export_queryset(), format)
+        if compression:
+            content = agzip_stream(content)
+        if not self.use_streaming():
+            content = [chunk async for chunk in content]
+        return self.export_response(content, format, compression)
+
+
+class AsyncContactSuggestView(AsyncLoginRequiredMixin, ContactSuggestView):
+    async def get(self, request):
+        query = self.get_query()
+        return self.suggest_response(query, await asuggest(request.user.pk, query))
+
+
+class AsyncAPIMixin(AsyncLoginRequiredMixin):
+    """Async counterpart of ContactAPIView's error handling."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except APIError as e:
+            return JsonResponse(e.payload, status=e.status)
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return JsonResponse(
+            {'detail': 'Method not allowed.'}, status=405, headers={'Allow': ', '.join(self._allowed_methods())}
+        )
+
+    async def aget_contact(self, pk, fields=None):
+        contact = await self.contact_queryset(pk, fields).afirst()
+        if contact is None:
+            raise APIError(404, 'Contact not found.')
+        return contact
+
+
+class AsyncContactListAPIView(AsyncAPIMixin, ContactListAPIView):
+    async def get(self, request):
+        await asearch_index_kind(Contact.objects.db)
+        fields = self.get_fields()
+        try:
+            page = await self.get_paginator(fields).apage(request.GET.get('cursor', ''))
+        except InvalidCursor:
+            raise APIError(400, 'Invalid cursor.')
+        return self.list_response(page, fields)
+
+    async def post(self, request):
+        return await sync_to_async(super().post)(request)
+
+
+class AsyncContactDetailAPIView(AsyncAPIMixin, ContactDetailAPIView):
+    async def get(self, request, pk):
+        contact = await self.aget_contact(pk, self.get_fields())
+        return self.check_preconditions(contact) or self.contact_response(contact)
+
+    async def put(self, request, pk):
+        return await sync_to_async(super().put)(request, pk)
+
+    async def patch(self, request, pk):
+        return await sync_to_async(super().patch)(request, pk)
+
+    async def delete(self, request, pk):
+        return await sync_to_async(super().delete)(request, pk)
+
+
+class AsyncContactFavoriteAPIView(AsyncAPIMixin, ContactFavoriteAPIView):
+    async def post(self, request, pk):
+        contact = await self.aget_contact(pk)
+        precondition_failed = self.check_preconditions(contact)
+        if precondition_failed:
+            return precondition_failed
+
+        contact.is_favorite = not contact.is_favorite
+        await contact.asave(update_fields=['is_favorite', 'updated_at'])
+        return self.contact_response(contact)
+
+
+class AsyncContactStatsAPIView(AsyncAPIMixin, ContactStatsAPIView):
+    async def get(self, request):
+        return JsonResponse(await aget_contact_stats(request.user))
@@ -0,0 +1,1299 @@
+"""
+Benchmark scenarios for ``manage.py benchmark``.
+
+Each scenario is registered with ``@scenario`` and receives the parsed
+command options. It returns a list of result rows (dicts) that the command
+prints as a table or as JSON.
+
+Data is generated from a fixed seed, so two runs on different commits
+measure the same contacts.
+"""
+import asyncio
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.staticfiles import finders
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.db import OperationalError, connections
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .charsets import open_text
+from .importers import ContactImporter
+from .jobs import READ_CHUNK_SIZE
+from .models import Contact
+from .pagination import CursorPaginator, encode_cursor
+from .search import icontains_filter, search_contacts
+from .signals import contacts_bulk_created
+from . import suggest
+
+
+SCENARIOS = {}
+
+FIRST_NAMES = ['Aarav', 'Maya', 'Liam', 'Zara', 'Noah', 'Isha', 'Omar', 'Elena', 'Kenji', 'Priya']
+LAST_NAMES = ['Sharma', 'Smith', 'Garcia', 'Chen', 'Okafor', 'Rossi', 'Kim', 'Patel', 'Novak', 'Silva']
+COMPANIES = ['Acme Inc', 'Globex', 'Initech', 'Umbrella', 'Stark Industries', 'Wayne Enterprises', '']
+
+
+def scenario(name, help=''):
+    """Register a benchmark scenario under ``name``."""
+    def decorator(func):
+        func.help = help
+        SCENARIOS[name] = func
+        return func
+    return decorator
+
+
+def fake_contact_rows(count, seed=0):
+    """Yield ``count`` deterministic CSV rows that pass ContactForm validation."""
+    rng = random.Random(seed)
+    for i in range(count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        yield {
+            'Name': f'{first} {last} {i}',
+            'Phone': f'+1{rng.randrange(10 ** 9, 10 ** 10)}',
+            'Email': f'{first.lower()}.{last.lower()}{i}@example.com',
+            'Company': rng.choice(COMPANIES),
+            'Notes': 'Generated by benchmark' if i % 3 == 0 else '',
+        }
+
+
+def fake_csv(count, seed=0):
+    """Return a CSV document with a header row and ``count`` contacts."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(ContactImporter.COLUMNS))
+    writer.writeheader()
+    writer.writerows(fake_contact_rows(count, seed))
+    return buffer.getvalue()
+
+
+@contextmanager
+def bench_user():
+    """Create a throwaway user for one benchmark run and remove it afterwards."""
+    tag = uuid.uuid4().hex[:12]
+    user = get_user_model().objects.create_user(
+        username=f'bench-{tag}',
+        email=f'bench-{tag}@example.com',
+    )
+    try:
+        yield user
+    finally:
+        user.delete()
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (0 if unavailable)."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (0 if unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(conn, func, args):
+    try:
+        conn.send(func(*args))
+    finally:
+        connections.close_all()
+        conn.close()
+
+
+def run_isolated(func, *args):
+    """
+    Run ``func(*args)`` in a forked child so its peak RSS is measured alone.
+    Falls back to running in-process where fork is unavailable.
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return func(*args)
+
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(child_conn, func, args))
+    process.start()
+    result = parent_conn.recv()
+    process.join()
+    return result
+
+
+def seed_contacts(user, count, seed=0, batch_size=5000):
+    """
+    Insert ``count`` generated contacts for ``user`` with ``bulk_create``.
+    Rows skip form validation (they are valid by construction); about one
+    in ten is a favorite.
+    """
+    rng = random.Random(seed)
+    batch = []
+    for row in fake_contact_rows(count, seed):
+        contact = Contact(user=user, is_favorite=rng.random() < 0.1, **{
+            field: row[column] for column, (field, _) in ContactImporter.COLUMNS.items()
+        })
+        contact.normalize()
+        batch.append(contact)
+        if len(batch) >= batch_size:
+            _insert_contacts(user, batch)
+            batch = []
+    if batch:
+        _insert_contacts(user, batch)
+    return count
+
+
+def _insert_contacts(user, contacts):
+    contacts = Contact.objects.bulk_create(contacts)
+    contacts_bulk_created.send(sender=Contact, user=user, contacts=contacts)
+
+
+def seed_users(count, per_user, prefix='seed', seed=0, password=None):
+    """
+    Create ``count`` users named ``<prefix>-<n>`` with ``per_user``
+    contacts each. All users share one password hash, so creating them
+    does not cost a key derivation each; without ``password`` they can't
+    log in with a password at all.
+    """
+    password_hash = make_password(password)
+    users = get_user_model().objects.bulk_create([
+        get_user_model()(
+            username=f'{prefix}-{n}',
+            email=f'{prefix}-{n}@example.com',
+            password=password_hash,
+        )
+        for n in range(count)
+    ])
+    for n, user in enumerate(users):
+        seed_contacts(user, per_user, seed=seed + n)
+    return users
+
+
+@scenario('import', 'CSV import throughput in rows/sec')
+def import_scenario(options):
+    results = []
+    for size in options['sizes']:
+        text = fake_csv(size)
+        modes = ['bulk', 'per-row'] if options['baseline'] else ['bulk']
+
+        for mode in modes:
+            with bench_user() as user:
+                reader = csv.DictReader(io.StringIO(text))
+                start = time.perf_counter()
+                if mode == 'bulk':
+                    imported = ContactImporter(user, batch_size=options['batch_size']).run(reader).imported_count
+                else:
+                    imported = 0
+                    for row in reader:
+                        Contact.objects.create(
+                            user=user,
+                            name=row['Name'],
+                            phone=row['Phone'],
+                            email=row['Email'],
+                            company=row['Company'],
+                            notes=row['Notes'],
+                        )
+                        imported += 1
+                elapsed = time.perf_counter() - start
+
+            results.append({
+                'mode': mode,
+                'rows': size,
+                'imported': imported,
+                'seconds': round(elapsed, 3),
+                'rows_per_sec': round(size / elapsed) if elapsed else 0,
+            })
+    return results
+
+
+def _measure_export(user_id, streaming):
+    from .views import ExportContactsView
+
+    request = RequestFactory().get('/contacts/export/')
+    request.user = get_user_model().objects.get(pk=user_id)
+    rss_before = current_rss_mb()
+
+    start = time.perf_counter()
+    response = ExportContactsView.as_view(streaming=streaming)(request)
+    chunks = iter(response) if streaming else iter([response.content])
+    size = len(next(chunks))
+    first_byte = time.perf_counter() - start
+    for chunk in chunks:
+        size += len(chunk)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'ttfb_ms': round(first_byte * 1000, 1),
+        'total_ms': round(elapsed * 1000, 1),
+        'bytes': size,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_growth_mb': round(max(peak_rss_mb() - rss_before, 0), 1),
+    }
+
+
+@scenario('export', 'CSV export time-to-first-byte and peak RSS, streaming vs buffered')
+def export_scenario(options):
+    results = []
+    for size in options['sizes']:
+        with bench_user() as user:
+            seed_contacts(user, size)
+            for streaming in (True, False):
+                row = {'mode': 'streaming' if streaming else 'buffered', 'rows': size}
+                row.update(run_isolated(_measure_export, user.pk, streaming))
+                results.append(row)
+    return results
+
+
+def _measure_format(user_id, format_name, compress):
+    from .exporters import gzip_stream, stream_export
+    from .formats import FORMATS
+
+    format = FORMATS[format_name]
+    queryset = Contact.objects.filter(user_id=user_id).order_by('name')
+    start = time.perf_counter()
+    chunks = stream_export(queryset, format)
+    if compress:
+        chunks = gzip_stream(chunks)
+    data = b''.join(chunk if isinstance(chunk, bytes) else chunk.encode() for chunk in chunks)
+    export_elapsed = time.perf_counter() - start
+
+    # Parse the file the way an import job reads it
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    raw = io.BytesIO(data)
+    if compress:
+        raw = gzip.GzipFile(fileobj=raw)
+    text = open_text(io.BufferedReader(raw, READ_CHUNK_SIZE))
+    records = sum(1 for _ in format.reader(text))
+    parse_elapsed = time.perf_counter() - start
+
+    return {
+        'records': records,
+        'bytes': len(data),
+        'export_ms': round(export_elapsed * 1000, 1),
+        'parse_ms': round(parse_elapsed * 1000, 1),
+        'rss_growth_mb': round(max(peak_rss_mb() - rss_before, 0), 1),
+    }
+
+
+@scenario('formats', 'File size, export and parse time per import/export format, plain and gzip')
+def formats_scenario(options):
+    from .formats import FORMATS
+
+    results = []
+    for size in options['sizes']:
+        with bench_user() as user:
+            seed_contacts(user, size)
+            for format_name in FORMATS:
+                for compress in (False, True):
+                    row = {'format': format_name + ('.gz' if compress else ''), 'rows': size}
+                    row.update(run_isolated(_measure_format, user.pk, format_name, compress))
+                    results.append(row)
+    return results
+
+
+# Characters that differ between UTF-8, cp1252 and latin-1
+ENCODING_NOTE = 'Généré – “benchmark”'
+ENCODINGS = ['utf-8', 'utf-8-sig', 'utf-16', 'cp1252']
+
+
+def _measure_decoding(path):
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    with open(path, 'rb', buffering=0) as raw:
+        text = open_text(io.BufferedReader(raw, READ_CHUNK_SIZE))
+        rows = correct = 0
+        for row in csv.DictReader(text):
+            rows += 1
+            correct += row['Notes'] in ('', ENCODING_NOTE)
+        encoding = text.encoding
+    elapsed = time.perf_counter() - start
+    return {
+        'detected': encoding,
+        'rows': rows,
+        'correct_rows': correct,
+        'seconds': round(elapsed, 3),
+        'rss_growth_mb': round(max(peak_rss_mb() - rss_before, 0), 1),
+    }
+
+
+@scenario('decoding', 'Upload decoding per encoding: detection, correctness, time and peak RSS')
+def decoding_scenario(options):
+    results = []
+    for size in options['sizes']:
+        text = fake_csv(size).replace('Generated by benchmark', ENCODING_NOTE)
+        for encoding in ENCODINGS:
+            with tempfile.NamedTemporaryFile(suffix='.csv') as upload:
+                upload.write(text.encode(encoding))
+                upload.flush()
+                row = {'encoding': encoding, 'file_mb': round(upload.tell() / (1024 * 1024), 1)}
+                row.update(run_isolated(_measure_decoding, upload.name))
+            results.append(row)
+    return results
+
+
+SEARCH_QUERIES = ['maya', 'Sharma', '1555', 'globex', '@example.com', 'no-such-contact']
+
+
+def _time_search(queryset, repeat):
+    """Median seconds to count matches and fetch the first list page."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        queryset.count()
+        list(queryset[:12])
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+@scenario('search', 'Contact list search latency, search index vs icontains')
+def search_scenario(options):
+    results = []
+    for size in options['sizes']:
+        with bench_user() as user:
+            seed_contacts(user, size)
+            base = Contact.objects.filter(user=user)
+            for query in SEARCH_QUERIES:
+                legacy = base.filter(icontains_filter(query)).order_by('-is_favorite', '-created_at')
+                indexed = search_contacts(base, query).order_by('-search_rank', '-is_favorite', '-created_at')
+                legacy_time = _time_search(legacy, options['repeat'])
+                indexed_time = _time_search(indexed, options['repeat'])
+                results.append({
+                    'rows': size,
+                    'query': query,
+                    'matches': indexed.count(),
+                    'icontains_ms': round(legacy_time * 1000, 2),
+                    'index_ms': round(indexed_time * 1000, 2),
+                    'speedup': round(legacy_time / indexed_time, 1) if indexed_time else 0,
+                })
+    return results
+
+
+def _median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return round(statistics.median(timings) * 1000, 2)
+
+
+SUGGEST_QUERIES = ['m', 'ma', 'maya', 'Pri', 'glo', 'omar.', 'zz']
+
+
+@scenario('suggest', 'Typeahead latency: suggestions cold and cached vs the full list page search')
+def suggest_scenario(options):
+    """
+    ``cold_ms`` runs the range scans (prefix cache cleared), ``cached_ms``
+    answers from the prefix cache, and ``endpoint_ms``/``list_page_ms``
+    time /contacts/suggest/ and the list page search through the test
+    client, the list page without its page cache.
+    """
+    test_settings = override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        CONTACTS_PAGE_CACHE_TIMEOUT=0,
+    )
+    results = []
+    with test_settings:
+        for size in options['sizes']:
+            with bench_user() as user:
+                seed_contacts(user, size)
+                client = Client()
+                client.force_login(user)
+                for query in SUGGEST_QUERIES:
+                    def cold():
+                        suggest._cache.clear()
+                        return suggest.suggest(user.pk, query)
+
+                    with CaptureQueriesContext(connections['default']) as queries:
+                        matches = len(cold())
+                    results.append({
+                        'rows': size,
+                        'query': query,
+                        'suggestions': matches,
+                        'queries': len(queries),
+                        'cold_ms': _median_ms(cold, options['repeat']),
+                        'cached_ms': _median_ms(lambda: suggest.suggest(user.pk, query), options['repeat']),
+                        'endpoint_ms': _median_ms(
+                            lambda: client.get(reverse('contacts:contact_suggest'), {'q': query}), options['repeat'],
+                        ),
+                        'list_page_ms': _median_ms(
+                            lambda: client.get(reverse('contacts:contact_list'), {'search': query}), options['repeat'],
+                        ),
+                    })
+    return results
+
+
+@scenario('pagination', 'Contact list page latency, OFFSET pages vs keyset cursors')
+def pagination_scenario(options):
+    results = []
+    per_page = 12
+    for size in options['sizes']:
+        with bench_user() as user:
+            seed_contacts(user, size)
+            queryset = Contact.objects.filter(user=user).order_by('-is_favorite', '-created_at')
+            paginator = Paginator(queryset, per_page)
+            cursors = CursorPaginator(queryset, per_page)
+
+            for label, number in (('first', 1), ('middle', paginator.num_pages // 2 or 1), ('last', paginator.num_pages)):
+                # Cursor pointing just before the requested page
+                offset = (number - 1) * per_page
+                cursor = ''
+                if offset:
+                    anchor = queryset[offset - 1]
+                    cursor = encode_cursor('next', anchor)
+
+                def offset_page():
+                    page = Paginator(queryset, per_page).page(number)
+                    list(page.object_list)
+
+                def cursor_page():
+                    cursors.page(cursor)
+
+                results.append({
+                    'rows': size,
+                    'page': f'{label} ({number})',
+                    'offset_ms': _median_ms(offset_page, options['repeat']),
+                    'cursor_ms': _median_ms(cursor_page, options['repeat']),
+                })
+    return results
+
+
+def percentile(samples, percent):
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(len(ordered) * percent / 100) - 1, 0)]
+
+
+def summarize_requests(timings, queries, elapsed):
+    """Throughput, latency percentiles and query counts of one scenario."""
+    return {
+        'requests': len(timings),
+        'req_per_sec': round(len(timings) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 95) * 1000, 2),
+        'p99_ms': round(percentile(timings, 99) * 1000, 2),
+        'queries': round(statistics.median(queries), 1),
+        'queries_max': max(queries),
+    }
+
+
+def _run_requests(client, make_request, count):
+    """Send ``count`` requests built by ``make_request(client, n)``."""
+    timings, queries = [], []
+    started = time.perf_counter()
+    for n in range(count):
+        with CaptureQueriesContext(connections['default']) as captured:
+            start = time.perf_counter()
+            response = make_request(client, n)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            timings.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise RuntimeError(f'Request {n} failed with status {response.status_code}')
+        queries.append(len(captured))
+    return summarize_requests(timings, queries, time.perf_counter() - started)
+
+
+def request_scenarios(user, size, seed):
+    """``(name, make_request, heavy)`` for each HTTP scenario."""
+    rng = random.Random(seed)
+    ids = list(Contact.objects.filter(user=user).values_list('pk', flat=True))
+    list_url = reverse('contacts:contact_list')
+
+    def get(url, **params):
+        return lambda client, n: client.get(url, params)
+
+    def detail(client, n):
+        return client.get(reverse('contacts:contact_detail', args=[rng.choice(ids)]))
+
+    def create(client, n):
+        return client.post(reverse('contacts:contact_create'), {
+            'name': f'Benchmark Contact {n}',
+            'phone': f'+1{rng.randrange(10 ** 9, 10 ** 10)}',
+            'email': f'benchmark{n}@example.com',
+            'company': 'Globex',
+            'notes': '',
+        })
+
+    def toggle(client, n):
+        return client.post(reverse('contacts:toggle_favorite', args=[rng.choice(ids)]))
+
+    def upload(client, n):
+        # Each import gets fresh rows, so the duplicate check finds nothing
+        name = f'contacts-{n}.csv'
+        content = fake_csv(size, seed=seed + n + 1).encode()
+        return client.post(reverse('contacts:contact_import'), {
+            'csv_file': SimpleUploadedFile(name, content, content_type='text/csv'),
+            'duplicates': 'skip',
+        })
+
+    return [
+        ('home', get(reverse('home')), False),
+        ('list_first', get(list_url), False),
+        ('list_deep', get(list_url, page='last'), False),
+        ('list_search', get(list_url, search='maya'), False),
+        ('list_favorites', get(list_url, filter='favorites'), False),
+        ('detail', detail, False),
+        ('create', create, False),
+        ('toggle_favorite', toggle, False),
+        ('export', get(reverse('contacts:contact_export')), True),
+        ('import', upload, True),
+    ]
+
+
+@scenario('http', 'Requests through the test client: throughput, latency percentiles, queries')
+def http_scenario(options):
+    """
+    Seed one user with each of ``--sizes`` contacts and run every request
+    scenario against it: ``--requests`` times for page views, ``--repeat``
+    times for imports and exports of a ``size``-row file.
+    """
+    results = []
+    wanted = set(options.get('only') or [])
+    test_settings = override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        CONTACTS_IMPORT_MODE='sync',
+    )
+    with test_settings:
+        for size in options['sizes']:
+            with bench_user() as user:
+                seed_contacts(user, size, seed=options['seed'])
+                client = Client()
+                client.force_login(user)
+                for name, make_request, heavy in request_scenarios(user, size, options['seed']):
+                    if wanted and name not in wanted:
+                        continue
+                    count = options['repeat'] if heavy else options['requests']
+                    results.append({
+                        'scenario': name,
+                        'rows': size,
+                        **_run_requests(client, make_request, count),
+                    })
+    return results
+
+
+# Django's own SQLite defaults, for comparison with the configured profile
+SQLITE_BASELINE = {'init_command': 'PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL', 'transaction_mode': None}
+
+
+@contextmanager
+def database_options(options):
+    """Reconnect the default database with ``options`` merged into OPTIONS."""
+    settings_dict = connections['default'].settings_dict
+    original = settings_dict['OPTIONS']
+    settings_dict['OPTIONS'] = {**original, **options}
+    connections['default'].close()
+    try:
+        yield
+    finally:
+        connections['default'].close()
+        settings_dict['OPTIONS'] = original
+        # Switch the file back to the configured journal mode
+        connections['default'].ensure_connection()
+
+
+def _worker(kind, user_id, size, seed, deadline, results):
+    # Lock errors are counted, not logged with a traceback each
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    user = get_user_model().objects.get(pk=user_id)
+    operation = concurrent_operations(user, size, seed)[kind]
+    client = Client()
+    client.force_login(user)
+    timings, errors = [], 0
+    try:
+        n = 0
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                operation(client, n)
+            except OperationalError:
+                # "database is locked"
+                errors += 1
+            else:
+                timings.append(time.perf_counter() - start)
+            n += 1
+    finally:
+        connections.close_all()
+        results.put((kind, timings, errors))
+
+
+def concurrent_operations(user, size, seed):
+    """The operation each kind of worker repeats."""
+    rng = random.Random(f'{seed}-{os.getpid()}-{threading.get_ident()}')
+    ids = list(Contact.objects.filter(user=user).values_list('pk', flat=True)[:size])
+    list_url = reverse('contacts:contact_list')
+    import_rows = fake_csv(500, seed=seed + 1)
+
+    def read(client, n):
+        client.get(list_url, {'page': rng.randrange(1, size // 12 + 2)})
+
+    def toggle(client, n):
+        client.post(reverse('contacts:toggle_favorite', args=[rng.choice(ids)]))
+
+    def create(client, n):
+        client.post(reverse('contacts:contact_create'), {
+            'name': f'Concurrent Contact {n}', 'phone': f'+1{rng.randrange(10 ** 9, 10 ** 10)}',
+        })
+
+    def import_batch(client, n):
+        # One committed transaction per 100 rows, like a background import job
+        ContactImporter(user, batch_size=100, duplicates='create').run(
+            csv.DictReader(io.StringIO(import_rows)), on_checkpoint=lambda result, row: None,
+        )
+
+    return {'read': read, 'toggle': toggle, 'create': create, 'import': import_batch}
+
+
+def run_workers(kinds, user, size, seed, duration):
+    """
+    Run one worker per entry of ``kinds`` for ``duration`` seconds, as forked
+    processes (like gunicorn workers), or threads where fork is unavailable.
+    Returns ``[(kind, timings, errors)]``.
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        start_worker, results = context.Process, context.Queue()
+    else:
+        start_worker, results = threading.Thread, queue.Queue()
+
+    deadline = time.time() + duration
+    workers = [
+        start_worker(target=_worker, args=(kind, user.pk, size, seed, deadline, results))
+        for kind in kinds
+    ]
+    for worker in workers:
+        worker.start()
+    finished = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return finished
+
+
+# (SESSION_BACKEND, AUTH_USER_CACHE_TIMEOUT)
+AUTH_CONFIGS = [('db', 0), ('db', 30), ('cached_db', 0), ('cached_db', 30), ('cache', 30), ('signed_cookies', 30)]
+
+
+def _count_table_queries(queries, table):
+    return sum(f'"{table}"' in query['sql'] for query in queries.captured_queries)
+
+
+@scenario('auth', 'Queries and latency per request by session engine, with and without the user cache')
+def auth_scenario(options):
+    """
+    Median queries per request (and how many read the session and user
+    tables) for cached list pages, the stats API, a detail page and a
+    favorite toggle that adds a flash message, per session engine and
+    AUTH_USER_CACHE_TIMEOUT.
+    """
+    from accounts.middleware import user_cache
+
+    results = []
+    with bench_user() as user:
+        seed_contacts(user, options['sizes'][0])
+        pk = Contact.objects.filter(user=user).values_list('pk', flat=True).first()
+        requests = [
+            ('list', lambda client: client.get(reverse('contacts:contact_list'))),
+            ('stats', lambda client: client.get(reverse('contacts:api_contact_stats'))),
+            ('detail', lambda client: client.get(reverse('contacts:contact_detail', args=[pk]))),
+            ('toggle', lambda client: client.post(reverse('contacts:toggle_favorite', args=[pk]))),
+        ]
+        for backend, timeout in AUTH_CONFIGS:
+            test_settings = override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                SESSION_ENGINE=settings.SESSION_ENGINES[backend],
+                AUTH_USER_CACHE_TIMEOUT=timeout,
+            )
+            with test_settings:
+                user_cache.clear()
+                client = Client()
+                client.force_login(user)
+                for name, send in requests:
+                    send(client)
+                    counts, session_counts, user_counts, timings = [], [], [], []
+                    for _ in range(options['repeat']):
+                        with CaptureQueriesContext(connections['default']) as queries:
+                            start = time.perf_counter()
+                            send(client)
+                            timings.append(time.perf_counter() - start)
+                        counts.append(len(queries))
+                        session_counts.append(_count_table_queries(queries, 'django_session'))
+                        user_counts.append(_count_table_queries(queries, get_user_model()._meta.db_table))
+                    results.append({
+                        'session': backend,
+                        'user_cache_s': timeout,
+                        'request': name,
+                        'queries': statistics.median(counts),
+                        'session_queries': statistics.median(session_counts),
+                        'user_queries': statistics.median(user_counts),
+                        'ms': round(statistics.median(timings) * 1000, 2),
+                    })
+    return results
+
+
+@scenario('concurrency', 'Concurrent reads and writes per database profile: throughput and lock errors')
+def concurrency_scenario(options):
+    """
+    Run ``--threads`` reader processes alongside a favorite toggler, a contact
+    creator and an importer for ``--duration`` seconds. On SQLite the
+    configured profile (WAL, BEGIN IMMEDIATE, ...) is compared with
+    Django's defaults.
+    """
+    profiles = [('configured', {})]
+    if connections['default'].vendor == 'sqlite':
+        profiles.insert(0, ('sqlite-defaults', SQLITE_BASELINE))
+
+    results = []
+    test_settings = override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+    with test_settings:
+        for size in options['sizes']:
+            for profile, db_options in profiles:
+                with bench_user() as user, database_options(db_options):
+                    seed_contacts(user, size, seed=options['seed'])
+                    kinds = ['read'] * options['threads'] + ['toggle', 'create', 'import']
+                    finished = run_workers(kinds, user, size, options['seed'], options['duration'])
+
+                for kind in ('read', 'toggle', 'create', 'import'):
+                    timings = [t for name, samples, _ in finished if name == kind for t in samples]
+                    errors = sum(count for name, _, count in finished if name == kind)
+                    results.append({
+                        'profile': profile,
+                        'rows': size,
+                        'operation': kind,
+                        'ok': len(timings),
+                        'errors': errors,
+                        'ops_per_sec': round(len(timings) / options['duration'], 1),
+                        'p50_ms': round(percentile(timings, 50) * 1000, 2) if timings else None,
+                        'p95_ms': round(percentile(timings, 95) * 1000, 2) if timings else None,
+                    })
+    return results
+
+
+# name -> (module, arguments, CONTACTS_ASYNC_VIEWS)
+SERVERS = {
+    'gunicorn-sync': ('gunicorn', ['zenvio.wsgi:application', '--bind', '127.0.0.1:{port}', '--workers', '{workers}'], False),
+    'uvicorn-async': ('uvicorn', [
+        'zenvio.asgi:application', '--port', '{port}', '--workers', '{workers}',
+        '--log-level', 'warning', '--no-access-log',
+    ], True),
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def run_server(name, workers):
+    """Start server ``name`` on a free port; yields the port."""
+    module, arguments, async_views = SERVERS[name]
+    port = _free_port()
+    env = {
+        **os.environ,
+        'CONTACTS_ASYNC_VIEWS': str(async_views),
+        'ALLOWED_HOSTS': '127.0.0.1',
+        'DEBUG': 'False',
+    }
+    command = [sys.executable, '-m', module, *(arg.format(port=port, workers=workers) for arg in arguments)]
+    process = subprocess.Popen(command, env=env, cwd=settings.BASE_DIR)
+    try:
+        deadline = time.time() + 30
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'{name} exited with status {process.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise RuntimeError(f'{name} did not start listening on port {port}')
+                time.sleep(0.1)
+        yield port
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def _http_get(port, path, cookie, slow_delay=0):
+    """
+    GET ``path`` on a new connection and read the whole response; returns
+    the status. A slow client sends its request in two halves.
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        request = (
+            f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: {cookie}\r\n'
+            f'Connection: close\r\n\r\n'
+        ).encode()
+        if slow_delay:
+            writer.write(request[:20])
+            await writer.drain()
+            await asyncio.sleep(slow_delay)
+            request = request[20:]
+        writer.write(request)
+        await writer.drain()
+
+        status = int((await reader.readline()).split()[1])
+        length, chunked = None, False
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            header, _, value = line.decode('latin-1').partition(':')
+            header = header.strip().lower()
+            if header == 'content-length':
+                length = int(value)
+            elif header == 'transfer-encoding' and 'chunked' in value.lower():
+                chunked = True
+
+        if chunked:
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if not size:
+                    break
+        elif length is not None:
+            await reader.readexactly(length)
+        else:
+            await reader.read()
+        return status
+    finally:
+        writer.close()
+
+
+async def _load(port, paths, cookie, clients, slow_clients, slow_delay, duration):
+    deadline = time.time() + duration
+    timings, errors, slow_done = [], 0, 0
+
+    async def client(n, slow):
+        nonlocal errors, slow_done
+        while time.time() < deadline:
+            path = paths[n % len(paths)]
+            n += 1
+            start = time.perf_counter()
+            try:
+                status = await _http_get(port, path, cookie, slow_delay if slow else 0)
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                errors += 1
+                continue
+            if status >= 400:
+                errors += 1
+            elif slow:
+                slow_done += 1
+            else:
+                timings.append(time.perf_counter() - start)
+
+    await asyncio.gather(
+        *(client(n, False) for n in range(clients)),
+        *(client(n, True) for n in range(slow_clients)),
+    )
+    return timings, errors, slow_done
+
+
+@scenario('servers', 'Throughput of gunicorn (sync views) vs uvicorn (async views) under concurrent clients')
+def servers_scenario(options):
+    """
+    Start each server with ``--workers`` workers and hit the list, detail,
+    list API and stats API from ``--clients`` concurrent clients (plus
+    ``--slow-clients`` that take ``--slow-delay`` seconds to send each
+    request) for ``--duration`` seconds.
+    """
+    results = []
+    wanted = set(options.get('only') or [])
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for size in options['sizes']:
+            with bench_user() as user:
+                seed_contacts(user, size, seed=options['seed'])
+                client = Client()
+                client.force_login(user)
+                cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+                pk = Contact.objects.filter(user=user).values_list('pk', flat=True).first()
+                paths = [
+                    reverse('contacts:contact_list'),
+                    reverse('contacts:contact_detail', args=[pk]),
+                    reverse('contacts:api_contact_list') + '?limit=50',
+                    reverse('contacts:api_contact_stats'),
+                ]
+                # The servers use their own connections to the database
+                connections.close_all()
+
+                for name, (module, _, _) in SERVERS.items():
+                    if wanted and name not in wanted:
+                        continue
+                    row = {'server': name, 'rows': size, 'workers': options['workers'], 'clients': options['clients']}
+                    if importlib.util.find_spec(module) is None:
+                        results.append({**row, 'error': f'{module} is not installed'})
+                        continue
+                    with run_server(name, options['workers']) as port:
+                        timings, errors, slow_done = asyncio.run(_load(
+                            port, paths, cookie, options['clients'], options['slow_clients'],
+                            options['slow_delay'], options['duration'],
+                        ))
+                    results.append({
+                        **row,
+                        'requests': len(timings),
+                        'req_per_sec': round(len(timings) / options['duration'], 1),
+                        'p50_ms': round(percentile(timings, 50) * 1000, 2) if timings else None,
+                        'p95_ms': round(percentile(timings, 95) * 1000, 2) if timings else None,
+                        'p99_ms': round(percentile(timings, 99) * 1000, 2) if timings else None,
+                        'errors': errors,
+                        'slow_requests': slow_done,
+                    })
+    return results
+
+
+# Run in a fresh interpreter by the coldstart scenario: import a WSGI entry
+# point, then GET a path twice; prints the wall-clock times as JSON
+COLD_START_SCRIPT = '''
+import json, resource, sys, time
+from io import BytesIO
+
+entry, path, cookie = sys.argv[1:]
+if entry == 'django':
+    # The entry point as generated by startproject
+    from django.core.wsgi import get_wsgi_application
+    application = get_wsgi_application()
+else:
+    application = __import__(entry, fromlist=['application']).application
+imported = time.time()
+
+
+def get():
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'HTTP_COOKIE': cookie,
+        'wsgi.input': BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+    }
+    statuses = []
+    response = application(environ, lambda status, headers: statuses.append(status))
+    try:
+        b''.join(response)
+    finally:
+        response.close()
+    return int(statuses[0].split()[0])
+
+
+status = get()
+first = time.time()
+get()
+second = time.time()
+print(json.dumps({
+    'status': status, 'imported': imported, 'first': first, 'second': second,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+'''
+
+# name -> (entry point, environment); 'django' is the entry point without warm-up
+COLD_STARTS = {
+    'django-default': ('django', {}),
+    'no-warm-start': ('zenvio.wsgi', {'WARM_START': 'False'}),
+    'warm-start': ('zenvio.wsgi', {}),
+    'warm-start-no-admin': ('zenvio.wsgi', {'ADMIN_ENABLED': 'False'}),
+}
+
+
+def _cold_start(entry, env, path, cookie):
+    """Start a process serving ``path``; the times to its import and its responses, in seconds."""
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': 'zenvio.settings',
+        'ALLOWED_HOSTS': 'localhost',
+        'DEBUG': 'False',
+        **env,
+    }
+    start = time.time()
+    process = subprocess.run(
+        [sys.executable, '-c', COLD_START_SCRIPT, entry, path, cookie],
+        capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+    )
+    if process.returncode:
+        raise RuntimeError(f'{entry} failed:\n{process.stderr[-2000:]}')
+    times = json.loads(process.stdout.splitlines()[-1])
+    return {
+        'status': times['status'],
+        'import': times['imported'] - start,
+        'first': times['first'] - times['imported'],
+        'to_first_200': times['first'] - start,
+        'second': times['second'] - times['first'],
+        'rss_mb': times['rss_mb'],
+    }
+
+
+@scenario('coldstart', 'Time from process start to the first 200 on /contacts/, with and without warm start')
+def coldstart_scenario(options):
+    """
+    Start ``--repeat`` fresh processes per entry point configuration, each
+    importing the WSGI application and requesting the contact list twice
+    as a logged-in user, and report the medians: interpreter start-up and
+    import (including warm-up), the first request, process start to first
+    response, and the second request. ``--baseline`` adds the entry point
+    without any warm-up.
+    """
+    results = []
+    configs = [name for name in COLD_STARTS if options['baseline'] or name != 'django-default']
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for size in options['sizes']:
+            with bench_user() as user:
+                seed_contacts(user, size, seed=options['seed'])
+                client = Client()
+                client.force_login(user)
+                cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+                path = reverse('contacts:contact_list')
+                connections.close_all()
+
+                runs = {name: [] for name in configs}
+                # Interleaved, so drift in the machine's load hits every configuration alike
+                for _ in range(options['repeat']):
+                    for name in configs:
+                        entry, env = COLD_STARTS[name]
+                        runs[name].append(_cold_start(entry, env, path, cookie))
+
+                for name in configs:
+                    samples = runs[name]
+                    results.append({
+                        'entry': name,
+                        'rows': size,
+                        'status': samples[0]['status'],
+                        **{
+                            f'{key}_ms': round(statistics.median(sample[key] for sample in samples) * 1000, 1)
+                            for key in ('import', 'first', 'to_first_200', 'second')
+                        },
+                        'rss_mb': round(statistics.median(sample['rss_mb'] for sample in samples), 1),
+                    })
+    return results
+
+
+class PageStyles(HTMLParser):
+    """The stylesheets a page links, blocking or preloaded, and its inline CSS, outside <noscript>."""
+
+    def __init__(self):
+        super().__init__()
+        self.blocking, self.deferred, self.inline = [], [], 0
+        self.noscript = self.style = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'noscript':
+            self.noscript = True
+        elif tag == 'style':
+            self.style = True
+        elif tag == 'link' and not self.noscript:
+            if attrs.get('rel') == 'stylesheet':
+                self.blocking.append(attrs['href'])
+            elif attrs.get('rel') == 'preload' and attrs.get('as') == 'style':
+                self.deferred.append(attrs['href'])
+
+    def handle_endtag(self, tag):
+        if tag == 'noscript':
+            self.noscript = False
+        elif tag == 'style':
+            self.style = False
+
+    def handle_data(self, data):
+        if self.style:
+            self.inline += len(data.encode())
+
+
+def _stylesheet_bytes(href, built):
+    """``(size, transfer size)`` of a local stylesheet: the Brotli or gzip variant once built."""
+    name = href[len(settings.STATIC_URL):]
+    path = os.path.join(settings.STATIC_ROOT, name) if built else finders.find(name)
+    size = transfer = os.path.getsize(path)
+    if built:
+        for suffix in ('.br', '.gz'):
+            if os.path.exists(path + suffix):
+                transfer = os.path.getsize(path + suffix)
+                break
+    return size, transfer
+
+
+def _page_weight(client, path, built):
+    html = client.get(path).content
+    styles = PageStyles()
+    styles.feed(html.decode())
+    local = [href for href in styles.blocking + styles.deferred if href.startswith(settings.STATIC_URL)]
+    sizes = {href: _stylesheet_bytes(href, built) for href in local}
+    blocking = [sizes[href][1] for href in styles.blocking if href in sizes]
+    html_gzip = len(gzip.compress(html))
+    return {
+        'html_kb': round(len(html) / 1024, 1),
+        'html_gzip_kb': round(html_gzip / 1024, 1),
+        'inline_css_kb': round(styles.inline / 1024, 1),
+        'local_css_kb': round(sum(size for size, _ in sizes.values()) / 1024, 1),
+        'local_css_transfer_kb': round(sum(transfer for _, transfer in sizes.values()) / 1024, 1),
+        'blocking_stylesheets': len(styles.blocking),
+        # What the browser downloads from us before it can render
+        'critical_path_kb': round((html_gzip + sum(blocking)) / 1024, 1),
+    }
+
+
+@scenario('pageweight', 'Page weight with the static files as written vs built by collectstatic')
+def pageweight_scenario(options):
+    """
+    Render the home, login, list, detail and new contact pages without the
+    asset build (plain stylesheet, served as is) and after running
+    collectstatic into a temporary STATIC_ROOT (critical CSS inline, the
+    minified stylesheet preloaded and precompressed). Stylesheets on other
+    hosts (Bootstrap, fonts) are counted in blocking_stylesheets, not
+    weighed.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as static_root, bench_user() as user:
+        seed_contacts(user, options['sizes'][0], seed=options['seed'])
+        pk = Contact.objects.filter(user=user).values_list('pk', flat=True).first()
+        pages = [
+            ('home', reverse('home'), False),
+            ('login', reverse('accounts:login'), True),
+            ('list', reverse('contacts:contact_list'), False),
+            ('detail', reverse('contacts:contact_detail', args=[pk]), False),
+            ('create', reverse('contacts:contact_create'), False),
+        ]
+        with override_settings(STATIC_ROOT=static_root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+        builds = [
+            ('source', override_settings(DEBUG=True)),
+            ('built', override_settings(DEBUG=False, STATIC_ROOT=static_root)),
+        ]
+        for build, build_settings in builds:
+            test_settings = override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], CONTACTS_PAGE_CACHE_TIMEOUT=0,
+            )
+            with test_settings, build_settings:
+                client = Client()
+                client.force_login(user)
+                for name, path, anonymous in pages:
+                    results.append({
+                        'page': name,
+                        'static': build,
+                        **_page_weight(Client() if anonymous else client, path, build == 'built'),
+                    })
+    return results
+
+
+@contextmanager
+def sqlite_replica():
+    """A snapshot of the default SQLite database, registered as a database alias."""
+    alias = 'bench_replica'
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'replica.sqlite3')
+        primary = connections['default']
+        primary.ensure_connection()
+        replica = sqlite3.connect(path)
+        primary.connection.backup(replica)
+        replica.close()
+        connections.settings[alias] = {**connections.settings['default'], 'NAME': path}
+        try:
+            yield alias
+        finally:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+
+
+def _fetch(response):
+    # Streamed exports read the database while they are consumed
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+@scenario('replicas', 'Queries per database for the read-heavy views, with a read replica and after a write')
+def replicas_scenario(options):
+    """
+    Median queries per request on the primary and on the replica, and
+    latency, for the home, list, detail and export pages and a favorite
+    toggle: without replicas, with a replica, and pinned to the primary
+    after a write. The replica is DB_REPLICAS' first, or on SQLite a copy of
+    the database taken after seeding (it never receives later writes).
+    """
+    results = []
+    with bench_user() as user:
+        seed_contacts(user, options['sizes'][0], seed=options['seed'])
+        pk = Contact.objects.filter(user=user).values_list('pk', flat=True).first()
+        requests = [
+            ('home', lambda client: client.get(reverse('home'))),
+            ('list', lambda client: client.get(reverse('contacts:contact_list'))),
+            ('detail', lambda client: client.get(reverse('contacts:contact_detail', args=[pk]))),
+            ('export', lambda client: _fetch(client.get(reverse('contacts:contact_export')))),
+            ('toggle', lambda client: client.post(reverse('contacts:toggle_favorite', args=[pk]))),
+        ]
+        if settings.DB_REPLICA_ALIASES:
+            replica = nullcontext(settings.DB_REPLICA_ALIASES[0])
+        elif connections['default'].vendor == 'sqlite':
+            replica = sqlite_replica()
+        else:
+            raise OperationalError('Set DB_REPLICAS to benchmark replicas on this database.')
+
+        with replica as alias:
+            modes = [('primary', []), ('replica', [alias]), ('pinned', [alias])]
+            for mode, aliases in modes:
+                test_settings = override_settings(
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                    CONTACTS_PAGE_CACHE_TIMEOUT=0,
+                    DB_REPLICA_ALIASES=aliases,
+                    DB_REPLICA_PIN_SECONDS=3600,
+                )
+                with test_settings:
+                    client = Client()
+                    client.force_login(user)
+                    if mode == 'pinned':
+                        requests[-1][1](client)
+                    for name, send in requests:
+                        send(client)
+                        primary_counts, replica_counts, timings = [], [], []
+                        for _ in range(options['repeat']):
+                            with CaptureQueriesContext(connections['default']) as primary, \
+                                    CaptureQueriesContext(connections[alias]) as replica_queries:
+                                start = time.perf_counter()
+                                send(client)
+                                timings.append(time.perf_counter() - start)
+                            primary_counts.append(len(primary))
+                            replica_counts.append(len(replica_queries))
+                        results.append({
+                            'mode': mode,
+                            'request': name,
+                            'primary_queries': statistics.median(primary_counts),
+                            'replica_queries': statistics.median(replica_counts),
+                            'ms': round(statistics.median(timings) * 1000, 2),
+                        })
+    return results
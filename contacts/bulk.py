@@ -0,0 +1,146 @@
+"""
+Set-based bulk operations on a user's contacts.
+
+Each action runs as UPDATE/DELETE statements over the selection instead of
+loading and saving contacts one at a time, in one transaction together with
+the matching ContactStats update. Those statements bypass model signals, so
+the actions compute the counter changes, drop the cached list pages and
+record sync tombstones themselves.
+"""
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import render_cache, stats, sync
+from .forms import ContactForm
+from .models import Contact
+from .search import search_filter
+from .signals import add_state
+from .suggest import prefix_key
+
+
+ACTIONS = ('favorite', 'unfavorite', 'delete', 'set_company')
+
+# Ids per UPDATE/DELETE statement, below SQLite's bound parameter limit
+CHUNK_SIZE = 900
+
+
+class BulkActionError(Exception):
+    """Raised for an unknown action or an unusable selection."""
+
+
+def select_contacts(user, ids=None, search='', filter_type=''):
+    """
+    The contacts of ``user`` a bulk action applies to: the given ``ids``,
+    or everything matching the list page's ``search``/``filter``.
+    """
+    queryset = Contact.objects.filter(user=user)
+    if ids is not None:
+        try:
+            ids = {int(pk) for pk in ids}
+        except (TypeError, ValueError):
+            raise BulkActionError('ids must be a list of integers.')
+        if not ids:
+            raise BulkActionError('No contacts selected.')
+        return queryset.filter(pk__in=ids)
+
+    if filter_type == 'favorites':
+        queryset = queryset.filter(is_favorite=True)
+    search = search.strip()
+    if search:
+        queryset = queryset.filter(search_filter(search, queryset.db))
+    return queryset
+
+
+def _locked_rows(queryset, *fields):
+    """Lock the selected rows and return ``(id, *fields)`` for each."""
+    return list(queryset.order_by().select_for_update().values_list('id', *fields))
+
+
+def _chunks(rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        yield [row[0] for row in rows[start:start + CHUNK_SIZE]]
+
+
+def set_favorite(user, queryset, value):
+    # Only rows that change are touched, so updated_at stays meaningful
+    changed = queryset.filter(is_favorite__in=[not value]).update(
+        is_favorite=value, updated_at=timezone.now()
+    )
+    delta = stats.StatsDelta()
+    delta.favorites = changed if value else -changed
+    stats.apply_delta(user.pk, delta, queryset.db)
+    return changed
+
+
+def set_company(user, queryset, company):
+    rows = _locked_rows(queryset.exclude(company=company), 'company')
+    now = timezone.now()
+    for ids in _chunks(rows):
+        Contact.objects.using(queryset.db).filter(pk__in=ids).update(
+            company=company, company_key=prefix_key(company), updated_at=now,
+        )
+
+    delta = stats.StatsDelta()
+    for _, old_company in rows:
+        if old_company:
+            delta.companies[old_company] -= 1
+    if company:
+        delta.companies[company] += len(rows)
+    stats.apply_delta(user.pk, delta, queryset.db)
+    return len(rows)
+
+
+def _delete_rows(ids, using):
+    """
+    DELETE the contacts ``ids`` in one statement. Nothing references a
+    contact (tombstones keep the bare id), so there is nothing to cascade;
+    QuerySet.delete() would load every row to send the model signals,
+    whose work the caller does once for the whole selection.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(Contact._meta.db_table)
+    column = connection.ops.quote_name(Contact._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({", ".join(["%s"] * len(ids))})', ids)
+
+
+def delete_contacts(user, queryset):
+    rows = _locked_rows(queryset, 'user_id', 'is_favorite', 'company', 'created_at')
+    for ids in _chunks(rows):
+        _delete_rows(ids, queryset.db)
+    sync.record_deletions(user.pk, [row[0] for row in rows], queryset.db)
+
+    delta = stats.StatsDelta()
+    for row in rows:
+        add_state(delta, row[1:], -1)
+    stats.apply_delta(user.pk, delta, queryset.db)
+    return len(rows)
+
+
+def clean_company(value):
+    """Validate a company name with the same rules as ContactForm."""
+    field = ContactForm.base_fields['company']
+    try:
+        return field.clean(str(value or '').strip())
+    except ValidationError as e:
+        raise BulkActionError(f"{field.label}: {' '.join(e.messages)}")
+
+
+def apply_bulk_action(user, queryset, action, company=''):
+    """
+    Run ``action`` on ``queryset`` (which must be limited to ``user``'s
+    contacts) and return the number of contacts changed.
+    """
+    if action not in ACTIONS:
+        raise BulkActionError(f'Unknown action "{action}".')
+    if action == 'set_company':
+        company = clean_company(company)
+
+    with transaction.atomic(using=queryset.db):
+        render_cache.invalidate_pages(user.pk, queryset.db)
+        if action in ('favorite', 'unfavorite'):
+            return set_favorite(user, queryset, action == 'favorite')
+        if action == 'set_company':
+            return set_company(user, queryset, company)
+        return delete_contacts(user, queryset)
@@ -0,0 +1,69 @@
+"""
+Text decoding for uploaded files.
+
+The encoding is sniffed from the first chunk of the file: a byte order
+mark (UTF-8, UTF-16), UTF-16 without one (ASCII text with every other byte
+zero), else UTF-8 if the chunk is valid UTF-8, else cp1252, which is what
+spreadsheets on Windows export as "CSV". The file is then decoded lazily,
+chunk by chunk, as the parser reads it, so it is read once and never held
+in memory whole.
+
+A UTF-8 file with cp1252 bytes further in (a spreadsheet edited on two
+machines) does not fail or turn into mojibake: the invalid bytes are
+decoded as cp1252, one at a time, by the ``contacts-cp1252`` error handler.
+"""
+import codecs
+import io
+
+
+# Bytes looked at to pick the encoding
+SNIFF_SIZE = 64 * 1024
+FALLBACK_ERRORS = 'contacts-cp1252'
+
+# cp1252 leaves five bytes undefined; they decode as in latin-1
+CP1252_CHARS = [bytes([byte]).decode('cp1252', 'ignore') or chr(byte) for byte in range(256)]
+
+
+def decode_cp1252(error):
+    """Codec error handler decoding the bytes a UnicodeDecodeError covers as cp1252."""
+    if not isinstance(error, UnicodeDecodeError):
+        raise error
+    text = ''.join(CP1252_CHARS[byte] for byte in error.object[error.start:error.end])
+    return text, error.end
+
+
+codecs.register_error(FALLBACK_ERRORS, decode_cp1252)
+
+
+def sniff_encoding(head):
+    """The encoding of a file that starts with the bytes ``head``."""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+
+    pairs = len(head) // 2
+    even_zeros, odd_zeros = head[0:pairs * 2:2].count(0), head[1:pairs * 2:2].count(0)
+    if odd_zeros > pairs // 4 and odd_zeros > 4 * even_zeros:
+        return 'utf-16-le'
+    if even_zeros > pairs // 4 and even_zeros > 4 * odd_zeros:
+        return 'utf-16-be'
+
+    try:
+        # Not final: a character cut at the end of the chunk is fine
+        codecs.getincrementaldecoder('utf-8')().decode(head)
+    except UnicodeDecodeError:
+        return 'cp1252'
+    return 'utf-8'
+
+
+def open_text(binary):
+    """
+    A text stream over the buffered binary stream ``binary``, decoded in
+    the encoding sniffed from its first chunk. ``binary`` needs a buffer of
+    at least SNIFF_SIZE bytes for the whole chunk to be looked at.
+    """
+    encoding = sniff_encoding(binary.peek(SNIFF_SIZE)[:SNIFF_SIZE])
+    # cp1252 only stands in for bytes of an ASCII-compatible encoding
+    errors = 'replace' if encoding.startswith('utf-16') else FALLBACK_ERRORS
+    return io.TextIOWrapper(binary, encoding=encoding, errors=errors, newline='')
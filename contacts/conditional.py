@@ -0,0 +1,77 @@
+"""
+Conditional GET for the HTML pages.
+
+Pages carry an ETag and Last-Modified computed without querying or
+rendering the page: from the contact's ``updated_at`` on the detail page,
+and from the user's last-write marker (``ContactStats.version``, see
+``contacts.render_cache``) on the list and home pages. Both come from the
+database, so every process computes the same validators. A request whose ``If-None-Match``/``If-Modified-Since``
+still match gets a 304 before any of the page's work is done.
+
+The validators also cover what else the HTML depends on: the user, the
+CSRF cookie the page's forms were rendered for, and CONTACTS_RELEASE, so a
+deploy invalidates the pages browsers hold. Responses are ``Cache-Control:
+private, no-cache`` with ``Vary: Cookie``: browsers revalidate on every
+visit and a shared cache (the reverse proxy) never stores them.
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def page_validators(request, *parts, modified):
+    """
+    ``(etag, last_modified)`` for a page of ``request.user`` that depends on
+    ``parts`` and last changed at ``modified``.
+    """
+    user = request.user
+    etag = make_etag(
+        settings.CONTACTS_RELEASE,
+        user.pk,
+        user.username,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        *parts,
+    )
+    # A login (possibly as another user) makes older copies stale
+    last_modified = max(modified, user.last_login) if user.last_login else modified
+    return etag, last_modified
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET/HEAD with a 304 when the browser's copy is current.
+    Views pass validators from ``page_validators``, or None for a page that
+    must not be validated (e.g. one showing flash messages).
+    """
+    def not_modified_response(self, validators):
+        if validators is None:
+            return None
+        etag, last_modified = validators
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=int(last_modified.timestamp()),
+        )
+        if response is not None:
+            self.add_cache_headers(response, validators)
+        return response
+
+    def add_cache_headers(self, response, validators):
+        if validators is not None:
+            etag, last_modified = validators
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+    def conditional_render(self, validators, **kwargs):
+        """A 304, or the rendered page with its validators."""
+        not_modified = self.not_modified_response(validators)
+        if not_modified is not None:
+            return not_modified
+        return self.add_cache_headers(self.render_to_response(self.get_context_data(**kwargs)), validators)
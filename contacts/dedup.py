@@ -0,0 +1,186 @@
+"""
+Duplicate detection for contacts.
+
+Contacts store a normalized phone (``+`` and digits, E.164-style) and a
+lowercased email in indexed columns. Two contacts of the same user are
+duplicates when either key matches. Imports look keys up in a dict built
+from one indexed query per batch, and ``find_clusters`` groups an existing
+book in a single pass with union-find instead of comparing every pair.
+"""
+import re
+
+from django.conf import settings
+from django.db import transaction
+
+
+POLICIES = ('skip', 'update', 'merge', 'create')
+POLICY_CHOICES = [
+    ('skip', 'Skip rows matching an existing contact'),
+    ('update', 'Update the existing contact with the row'),
+    ('merge', 'Fill in blank fields of the existing contact'),
+    ('create', 'Import anyway (allow duplicates)'),
+]
+
+# Fields a CSV row can set on an existing contact
+MERGE_FIELDS = ('name', 'phone', 'email', 'company', 'notes')
+
+
+def normalize_phone(phone):
+    """
+    ``+`` followed by the digits of ``phone``. An international ``00``
+    prefix is dropped, and national numbers (no ``+``, 10 digits) get
+    CONTACTS_DEFAULT_COUNTRY_CODE.
+    """
+    phone = (phone or '').strip()
+    digits = re.sub(r'\D', '', phone)
+    if not digits:
+        return ''
+    if not phone.startswith('+'):
+        if digits.startswith('00'):
+            digits = digits[2:]
+        elif len(digits) == 10:
+            digits = settings.CONTACTS_DEFAULT_COUNTRY_CODE + digits
+    return '+' + digits
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def match_keys(phone_normalized, email_normalized):
+    """Keys under which a contact is indexed for matching."""
+    keys = [('phone', phone_normalized)] if phone_normalized else []
+    if email_normalized:
+        keys.append(('email', email_normalized))
+    return keys
+
+
+class DuplicateIndex:
+    """
+    Dict of match key -> contact for one user's import batch: the existing
+    contacts matching the batch, plus rows added earlier in the import.
+    """
+    def __init__(self):
+        self.contacts = {}
+
+    def add(self, contact):
+        for key in match_keys(contact.phone_normalized, contact.email_normalized):
+            self.contacts.setdefault(key, contact)
+
+    def find(self, contact):
+        for key in match_keys(contact.phone_normalized, contact.email_normalized):
+            if key in self.contacts:
+                return self.contacts[key]
+        return None
+
+    def load(self, queryset, contacts, keys_only=False):
+        """
+        Add the contacts in ``queryset`` that share a key with ``contacts``.
+        With ``keys_only`` just the keys are read and ``find`` returns True
+        for a match, which is all the 'skip' policy needs.
+        """
+        # One query per key type: each is a seek on its (user, key) index,
+        # which an OR of both, or the default ordering, would prevent
+        queryset = queryset.order_by()
+        lookups = [
+            ('phone_normalized__in', {contact.phone_normalized for contact in contacts}),
+            ('email_normalized__in', {contact.email_normalized for contact in contacts}),
+        ]
+        loaded = {}
+        for lookup, values in lookups:
+            values.discard('')
+            if not values:
+                continue
+            matches = queryset.filter(**{lookup: values})
+            if keys_only:
+                for phone, email in matches.values_list('phone_normalized', 'email_normalized'):
+                    for key in match_keys(phone, email):
+                        self.contacts.setdefault(key, True)
+            else:
+                for contact in matches:
+                    # A contact matching by both keys is read twice; keep one instance
+                    self.add(loaded.setdefault(contact.pk, contact))
+
+
+def apply_policy(existing, incoming, policy):
+    """
+    Copy ``incoming``'s values onto ``existing`` per ``policy``.
+    Returns the names of the fields that changed.
+    """
+    changed = []
+    for field in MERGE_FIELDS:
+        old, new = getattr(existing, field), getattr(incoming, field)
+        if not new or old == new:
+            continue
+        if policy == 'update' or not old:
+            setattr(existing, field, new)
+        elif field == 'notes' and new not in old:
+            setattr(existing, field, f'{old}\n{new}')
+        else:
+            continue
+        changed.append(field)
+
+    if changed:
+        existing.normalize()
+    return changed
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        root = self.parent.setdefault(item, item)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        # Path compression
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # Keep the oldest contact (lowest id) as the root
+            if b < a:
+                a, b = b, a
+            self.parent[b] = a
+
+
+def find_clusters(queryset):
+    """
+    Group ``queryset`` (one user's contacts) into duplicate clusters.
+    Returns lists of contact ids, oldest first, for clusters of two or more.
+    One pass over the rows; memory is one dict entry per distinct key.
+    """
+    clusters = UnionFind()
+    first_seen = {}
+    rows = queryset.order_by('id').values_list('id', 'phone_normalized', 'email_normalized')
+    for pk, phone, email in rows.iterator(chunk_size=5000):
+        for key in match_keys(phone, email):
+            if key in first_seen:
+                clusters.union(first_seen[key], pk)
+            else:
+                first_seen[key] = pk
+
+    groups = {}
+    for pk in clusters.parent:
+        groups.setdefault(clusters.find(pk), []).append(pk)
+    return [sorted(ids) for ids in groups.values() if len(ids) > 1]
+
+
+def merge_cluster(contacts):
+    """
+    Merge ``contacts`` into the first one: blank fields are filled in from
+    the others, notes are combined, favorites are kept, and the others are
+    deleted. Returns the surviving contact.
+    """
+    primary, *duplicates = contacts
+    with transaction.atomic():
+        for duplicate in duplicates:
+            apply_policy(primary, duplicate, 'merge')
+            primary.is_favorite = primary.is_favorite or duplicate.is_favorite
+        primary.save()
+        for duplicate in duplicates:
+            duplicate.delete()
+    return primary
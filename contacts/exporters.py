@@ -0,0 +1,84 @@
+"""
+Streaming export helpers.
+
+Rows are read with ``values_list().iterator()`` so neither model instances
+nor the full result set are held in memory, and the export format's writer
+(see contacts.formats) produces the text incrementally for
+``StreamingHttpResponse``. ``gzip_stream`` compresses the chunks as they
+are produced.
+"""
+import zlib
+
+from django.conf import settings
+
+from .formats import EXPORT_FIELDS
+
+
+def iter_export_values(queryset, chunk_size=None, fields=EXPORT_FIELDS):
+    """Yield ``fields`` tuples for ``queryset``, ``chunk_size`` rows per fetch."""
+    chunk_size = chunk_size or settings.CONTACTS_EXPORT_CHUNK_SIZE
+    return queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def stream_export(queryset, format, chunk_size=None):
+    """
+    Yield the ``format`` document for ``queryset`` as strings.
+    Records are grouped per database chunk to keep the number of writes low.
+    """
+    chunk_size = chunk_size or settings.CONTACTS_EXPORT_CHUNK_SIZE
+    header = format.header()
+    if header:
+        yield header
+
+    lines = []
+    for values in iter_export_values(queryset, chunk_size, format.fields):
+        lines.append(format.record(values))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+async def astream_export(queryset, format, chunk_size=None):
+    """Async version of stream_export(), reading rows with ``aiterator()``."""
+    chunk_size = chunk_size or settings.CONTACTS_EXPORT_CHUNK_SIZE
+    header = format.header()
+    if header:
+        yield header
+
+    lines = []
+    # values(), not values_list(): in Django 5.1 values_list().aiterator()
+    # runs the query outside sync_to_async and fails in an async context
+    async for values in queryset.values(*format.fields).aiterator(chunk_size=chunk_size):
+        lines.append(format.record(tuple(values.values())))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def gzip_compressor():
+    # wbits=31: gzip container rather than a raw zlib stream
+    return zlib.compressobj(6, zlib.DEFLATED, 31)
+
+
+def gzip_stream(chunks):
+    """Gzip the text ``chunks`` on the fly, yielding bytes."""
+    compressor = gzip_compressor()
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def agzip_stream(chunks):
+    """Async version of gzip_stream()."""
+    compressor = gzip_compressor()
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
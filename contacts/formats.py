@@ -0,0 +1,298 @@
+"""
+Contact file formats: CSV, NDJSON and vCard 3.0/4.0.
+
+Each format is a codec with both directions:
+
+* ``reader(text)`` parses an upload incrementally from a text stream and
+  yields one dict per record, keyed by the CSV column names ContactImporter
+  expects (``RECORD_FIELDS``). A record that cannot be parsed is yielded
+  as a ``ValidationError`` so the importer reports it like an invalid row.
+* ``header()`` and ``record(values)`` turn export rows (tuples of the
+  format's ``fields``, ``EXPORT_FIELDS``) into text one record at a time
+  (see contacts.exporters).
+
+Any format may be gzip-compressed: uploads are recognized by their magic
+bytes, and exports are compressed on request. Formats are looked up by
+name (``FORMATS``) or by file name (``for_filename``).
+"""
+import csv
+import json
+import re
+
+from django.core.exceptions import ValidationError
+
+
+RECORD_FIELDS = ('Name', 'Phone', 'Email', 'Company', 'Notes')
+EXPORT_HEADER = ['Name', 'Phone', 'Email', 'Company', 'Notes', 'Favorite', 'Created At']
+EXPORT_FIELDS = ('name', 'phone', 'email', 'company', 'notes', 'is_favorite', 'created_at')
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+class Echo:
+    """File-like object whose write() returns the value instead of storing it."""
+    def write(self, value):
+        return value
+
+
+def export_row(values):
+    """Convert one ``values_list`` tuple into a CSV row."""
+    name, phone, email, company, notes, is_favorite, created_at = values
+    return [
+        name,
+        phone,
+        email,
+        company,
+        notes,
+        'Yes' if is_favorite else 'No',
+        created_at.strftime('%Y-%m-%d %H:%M'),
+    ]
+
+
+class CSVFormat:
+    name = 'csv'
+    extensions = ('csv',)
+    content_type = 'text/csv'
+    fields = EXPORT_FIELDS
+
+    def __init__(self):
+        self.writer = csv.writer(Echo())
+
+    def reader(self, text):
+        return csv.DictReader(text)
+
+    def header(self):
+        return self.writer.writerow(EXPORT_HEADER)
+
+    def record(self, values):
+        return self.writer.writerow(export_row(values))
+
+
+class NDJSONReader:
+    """
+    One JSON object per line. Keys are the export's field names (``name``,
+    ``phone``...) or the CSV column names; blank lines are ignored.
+    """
+    fieldnames = RECORD_FIELDS
+    first_row = 1
+
+    def __init__(self, text):
+        self.text = text
+
+    def __iter__(self):
+        for line in self.text:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield ValidationError(f'Invalid JSON: {e}')
+                continue
+            if not isinstance(record, dict):
+                yield ValidationError('Expected a JSON object')
+                continue
+            yield {column: self.value(record, column) for column in RECORD_FIELDS}
+
+    @staticmethod
+    def value(record, column):
+        value = record.get(column.lower(), record.get(column))
+        return '' if value is None else str(value)
+
+
+class NDJSONFormat:
+    name = 'ndjson'
+    extensions = ('ndjson', 'jsonl')
+    content_type = 'application/x-ndjson'
+    fields = EXPORT_FIELDS
+
+    def reader(self, text):
+        return NDJSONReader(text)
+
+    def header(self):
+        return ''
+
+    def record(self, values):
+        record = dict(zip(EXPORT_FIELDS, values))
+        record['created_at'] = record['created_at'].isoformat()
+        return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def escape_vcard(value):
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def unescape_vcard(value):
+    return re.sub(r'\\(.)', lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value)
+
+
+def fold_vcard_line(line):
+    """Split ``line`` into CRLF-terminated lines of at most 75 octets."""
+    # A character takes at most 4 octets
+    if len(line) <= 18 or len(line.encode()) <= 75:
+        return line + '\r\n'
+    lines = []
+    current, size = '', 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > 75:
+            lines.append(current)
+            # Continuation lines start with a space, which counts
+            current, size = ' ', 1
+        current += char
+        size += width
+    lines.append(current)
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def unfold_vcard(text):
+    """Yield the logical lines of a vCard stream."""
+    pending = None
+    for line in text:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending += line[1:]
+            continue
+        if pending:
+            yield pending
+        pending = line
+    if pending:
+        yield pending
+
+
+def parse_vcard_line(line):
+    """
+    ``(NAME, value)`` of a content line, ignoring its parameters; a group
+    prefix (``item1.``) is dropped. Parameter values may be quoted and
+    contain colons.
+    """
+    quoted = False
+    for index, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            break
+    else:
+        return None
+    name = line[:index].split(';', 1)[0]
+    return name.rpartition('.')[2].upper(), line[index + 1:]
+
+
+class VCardReader:
+    """
+    Cards of a vCard 3.0 or 4.0 file; each card is one record. Uses FN (or
+    N), the first TEL and EMAIL, the first ORG component and NOTE.
+    """
+    fieldnames = RECORD_FIELDS
+    first_row = 1
+
+    def __init__(self, text):
+        self.text = text
+
+    def __iter__(self):
+        card = None
+        for line in unfold_vcard(self.text):
+            parsed = parse_vcard_line(line)
+            if parsed is None:
+                continue
+            name, value = parsed
+            if name == 'BEGIN' and value.strip().upper() == 'VCARD':
+                if card is not None:
+                    yield ValidationError('vCard is missing END:VCARD')
+                card = {}
+            elif name == 'END' and value.strip().upper() == 'VCARD' and card is not None:
+                yield self.record(card)
+                card = None
+            elif card is not None:
+                card.setdefault(name, value)
+        if card is not None:
+            yield ValidationError('vCard is missing END:VCARD')
+
+    @staticmethod
+    def record(card):
+        name = unescape_vcard(card.get('FN', '')).strip()
+        if not name and 'N' in card:
+            # family;given;additional;prefix;suffix
+            parts = [unescape_vcard(part).strip() for part in re.split(r'(?<!\\);', card['N'])]
+            name = ' '.join(part for part in parts[3:4] + parts[1:3] + parts[0:1] + parts[4:5] if part)
+        phone = unescape_vcard(card.get('TEL', ''))
+        # vCard 4.0 tel: URIs; numbers are often written with spaces and dashes
+        phone = re.sub(r'[\s().-]', '', phone.removeprefix('tel:'))
+        company = re.split(r'(?<!\\);', card.get('ORG', ''))[0]
+        return {
+            'Name': name,
+            'Phone': phone,
+            'Email': unescape_vcard(card.get('EMAIL', '')).removeprefix('mailto:'),
+            'Company': unescape_vcard(company),
+            'Notes': unescape_vcard(card.get('NOTE', '')),
+        }
+
+
+class VCardFormat:
+    extensions = ('vcf', 'vcard')
+    content_type = 'text/vcard'
+    fields = EXPORT_FIELDS
+
+    def __init__(self, name, version):
+        self.name = name
+        self.version = version
+
+    def reader(self, text):
+        # The reader handles both versions
+        return VCardReader(text)
+
+    def header(self):
+        return ''
+
+    def record(self, values):
+        name, phone, email, company, notes, is_favorite, created_at = values
+        given, _, family = name.rpartition(' ')
+        lines = [
+            'BEGIN:VCARD',
+            f'VERSION:{self.version}',
+            f'FN:{escape_vcard(name)}',
+            f'N:{escape_vcard(family)};{escape_vcard(given)};;;',
+        ]
+        if self.version == '4.0':
+            lines.append(f'TEL;VALUE=uri;TYPE=cell:tel:{phone}')
+        else:
+            lines.append(f'TEL;TYPE=CELL:{phone}')
+        if email:
+            lines.append(f'EMAIL:{escape_vcard(email)}' if self.version == '4.0' else f'EMAIL;TYPE=INTERNET:{escape_vcard(email)}')
+        if company:
+            lines.append(f'ORG:{escape_vcard(company)}')
+        if notes:
+            lines.append(f'NOTE:{escape_vcard(notes)}')
+        if is_favorite:
+            lines.append('CATEGORIES:Favorites')
+        lines.append('END:VCARD')
+        return ''.join(fold_vcard_line(line) for line in lines)
+
+
+FORMATS = {
+    'csv': CSVFormat(),
+    'ndjson': NDJSONFormat(),
+    'vcf': VCardFormat('vcf', '4.0'),
+    'vcf3': VCardFormat('vcf3', '3.0'),
+}
+# Formats picked by upload file name; vCard 3.0 and 4.0 share a reader
+UPLOAD_FORMATS = ('csv', 'ndjson', 'vcf')
+
+
+def for_filename(filename):
+    """The format of an upload named ``filename`` (``.gz`` allowed), or None."""
+    name = filename.lower().removesuffix('.gz')
+    extension = name.rpartition('.')[2]
+    for format_name in UPLOAD_FORMATS:
+        if extension in FORMATS[format_name].extensions:
+            return FORMATS[format_name]
+    return None
+
+
+def is_gzip(raw):
+    """Whether the seekable binary file ``raw`` holds gzip data."""
+    magic = raw.read(len(GZIP_MAGIC))
+    raw.seek(0)
+    return magic == GZIP_MAGIC
@@ -0,0 +1,227 @@
+"""
+Batched import engine for contacts.
+
+Rows come from a ``csv.DictReader`` or another format's reader (see
+contacts.formats), as dicts keyed by the CSV column names. They are
+validated with the same field rules as ``ContactForm`` and written
+with ``bulk_create`` in chunks, all inside a single transaction (or one
+transaction per chunk for background jobs, see contacts.jobs).
+"""
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .dedup import MERGE_FIELDS, POLICIES, DuplicateIndex, apply_policy
+from .forms import ContactForm
+from .models import Contact
+from .signals import contacts_bulk_created, contacts_bulk_updated
+
+
+class CSVImportError(Exception):
+    """Raised when a CSV file cannot be imported at all (bad headers, etc.)."""
+
+
+class ImportResult:
+    """
+    Summary of an import run: counts plus per-row error messages.
+    Rows matching an existing contact count as updated (the contact was
+    changed) or duplicate (it was left alone).
+    """
+    def __init__(self):
+        self.imported_count = 0
+        self.skipped_count = 0
+        self.updated_count = 0
+        self.duplicate_count = 0
+        self.errors = []
+
+    def add_error(self, row_num, message):
+        self.skipped_count += 1
+        self.errors.append(f"Row {row_num}: {message}")
+
+
+class ContactImporter:
+    """
+    Validate CSV rows and insert them as contacts for ``user``.
+
+    Valid rows are buffered and flushed with ``bulk_create`` every
+    ``batch_size`` rows. If a batch is rejected by the database, it is retried
+    row by row inside savepoints so the offending rows can be reported.
+    
+    Before a batch is written, rows are matched against the user's contacts
+    (and earlier rows of the file) by normalized phone/email, and handled
+    per the ``duplicates`` policy: 'skip', 'update', 'merge' or 'create'.
+    """
+    REQUIRED_HEADERS = {'Name', 'Phone'}
+
+    # CSV column -> (model field, max length kept from the raw value)
+    COLUMNS = {
+        'Name': ('name', 100),
+        'Phone': ('phone', 20),
+        'Email': ('email', 254),
+        'Company': ('company', 100),
+        'Notes': ('notes', None),
+    }
+
+    def __init__(self, user, batch_size=None, duplicates=None):
+        self.user = user
+        self.batch_size = batch_size or settings.CONTACTS_IMPORT_BATCH_SIZE
+        self.duplicates = duplicates or settings.CONTACTS_IMPORT_DUPLICATES
+        if self.duplicates not in POLICIES:
+            raise ValueError(f'Unknown duplicate policy: {self.duplicates}')
+        self.form_fields = ContactForm.base_fields
+        self.model_fields = {name: Contact._meta.get_field(name) for name in self.form_fields}
+
+    def check_headers(self, fieldnames):
+        """Raise CSVImportError if the header row is unusable."""
+        if fieldnames is None:
+            raise CSVImportError('CSV file appears to be empty.')
+
+        missing = self.REQUIRED_HEADERS - set(fieldnames)
+        if missing:
+            raise CSVImportError(f'CSV missing required columns: {", ".join(sorted(missing))}')
+
+    def clean_row(self, row):
+        """
+        Return cleaned model field values for a CSV row.
+        Runs the form field and model field validators, as ContactForm does.
+        Raises ValidationError with a readable message on invalid data.
+        """
+        # Readers yield a ValidationError for a record they could not parse
+        if isinstance(row, ValidationError):
+            raise row
+        data = {}
+        for column, (field_name, max_length) in self.COLUMNS.items():
+            value = (row.get(column) or '').strip()
+            if max_length:
+                value = value[:max_length]
+            data[field_name] = value
+
+        if not data['name'] or not data['phone']:
+            raise ValidationError('Missing name or phone')
+
+        cleaned = {}
+        for field_name, value in data.items():
+            form_field = self.form_fields[field_name]
+            try:
+                cleaned[field_name] = form_field.clean(value)
+                self.model_fields[field_name].run_validators(cleaned[field_name])
+            except ValidationError as e:
+                raise ValidationError(f"{form_field.label}: {' '.join(e.messages)}")
+        return cleaned
+
+    def build_contact(self, cleaned):
+        contact = Contact(user=self.user, **cleaned)
+        contact.normalize()
+        return contact
+
+    def run(self, reader, result=None, resume_after=0, on_checkpoint=None):
+        """
+        Import every row of a ``csv.DictReader`` or format reader.
+        Row numbers in error messages account for a CSV header line;
+        readers without one set ``first_row = 1``.
+        
+        The whole import is one transaction unless ``on_checkpoint`` is
+        given: then every batch commits on its own together with whatever
+        ``on_checkpoint(result, last_row)`` writes, and ``resume_after``
+        skips the rows an interrupted run already committed.
+        """
+        self.check_headers(reader.fieldnames)
+        result = result or ImportResult()
+        batch = []
+        rows_read = 0
+        row_num = resume_after
+        
+        with transaction.atomic() if on_checkpoint is None else nullcontext():
+            for row_num, row in enumerate(reader, start=getattr(reader, 'first_row', 2)):  # 1 is the CSV header
+                if row_num <= resume_after:
+                    continue
+                
+                rows_read += 1
+                try:
+                    batch.append((row_num, self.build_contact(self.clean_row(row))))
+                except ValidationError as e:
+                    result.add_error(row_num, ' '.join(e.messages))
+                
+                if rows_read >= self.batch_size:
+                    self.commit(batch, result, row_num, on_checkpoint)
+                    batch = []
+                    rows_read = 0
+            
+            if rows_read:
+                self.commit(batch, result, row_num, on_checkpoint)
+        
+        return result
+    
+    def commit(self, batch, result, last_row, on_checkpoint=None):
+        """Write ``batch`` and record the checkpoint in one transaction."""
+        with transaction.atomic():
+            if batch and self.duplicates != 'create':
+                batch = self.resolve_duplicates(batch, result)
+            if batch:
+                self.flush(batch, result)
+            if on_checkpoint is not None:
+                on_checkpoint(result, last_row)
+    
+    def resolve_duplicates(self, batch, result):
+        """
+        Apply the duplicate policy to ``batch`` and return the rows that
+        should still be inserted. Matches come from one indexed query per
+        key type; each row is then a dict lookup.
+        """
+        index = DuplicateIndex()
+        index.load(
+            Contact.objects.filter(user=self.user),
+            [contact for _, contact in batch],
+            keys_only=self.duplicates == 'skip',
+        )
+        
+        new_rows = []
+        updated = {}
+        for row_num, contact in batch:
+            existing = index.find(contact)
+            if existing is None:
+                index.add(contact)
+                new_rows.append((row_num, contact))
+            elif (self.duplicates != 'skip' and apply_policy(existing, contact, self.duplicates)
+                    and existing.pk is not None):
+                updated[existing.pk] = existing
+            else:
+                # Skipped, unchanged, or folded into an earlier row of the file
+                result.duplicate_count += 1
+        
+        if updated:
+            contacts = list(updated.values())
+            now = timezone.now()
+            for contact in contacts:
+                contact.updated_at = now
+            Contact.objects.bulk_update(
+                contacts, [*MERGE_FIELDS, 'phone_normalized', 'email_normalized', 'name_key', 'company_key', 'updated_at']
+            )
+            result.updated_count += len(contacts)
+            # bulk_update skips post_save as well
+            contacts_bulk_updated.send(sender=Contact, user=self.user, contacts=contacts)
+        return new_rows
+    
+    def flush(self, batch, result):
+        """Write one batch, falling back to per-row inserts on failure."""
+        try:
+            with transaction.atomic():
+                contacts = Contact.objects.bulk_create([contact for _, contact in batch])
+            result.imported_count += len(batch)
+            # bulk_create skips post_save, so announce the batch explicitly
+            contacts_bulk_created.send(sender=Contact, user=self.user, contacts=contacts)
+            return
+        except DatabaseError:
+            pass
+
+        for row_num, contact in batch:
+            try:
+                with transaction.atomic():
+                    contact.pk = None
+                    contact.save(force_insert=True)
+                result.imported_count += 1
+            except DatabaseError as e:
+                result.add_error(row_num, str(e))
@@ -0,0 +1,372 @@
+"""
+Opt-in request instrumentation (CONTACTS_PERF_ENABLED).
+
+``InstrumentationMiddleware`` records, for every request, the number of SQL
+queries and their total time (through an execute wrapper installed on
+every database connection), template render time, view time and total time.
+Measurements are aggregated per URL name into mergeable log-scale
+histograms, so p50/p95/p99 come out of a few hundred counters per view
+instead of raw samples. Code run by a request can add named counters with
+``count()`` (e.g. cache hits and misses); ``<name>_hits``/``<name>_misses``
+pairs are reported as ``<name>_hit_rate``. Queries are also counted per
+database alias (``db_queries_default``, ``db_queries_replica1``, ...).
+
+Each process keeps its own histograms and periodically writes a snapshot to
+the cache (CONTACTS_PERF_CACHE); the staff endpoint and ``manage.py
+perf_report`` merge the snapshots of all processes. Use a shared cache
+backend (file, Redis, memcached) to see more than one process.
+"""
+import math
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template as DjangoTemplate
+
+
+METRICS = ('total', 'view', 'sql', 'template')
+REGISTRY_KEY = 'contacts:perf:processes'
+SNAPSHOT_TIMEOUT = 24 * 3600
+
+_current = ContextVar('contacts_perf_request', default=None)
+
+
+class Histogram:
+    """
+    Log-scale histogram of non-negative values. Bucket bounds grow by
+    ``GROWTH``, so percentiles are accurate to about 5%; histograms from
+    several processes merge by adding bucket counts.
+    """
+    GROWTH = 1.1
+    # Values at or below this share the first bucket; zero has its own
+    MINIMUM = 0.01
+
+    def __init__(self, buckets=None, count=0, total=0.0):
+        self.buckets = Counter({int(index): n for index, n in (buckets or {}).items()})
+        self.count = count
+        self.total = total
+
+    def bucket(self, value):
+        if value <= 0:
+            return -1
+        if value <= self.MINIMUM:
+            return 0
+        return math.ceil(math.log(value / self.MINIMUM, self.GROWTH))
+
+    def add(self, value):
+        self.buckets[self.bucket(value)] += 1
+        self.count += 1
+        self.total += value
+
+    def merge(self, other):
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, percent):
+        """Upper bound of the bucket holding the ``percent``-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self.MINIMUM * self.GROWTH ** index if index >= 0 else 0.0
+        return 0.0
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {'buckets': dict(self.buckets), 'count': self.count, 'total': self.total}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['buckets'], data['count'], data['total'])
+
+
+class ViewStats:
+    """Histograms for one URL name."""
+    def __init__(self):
+        self.timings = {metric: Histogram() for metric in METRICS}
+        # Query counts are small integers, kept exactly
+        self.queries = Counter()
+        # Totals of the requests' count() counters
+        self.counters = Counter()
+
+    @property
+    def requests(self):
+        return self.timings['total'].count
+
+    def add(self, record):
+        for metric in METRICS:
+            self.timings[metric].add(record.timings[metric])
+        self.queries[record.query_count] += 1
+        self.counters.update(record.counters)
+
+    def merge(self, other):
+        for metric in METRICS:
+            self.timings[metric].merge(other.timings[metric])
+        self.queries.update(other.queries)
+        self.counters.update(other.counters)
+
+    def query_percentile(self, percent):
+        rank = math.ceil(self.requests * percent / 100)
+        seen = 0
+        for count in sorted(self.queries):
+            seen += self.queries[count]
+            if seen >= rank:
+                return count
+        return 0
+
+    def summary(self):
+        """Flat dict of the figures shown by the endpoint and perf_report."""
+        row = {'requests': self.requests}
+        for metric in METRICS:
+            histogram = self.timings[metric]
+            row[f'{metric}_mean_ms'] = round(histogram.mean, 2)
+            for percent in (50, 95, 99):
+                row[f'{metric}_p{percent}_ms'] = round(histogram.percentile(percent), 2)
+        total_queries = sum(count * n for count, n in self.queries.items())
+        row['queries_mean'] = round(total_queries / self.requests, 1) if self.requests else 0
+        for percent in (50, 95, 99):
+            row[f'queries_p{percent}'] = self.query_percentile(percent)
+        for name, total in sorted(self.counters.items()):
+            row[name] = total
+            if name.endswith('_hits'):
+                prefix = name[:-len('_hits')]
+                lookups = total + self.counters[f'{prefix}_misses']
+                row[f'{prefix}_hit_rate'] = round(total / lookups, 3) if lookups else 0.0
+        return row
+
+    def to_dict(self):
+        return {
+            'timings': {metric: histogram.to_dict() for metric, histogram in self.timings.items()},
+            'queries': dict(self.queries),
+            'counters': dict(self.counters),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.timings = {metric: Histogram.from_dict(data['timings'][metric]) for metric in METRICS}
+        stats.queries = Counter({int(count): n for count, n in data['queries'].items()})
+        # Snapshots written before counters were added have none
+        stats.counters = Counter(data.get('counters', {}))
+        return stats
+
+
+class RequestRecord:
+    """Measurements for the request being handled."""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.query_count = 0
+        self.timings = dict.fromkeys(METRICS, 0.0)
+        self.counters = Counter()
+
+    def elapsed_ms(self, since):
+        return (time.perf_counter() - since) * 1000
+
+
+class Recorder:
+    """This process's aggregated stats, flushed to the cache periodically."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.last_flush = time.monotonic()
+        self.key = f'contacts:perf:{socket.gethostname()}:{os.getpid()}:{int(time.time())}'
+
+    def add(self, url_name, record):
+        with self.lock:
+            self.views.setdefault(url_name, ViewStats()).add(record)
+            due = time.monotonic() - self.last_flush >= settings.CONTACTS_PERF_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {name: stats.to_dict() for name, stats in self.views.items()}
+
+    def flush(self):
+        """Write this process's stats to the cache and register the process."""
+        cache = get_cache()
+        with self.lock:
+            self.last_flush = time.monotonic()
+        cache.set(self.key, self.snapshot(), SNAPSHOT_TIMEOUT)
+        registry = cache.get(REGISTRY_KEY) or []
+        if self.key not in registry:
+            # Concurrent registrations can drop a key; it is re-added next flush
+            cache.set(REGISTRY_KEY, registry + [self.key], SNAPSHOT_TIMEOUT)
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+
+recorder = Recorder()
+
+
+def get_cache():
+    return caches[settings.CONTACTS_PERF_CACHE]
+
+
+def is_shared(cache=None):
+    """
+    Whether other processes (e.g. ``manage.py perf_report``) can read what
+    is stored in ``cache`` (default: the snapshots' cache).
+    """
+    return not isinstance(cache or get_cache(), (LocMemCache, DummyCache))
+
+
+def collect():
+    """Merge the stats of every process that flushed to the cache."""
+    cache = get_cache()
+    merged = {}
+    registry = cache.get(REGISTRY_KEY) or []
+    snapshots = cache.get_many(registry)
+    if recorder.key not in snapshots and recorder.views:
+        snapshots[recorder.key] = recorder.snapshot()
+    for snapshot in snapshots.values():
+        for name, data in snapshot.items():
+            merged.setdefault(name, ViewStats()).merge(ViewStats.from_dict(data))
+    return merged
+
+
+def report():
+    """``[{'url_name': ..., 'requests': ..., ...}]``, slowest p95 first."""
+    rows = [{'url_name': name, **stats.summary()} for name, stats in collect().items()]
+    return sorted(rows, key=lambda row: row['total_p95_ms'], reverse=True)
+
+
+def reset():
+    """Clear the stats of this process and of every registered process."""
+    cache = get_cache()
+    cache.delete_many((cache.get(REGISTRY_KEY) or []) + [REGISTRY_KEY])
+    recorder.reset()
+
+
+def count(name, n=1):
+    """Add ``n`` to the current request's counter ``name``, if it is recorded."""
+    record = _current.get()
+    if record is not None and n:
+        record.counters[name] += n
+
+
+def _record_query(execute, sql, params, many, context):
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.query_count += 1
+        record.counters[f'db_queries_{context["connection"].alias}'] += 1
+        record.timings['sql'] += record.elapsed_ms(started)
+
+
+_original_render = DjangoTemplate.render
+
+
+def _timed_render(self, context=None, request=None):
+    record = _current.get()
+    if record is None:
+        return _original_render(self, context, request)
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        record.timings['template'] += record.elapsed_ms(started)
+
+
+def server_timing(record):
+    return ', '.join([
+        f'db;dur={record.timings["sql"]:.1f};desc="{record.query_count} queries"',
+        f'tpl;dur={record.timings["template"]:.1f}',
+        f'view;dur={record.timings["view"]:.1f}',
+        f'total;dur={record.timings["total"]:.1f}',
+    ])
+
+
+def install_query_recorder(connection, **kwargs):
+    """
+    Add ``_record_query`` to ``connection``; it only measures while a
+    request is being recorded. Installed per connection rather than per
+    request because async views run their queries on connections of
+    other threads.
+    """
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class InstrumentationMiddleware:
+    """
+    Measure each request and add it to the per-URL-name stats.
+    Put it first in MIDDLEWARE so "total" covers the other middleware.
+    Runs natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.CONTACTS_PERF_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # Top-level renders only; {% include %} goes through django.template.base
+        DjangoTemplate.render = _timed_render
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        record = RequestRecord()
+        token = _current.set(record)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, record, response)
+
+    async def __acall__(self, request):
+        record = RequestRecord()
+        token = _current.set(record)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, record, response)
+
+    def finish(self, request, record, response):
+        record.timings['total'] = record.elapsed_ms(record.started)
+        if record.view_started is not None:
+            record.timings['view'] = record.elapsed_ms(record.view_started)
+
+        match = request.resolver_match
+        recorder.add(match.view_name if match else '<unresolved>', record)
+        if settings.CONTACTS_PERF_SERVER_TIMING:
+            response['Server-Timing'] = server_timing(record)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        record = _current.get()
+        if record is not None:
+            record.view_started = time.perf_counter()
@@ -0,0 +1,213 @@
+"""
+Background import jobs.
+
+Uploads are saved under ``CONTACTS_IMPORT_ROOT`` and recorded as ImportJob
+rows. A job runs in a thread pool inside the web process
+(``CONTACTS_IMPORT_MODE='thread'``), in ``manage.py run_import_worker``,
+which polls the table for pending jobs (``'queue'``), or inside the upload
+request itself (``'sync'``, the default on Vercel).
+
+A job whose process died (a crash, a restart) stays running without
+progress. The worker requeues such jobs on every poll; in thread mode the
+job page's status polls do it (``revive``).
+
+Every imported batch commits together with the job's progress, so the
+status endpoint sees rows as they land, and a job interrupted by a crash is
+resumed after its last committed batch instead of importing rows twice.
+"""
+import csv
+import gzip
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .charsets import open_text
+from .formats import FORMATS, for_filename, is_gzip
+from .importers import ContactImporter, CSVImportError, ImportResult
+from .models import ImportJob
+
+
+logger = logging.getLogger(__name__)
+
+# Row errors kept on the job for display
+MAX_STORED_ERRORS = 100
+READ_CHUNK_SIZE = 1024 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class CountingReader(io.RawIOBase):
+    """
+    Binary file wrapper that counts the bytes read through it, failing the
+    import once more than ``limit`` bytes were read.
+    """
+    def __init__(self, raw, limit=None):
+        self.raw = raw
+        self.limit = limit
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.raw.read(len(buffer))
+        buffer[:len(data)] = data
+        self.bytes_read += len(data)
+        if self.limit is not None and self.bytes_read > self.limit:
+            raise CSVImportError(f'File content exceeds {self.limit // (1024 * 1024)}MB when uncompressed.')
+        return len(data)
+
+
+def create_job(user, upload, duplicates=None):
+    """Save ``upload`` to disk and record a pending job for it."""
+    job = ImportJob(
+        user=user,
+        original_name=upload.name[:255],
+        size=upload.size,
+        duplicate_policy=duplicates or settings.CONTACTS_IMPORT_DUPLICATES,
+    )
+    job.file.save(upload.name, upload, save=False)
+    job.save()
+    return job
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.CONTACTS_IMPORT_WORKERS,
+                thread_name_prefix='contact-import',
+            )
+    return _executor
+
+
+def enqueue(job):
+    """Start ``job`` according to CONTACTS_IMPORT_MODE."""
+    mode = settings.CONTACTS_IMPORT_MODE
+    if mode == 'thread':
+        transaction.on_commit(lambda: get_executor().submit(run_job, job.pk))
+    elif mode == 'sync':
+        process(claim(job.pk))
+    # 'queue': left pending for run_import_worker
+
+
+def claim(job_id=None):
+    """
+    Mark the oldest pending job (or ``job_id``) as running and return it.
+    The status check in the UPDATE makes concurrent workers skip each
+    other's jobs. Returns None when there is nothing to claim.
+    """
+    pending = ImportJob.objects.filter(status=ImportJob.PENDING)
+    if job_id is not None:
+        pending = pending.filter(pk=job_id)
+
+    for pk in pending.order_by('created_at').values_list('pk', flat=True)[:10]:
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(pk=pk, status=ImportJob.PENDING).update(
+            status=ImportJob.RUNNING, started_at=now, updated_at=now,
+        )
+        if claimed:
+            return ImportJob.objects.select_related('user').get(pk=pk)
+    return None
+
+
+def requeue_stale(timeout, job_id=None):
+    """Return running jobs (or ``job_id``) with no progress for ``timeout`` seconds to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    stale = ImportJob.objects.filter(status=ImportJob.RUNNING, updated_at__lt=cutoff)
+    if job_id is not None:
+        stale = stale.filter(pk=job_id)
+    return stale.update(status=ImportJob.PENDING, updated_at=timezone.now())
+
+
+def revive(job):
+    """
+    In thread mode, restart ``job`` if it has made no progress for
+    CONTACTS_IMPORT_STALE_AFTER seconds: the process running it, or the one
+    that was to start it, is gone. It resumes after its last committed batch.
+    Returns whether the job was restarted.
+    """
+    if settings.CONTACTS_IMPORT_MODE != 'thread' or job.finished:
+        return False
+    if job.updated_at >= timezone.now() - timedelta(seconds=settings.CONTACTS_IMPORT_STALE_AFTER):
+        return False
+    if job.status == ImportJob.RUNNING and not requeue_stale(settings.CONTACTS_IMPORT_STALE_AFTER, job.pk):
+        return False
+    # claim() lets only one of concurrent revivals run it
+    get_executor().submit(run_job, job.pk)
+    return True
+
+
+def finish(job, status, error_message=''):
+    ImportJob.objects.filter(pk=job.pk).update(
+        status=status,
+        error_message=error_message,
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    job.file.delete(save=False)
+
+
+def process(job):
+    """Import a claimed job's file, resuming after its last committed row."""
+    result = ImportResult()
+    result.imported_count = job.imported_count
+    result.skipped_count = job.skipped_count
+    result.updated_count = job.updated_count
+    result.duplicate_count = job.duplicate_count
+    result.errors = list(job.errors)
+
+    try:
+        with job.file.open('rb') as raw:
+            compressed = is_gzip(raw)
+            # Progress is measured on the stored file, compressed or not
+            counter = CountingReader(raw)
+            binary = io.BufferedReader(counter, READ_CHUNK_SIZE)
+            if compressed:
+                binary = io.BufferedReader(CountingReader(
+                    gzip.GzipFile(fileobj=binary), limit=settings.CONTACTS_IMPORT_MAX_FILE_SIZE,
+                ), READ_CHUNK_SIZE)
+            text = open_text(binary)
+
+            def checkpoint(result, last_row):
+                ImportJob.objects.filter(pk=job.pk).update(
+                    last_row=last_row,
+                    bytes_processed=counter.bytes_read,
+                    imported_count=result.imported_count,
+                    skipped_count=result.skipped_count,
+                    updated_count=result.updated_count,
+                    duplicate_count=result.duplicate_count,
+                    errors=result.errors[:MAX_STORED_ERRORS],
+                    updated_at=timezone.now(),
+                )
+
+            ContactImporter(job.user, duplicates=job.duplicate_policy).run(
+                (for_filename(job.original_name) or FORMATS['csv']).reader(text), result,
+                resume_after=job.last_row, on_checkpoint=checkpoint,
+            )
+    except (CSVImportError, csv.Error, gzip.BadGzipFile, EOFError) as e:
+        finish(job, ImportJob.FAILED, str(e))
+    except Exception as e:
+        logger.exception('Import job %s failed', job.pk)
+        finish(job, ImportJob.FAILED, f'Unexpected error: {e}')
+    else:
+        finish(job, ImportJob.DONE)
+
+
+def run_job(job_id):
+    """Thread pool entry point: claim and process one job."""
+    try:
+        job = claim(job_id)
+        if job is not None:
+            process(job)
+    finally:
+        # Worker threads open their own connections
+        connections.close_all()
@@ -0,0 +1,135 @@
+import json
+import platform
+import subprocess
+import sys
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from contacts.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = 'Run a contacts performance benchmark scenario and print the results.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS), help='Scenario to run')
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+            help='Number of contacts per run (default: 1000 10000 100000)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Override CONTACTS_IMPORT_BATCH_SIZE for import scenarios',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Repetitions per measurement; the median is reported',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Requests per page view in the http scenario (default: 200)',
+        )
+        parser.add_argument(
+            '--only', nargs='+', default=None,
+            help='Limit the http/servers scenarios to these names (e.g. list_first detail, uvicorn-async)',
+        )
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Reader processes in the concurrency scenario (default: 4)',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Seconds per run of the concurrency scenario (default: 10)',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Worker processes per server in the servers scenario (default: 1)',
+        )
+        parser.add_argument(
+            '--clients', type=int, default=16,
+            help='Concurrent clients in the servers scenario (default: 16)',
+        )
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Additional clients that send each request slowly (servers scenario)',
+        )
+        parser.add_argument(
+            '--slow-delay', type=float, default=0.5,
+            help='Seconds a slow client pauses mid-request (default: 0.5)',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random seed for generated data (default: 0)',
+        )
+        parser.add_argument(
+            '--baseline', action='store_true',
+            help='Also run the previous implementation for comparison',
+        )
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Print the results and the environment as JSON',
+        )
+        parser.add_argument(
+            '--output', default=None,
+            help='Also write the JSON results to this file',
+        )
+
+    def handle(self, *args, **options):
+        results = SCENARIOS[options['scenario']](options)
+
+        if options['json'] or options['output']:
+            document = json.dumps(self.build_report(options, results), indent=2)
+            if options['output']:
+                with open(options['output'], 'w') as output:
+                    output.write(document + '\n')
+            if options['json']:
+                self.stdout.write(document)
+                return
+
+        if not results:
+            self.stdout.write('No results.')
+            return
+
+        columns = list(dict.fromkeys(column for row in results for column in row))
+        widths = {
+            column: max(len(column), *(len(str(row.get(column, ''))) for row in results))
+            for column in columns
+        }
+        self.stdout.write('  '.join(column.ljust(widths[column]) for column in columns))
+        for row in results:
+            self.stdout.write('  '.join(str(row.get(column, '')).ljust(widths[column]) for column in columns))
+
+    def build_report(self, options, results):
+        """Results plus what is needed to compare them with another run."""
+        return {
+            'scenario': options['scenario'],
+            'commit': self.git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'environment': {
+                'python': sys.version.split()[0],
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'platform': platform.platform(),
+            },
+            'options': {
+                key: options[key]
+                for key in (
+                    'sizes', 'batch_size', 'repeat', 'requests', 'only',
+                    'threads', 'duration', 'workers', 'clients', 'slow_clients', 'slow_delay',
+                    'seed', 'baseline',
+                )
+            },
+            'results': results,
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from contacts.dedup import find_clusters, merge_cluster
+from contacts.models import Contact
+
+
+class Command(BaseCommand):
+    help = 'Find contacts sharing a normalized phone or email, and optionally merge them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='users', metavar='USERNAME',
+                            help='Only check this user (repeatable)')
+        parser.add_argument('--merge', action='store_true',
+                            help='Merge each cluster into its oldest contact')
+        parser.add_argument('--show', type=int, default=10,
+                            help='Clusters listed per user (default: 10)')
+
+    def handle(self, *args, **options):
+        users = get_user_model()._default_manager.order_by('pk')
+        if options['users']:
+            users = users.filter(username__in=options['users'])
+            if users.count() != len(set(options['users'])):
+                raise CommandError('Unknown user in --user.')
+
+        total_clusters = total_duplicates = 0
+        # One pass per user keeps memory bounded by the largest address book
+        for user in users.iterator():
+            clusters = find_clusters(Contact.objects.filter(user=user))
+            if not clusters:
+                continue
+
+            duplicates = sum(len(ids) - 1 for ids in clusters)
+            total_clusters += len(clusters)
+            total_duplicates += duplicates
+            self.stdout.write(f'{user}: {len(clusters)} cluster(s), {duplicates} duplicate contact(s)')
+
+            shown = {pk for ids in clusters[:options['show']] for pk in ids}
+            names = dict(Contact.objects.filter(pk__in=shown).values_list('pk', 'name'))
+            for ids in clusters[:options['show']]:
+                self.stdout.write('  ' + ', '.join(f'#{pk} {names.get(pk, "")}' for pk in ids))
+            if len(clusters) > options['show']:
+                self.stdout.write(f'  ...and {len(clusters) - options["show"]} more')
+
+            if options['merge']:
+                for ids in clusters:
+                    contacts = Contact.objects.in_bulk(ids)
+                    merge_cluster([contacts[pk] for pk in ids if pk in contacts])
+
+        if options['merge']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Merged {total_duplicates} duplicate(s) into {total_clusters} contact(s).'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Found {total_clusters} cluster(s) with {total_duplicates} duplicate(s).'
+            ))
@@ -0,0 +1,110 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# "import time:  self [us] |  cumulative | imported package", nested modules indented
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+# Python 3.10+
+STDLIB = getattr(sys, 'stdlib_module_names', frozenset())
+
+
+class Command(BaseCommand):
+    help = (
+        'Import a module (the WSGI entry point by default) in a fresh interpreter under '
+        '"python -X importtime" and report the slowest imports and the time per package.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--module', default='zenvio.wsgi',
+            help='Module to import (default: zenvio.wsgi, which also sets up Django and warms up)',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Imports listed per table (default: 20)',
+        )
+        parser.add_argument(
+            '--no-warm-start', action='store_true',
+            help='Import with WARM_START off',
+        )
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+
+    def handle(self, *args, **options):
+        imports = self.profile(options['module'], options['no_warm_start'])
+        report = self.report(imports, options['limit'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{report['modules']} modules imported in {report['total_ms']} ms\n")
+        self.table('Slowest imports, including what they import', report['cumulative'])
+        self.table('Slowest imports, on their own', report['self'])
+        self.table('Time per top-level package', report['packages'])
+
+    def profile(self, module, no_warm_start):
+        """``(depth, name, self_us, cumulative_us)`` per module imported by ``module``."""
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'zenvio.settings')}
+        if no_warm_start:
+            env['WARM_START'] = 'False'
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        if process.returncode:
+            raise CommandError(f'Importing {module} failed:\n{process.stderr[-2000:]}')
+
+        imports = []
+        for line in process.stderr.splitlines():
+            match = LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, name = match.groups()
+                imports.append((len(indent) // 2, name, int(self_us), int(cumulative_us)))
+        return imports
+
+    @staticmethod
+    def report(imports, limit):
+        packages = defaultdict(lambda: [0, 0])
+        for _, name, self_us, _ in imports:
+            top = name.split('.')[0]
+            package = packages['(stdlib)' if top in STDLIB else top]
+            package[0] += self_us
+            package[1] += 1
+
+        def row(depth, name, self_us, cumulative_us):
+            return {
+                'module': name,
+                'depth': depth,
+                'self_ms': round(self_us / 1000, 2),
+                'cumulative_ms': round(cumulative_us / 1000, 2),
+            }
+
+        return {
+            'modules': len(imports),
+            # Top-level imports add up to the total
+            'total_ms': round(sum(cumulative for depth, _, _, cumulative in imports if depth == 0) / 1000, 2),
+            'cumulative': [row(*item) for item in sorted(imports, key=lambda item: -item[3])[:limit]],
+            'self': [row(*item) for item in sorted(imports, key=lambda item: -item[2])[:limit]],
+            'packages': [
+                {'package': name, 'modules': count, 'self_ms': round(self_us / 1000, 2)}
+                for name, (self_us, count) in sorted(packages.items(), key=lambda item: -item[1][0])[:limit]
+            ],
+        }
+
+    def table(self, title, rows):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        if not rows:
+            self.stdout.write('  (none)\n')
+            return
+        columns = [column for column in rows[0] if column != 'depth']
+        widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+        self.stdout.write('  ' + '  '.join(column.ljust(widths[column]) for column in columns))
+        for row in rows:
+            self.stdout.write('  ' + '  '.join(str(row[column]).ljust(widths[column]) for column in columns))
+        self.stdout.write('')
@@ -0,0 +1,77 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from contacts import instrumentation
+
+
+class Command(BaseCommand):
+    help = 'Print per-view query counts and latency percentiles recorded by the instrumentation middleware.'
+
+    COLUMNS = [
+        ('url_name', 'view'),
+        ('requests', 'requests'),
+        ('total_p50_ms', 'p50 ms'),
+        ('total_p95_ms', 'p95 ms'),
+        ('total_p99_ms', 'p99 ms'),
+        ('sql_p95_ms', 'sql p95'),
+        ('template_p95_ms', 'tpl p95'),
+        ('queries_mean', 'queries'),
+        ('queries_p95', 'queries p95'),
+        ('databases', 'queries per database'),
+        ('hit_rates', 'cache hit rates'),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+        parser.add_argument('--reset', action='store_true', help='Clear the recorded stats afterwards')
+
+    def handle(self, *args, **options):
+        if not instrumentation.is_shared():
+            # The web processes' snapshots are in their own memory
+            raise CommandError(
+                f'The {settings.CONTACTS_PERF_CACHE!r} cache (CONTACTS_PERF_CACHE) is local to each process, '
+                'so no snapshots can be read from here. Set CACHE_BACKEND=file (or another shared backend) '
+                'for the web server and this command, or use the staff endpoint.'
+            )
+        if not settings.CONTACTS_PERF_ENABLED:
+            self.stderr.write(self.style.WARNING('CONTACTS_PERF_ENABLED is off; no new requests are recorded.'))
+
+        rows = instrumentation.report()
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+        elif not rows:
+            self.stdout.write('No requests recorded.')
+        else:
+            for row in rows:
+                row['hit_rates'] = self.hit_rates(row)
+                row['databases'] = self.databases(row)
+            widths = {
+                key: max(len(title), *(len(str(row[key])) for row in rows))
+                for key, title in self.COLUMNS
+            }
+            self.stdout.write('  '.join(title.ljust(widths[key]) for key, title in self.COLUMNS))
+            for row in rows:
+                self.stdout.write('  '.join(str(row[key]).ljust(widths[key]) for key, _ in self.COLUMNS))
+
+        if options['reset']:
+            instrumentation.reset()
+            self.stdout.write(self.style.SUCCESS('Stats cleared.'))
+
+    @staticmethod
+    def hit_rates(row):
+        """``'card 92% page 60%'`` from the row's ``<name>_hit_rate`` figures."""
+        suffix = '_hit_rate'
+        return ' '.join(
+            f'{key[:-len(suffix)]} {value:.0%}' for key, value in row.items() if key.endswith(suffix)
+        ) or '-'
+
+    @staticmethod
+    def databases(row):
+        """``'default 2.0 replica1 3.0'``: mean queries per request on each database alias."""
+        prefix = 'db_queries_'
+        return ' '.join(
+            f'{key[len(prefix):]} {value / row["requests"]:.1f}'
+            for key, value in row.items() if key.startswith(prefix)
+        ) or '-'
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from contacts.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete delta sync tombstones older than CONTACTS_SYNC_TOMBSTONE_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help=f'Keep this many days instead (default: {settings.CONTACTS_SYNC_TOMBSTONE_DAYS})')
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstone(s).'))
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from contacts.stats import rebuild_stats, verify_stats
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-user contact counters, or check them with --verify.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Compare the stored counters with a fresh count instead of rebuilding')
+        parser.add_argument('--user', action='append', dest='users', metavar='USERNAME',
+                            help='Only process this user (repeatable)')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to use')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        users = get_user_model()._default_manager.using(using).order_by('pk')
+        if options['users']:
+            users = users.filter(username__in=options['users'])
+            if users.count() != len(set(options['users'])):
+                raise CommandError('Unknown user in --user.')
+
+        mismatched = 0
+        for user_id, username in users.values_list('pk', 'username').iterator():
+            if not options['verify']:
+                rebuild_stats(user_id, using)
+                continue
+
+            differences = verify_stats(user_id, using)
+            if differences:
+                mismatched += 1
+                for field, stored, actual in differences:
+                    self.stdout.write(f'{username}: {field} is {stored}, expected {actual}')
+
+        if not options['verify']:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt counters for {users.count()} users.'))
+        elif mismatched:
+            raise CommandError(f'Counters are wrong for {mismatched} users; run rebuild_contact_stats.')
+        else:
+            self.stdout.write(self.style.SUCCESS('All counters match.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from contacts.search import ensure_search_index
+
+
+class Command(BaseCommand):
+    help = 'Repair the contact search index and repopulate it from the contacts table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to use')
+
+    def handle(self, *args, **options):
+        kind = ensure_search_index(options['database'], rebuild=True)
+        if kind is None:
+            self.stdout.write(self.style.WARNING(
+                'No search index is available for this database; searches use icontains.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Search index ready ({kind}).'))
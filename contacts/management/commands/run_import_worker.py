@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from contacts.jobs import claim, process, requeue_stale
+
+
+class Command(BaseCommand):
+    help = 'Process pending CSV import jobs (use with CONTACTS_IMPORT_MODE=queue).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when the queue is empty instead of polling')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds to wait between polls of an empty queue (default: 2)')
+        parser.add_argument('--stale-after', type=int, default=settings.CONTACTS_IMPORT_STALE_AFTER,
+                            help='Requeue running jobs with no progress for this many seconds '
+                                 '(default: CONTACTS_IMPORT_STALE_AFTER)')
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            close_old_connections()
+            requeued = requeue_stale(options['stale_after'])
+            if requeued:
+                self.stdout.write(self.style.WARNING(f'Requeued {requeued} stalled job(s).'))
+
+            job = claim()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f'Importing job {job.pk} ({job.original_name}) for {job.user}...')
+            process(job)
+            job.refresh_from_db()
+            processed += 1
+            self.stdout.write(
+                f'Job {job.pk} {job.status}: {job.imported_count} imported, {job.skipped_count} skipped.'
+                + (f' {job.error_message}' if job.error_message else '')
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} job(s).'))
@@ -0,0 +1,62 @@
+import secrets
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from contacts.benchmarks import seed_users
+
+
+class Command(BaseCommand):
+    help = 'Create users with generated contacts for benchmarks and local testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help='Number of users to create (default: 1)')
+        parser.add_argument('--per-user', type=int, default=1000, help='Contacts per user (default: 1000)')
+        parser.add_argument('--prefix', default='seed', help='Username prefix; users are named <prefix>-<n>')
+        parser.add_argument(
+            '--password',
+            help='Password of the created users (default: a random one, printed at the end)',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for generated data (default: 0)')
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete existing <prefix>-* users (and their contacts) first',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            # Users with a known or printed password don't belong on a live site
+            raise CommandError('seed_contacts only runs with DEBUG=True.')
+        if options['users'] < 1 or options['per_user'] < 0:
+            raise CommandError('--users must be at least 1 and --per-user at least 0.')
+
+        prefix = options['prefix']
+        existing = get_user_model().objects.filter(username__startswith=f'{prefix}-')
+        if options['clear']:
+            deleted = 0
+            for user in existing.iterator():
+                user.delete()
+                deleted += 1
+            self.stdout.write(f'Deleted {deleted} existing {prefix}-* users.')
+        elif existing.exists():
+            raise CommandError(f'{prefix}-* users already exist; use --clear or another --prefix.')
+
+        password = options['password'] or secrets.token_urlsafe(12)
+        start = time.perf_counter()
+        with transaction.atomic():
+            users = seed_users(
+                options['users'], options['per_user'],
+                prefix=prefix, seed=options['seed'], password=password,
+            )
+        elapsed = time.perf_counter() - start
+
+        total = len(users) * options['per_user']
+        rate = round(total / elapsed) if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users with {total} contacts in {elapsed:.1f}s ({rate} contacts/s).'
+        ))
+        if not options['password']:
+            self.stdout.write(f'Password of the {prefix}-* users: {password}')
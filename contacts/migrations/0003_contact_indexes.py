@@ -0,0 +1,49 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:36
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0002_alter_contact_options_contact_is_favorite'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contact',
+            name='company',
+            field=models.CharField(blank=True, db_index=True, max_length=100, verbose_name='Company'),
+        ),
+        migrations.AlterField(
+            model_name='contact',
+            name='email',
+            field=models.EmailField(blank=True, db_index=True, max_length=254, verbose_name='Email Address'),
+        ),
+        migrations.AlterField(
+            model_name='contact',
+            name='is_favorite',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Favorite'),
+        ),
+        migrations.AlterField(
+            model_name='contact',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='Full Name'),
+        ),
+        migrations.AlterField(
+            model_name='contact',
+            name='phone',
+            field=models.CharField(max_length=20, validators=[django.core.validators.RegexValidator(message="Phone number must be entered in format: '+999999999'. 9-15 digits allowed.", regex='^\\+?1?\\d{9,15}$')], verbose_name='Phone Number'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['user', '-is_favorite', '-created_at'], name='contacts_co_user_id_fa97a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['user', 'name'], name='contacts_co_user_id_1e9490_idx'),
+        ),
+    ]
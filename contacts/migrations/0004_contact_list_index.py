@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0003_contact_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='contact',
+            name='contacts_co_user_id_fa97a8_idx',
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['user', '-is_favorite', '-created_at', '-id'], name='contacts_co_user_id_e77ac8_idx'),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:53
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_contact_stats(apps, schema_editor):
+    """Create exact ContactStats rows for every user who has contacts."""
+    Contact = apps.get_model('contacts', 'Contact')
+    ContactStats = apps.get_model('contacts', 'ContactStats')
+    CompanyCount = apps.get_model('contacts', 'CompanyCount')
+    db = schema_editor.connection.alias
+
+    contacts = Contact.objects.using(db).order_by()
+    company_counts = (
+        contacts.exclude(company='')
+        .values_list('user_id', 'company')
+        .annotate(count=Count('id'))
+    )
+    CompanyCount.objects.using(db).bulk_create(
+        [CompanyCount(user_id=user_id, company=company, count=count) for user_id, company, count in company_counts],
+        batch_size=1000,
+    )
+
+    companies = dict(
+        CompanyCount.objects.using(db).order_by().values_list('user_id').annotate(count=Count('id'))
+    )
+    totals = contacts.values_list('user_id').annotate(
+        total=Count('id'),
+        favorites=Count('id', filter=Q(is_favorite=True)),
+    )
+    daily_created = {}
+    recent = (
+        contacts.filter(created_at__gte=timezone.now() - timedelta(days=31))
+        .annotate(day=TruncDate('created_at'))
+        .values_list('user_id', 'day')
+        .annotate(count=Count('id'))
+    )
+    for user_id, day, count in recent:
+        daily_created.setdefault(user_id, {})[day.isoformat()] = count
+
+    ContactStats.objects.using(db).bulk_create(
+        [
+            ContactStats(
+                user_id=user_id,
+                total=total,
+                favorites=favorites,
+                companies=companies.get(user_id, 0),
+                daily_created=daily_created.get(user_id, {}),
+            )
+            for user_id, total, favorites in totals
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('contacts', '0004_contact_list_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contact_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Owner')),
+                ('total', models.IntegerField(default=0, verbose_name='Contacts')),
+                ('favorites', models.IntegerField(default=0, verbose_name='Favorites')),
+                ('companies', models.IntegerField(default=0, verbose_name='Distinct Companies')),
+                ('daily_created', models.JSONField(blank=True, default=dict, verbose_name='Created Per Day')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Contact Stats',
+                'verbose_name_plural': 'Contact Stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='CompanyCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('company', models.CharField(max_length=100, verbose_name='Company')),
+                ('count', models.IntegerField(default=0, verbose_name='Contacts')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='company_counts', to=settings.AUTH_USER_MODEL, verbose_name='Owner')),
+            ],
+            options={
+                'verbose_name': 'Company Count',
+                'verbose_name_plural': 'Company Counts',
+                'constraints': [models.UniqueConstraint(fields=('user', 'company'), name='unique_company_count_per_user')],
+            },
+        ),
+        migrations.RunPython(backfill_contact_stats, migrations.RunPython.noop),
+    ]
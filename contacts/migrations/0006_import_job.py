@@ -0,0 +1,44 @@
+# Generated by Django 5.1.15 on 2026-10-18 12:59
+
+import contacts.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0005_contact_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(storage=contacts.models.import_storage, upload_to='%Y/%m/%d/', verbose_name='Upload')),
+                ('original_name', models.CharField(max_length=255, verbose_name='File Name')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='Status')),
+                ('size', models.BigIntegerField(default=0, verbose_name='Size (bytes)')),
+                ('bytes_processed', models.BigIntegerField(default=0, verbose_name='Bytes Processed')),
+                ('last_row', models.IntegerField(default=0, verbose_name='Last Row Processed')),
+                ('imported_count', models.IntegerField(default=0, verbose_name='Imported')),
+                ('skipped_count', models.IntegerField(default=0, verbose_name='Skipped')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Row Errors')),
+                ('error_message', models.TextField(blank=True, verbose_name='Failure')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Owner')),
+            ],
+            options={
+                'verbose_name': 'Import Job',
+                'verbose_name_plural': 'Import Jobs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='contacts_im_status_cec29f_idx')],
+            },
+        ),
+    ]
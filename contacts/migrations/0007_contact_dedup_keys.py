@@ -0,0 +1,92 @@
+# Generated by Django 5.1.15 on 2026-10-18 13:02
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# The normalization of contacts.dedup as it was when this migration was
+# written, with CONTACTS_DEFAULT_COUNTRY_CODE's default: later changes to
+# either must not change what this migration writes
+DEFAULT_COUNTRY_CODE = '1'
+
+
+def normalize_phone(phone):
+    phone = (phone or '').strip()
+    digits = re.sub(r'\D', '', phone)
+    if not digits:
+        return ''
+    if not phone.startswith('+'):
+        if digits.startswith('00'):
+            digits = digits[2:]
+        elif len(digits) == 10:
+            digits = DEFAULT_COUNTRY_CODE + digits
+    return '+' + digits
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def backfill_dedup_keys(apps, schema_editor):
+    """Fill the normalized phone/email columns of existing contacts."""
+    Contact = apps.get_model('contacts', 'Contact')
+    db = schema_editor.connection.alias
+
+    batch = []
+    rows = Contact.objects.using(db).only('id', 'phone', 'email').order_by()
+    for contact in rows.iterator(chunk_size=2000):
+        contact.phone_normalized = normalize_phone(contact.phone)
+        contact.email_normalized = normalize_email(contact.email)
+        batch.append(contact)
+        if len(batch) >= 2000:
+            Contact.objects.using(db).bulk_update(batch, ['phone_normalized', 'email_normalized'])
+            batch = []
+    if batch:
+        Contact.objects.using(db).bulk_update(batch, ['phone_normalized', 'email_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0006_import_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='email_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=254, verbose_name='Normalized Email'),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=20, verbose_name='Normalized Phone'),
+        ),
+        migrations.RunPython(backfill_dedup_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['user', 'phone_normalized'], name='contacts_co_user_id_559a96_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['user', 'email_normalized'], name='contacts_co_user_id_673cec_idx'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='duplicate_policy',
+            field=models.CharField(default='skip', max_length=10, verbose_name='Duplicates'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='updated_count',
+            field=models.IntegerField(default=0, verbose_name='Updated'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='duplicate_count',
+            field=models.IntegerField(default=0, verbose_name='Duplicates'),
+        ),
+    ]
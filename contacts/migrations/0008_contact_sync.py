@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-18 13:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0007_contact_dedup_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contact_id', models.BigIntegerField(verbose_name='Contact ID')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Deleted At')),
+            ],
+            options={
+                'verbose_name': 'Contact Tombstone',
+                'verbose_name_plural': 'Contact Tombstones',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['user', 'updated_at'], name='contacts_co_user_id_6f0e0d_idx'),
+        ),
+        migrations.AddField(
+            model_name='contacttombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contact_tombstones', to=settings.AUTH_USER_MODEL, verbose_name='Owner'),
+        ),
+        migrations.AddIndex(
+            model_name='contacttombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='contacts_co_user_id_ddafff_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-18 13:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0008_contact_sync'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['user', 'company'], name='contacts_co_user_id_745888_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0009_contact_company_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactstats',
+            name='version',
+            field=models.BigIntegerField(default=0, verbose_name='List Version'),
+        ),
+    ]
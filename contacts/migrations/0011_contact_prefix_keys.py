@@ -0,0 +1,62 @@
+# Generated by Django 5.1.15 on 2026-10-18 14:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# contacts.suggest.prefix_key as it was when this migration was written:
+# later changes to it must not change what this migration writes
+def prefix_key(value):
+    return value.lower()[:100]
+
+
+def backfill_prefix_keys(apps, schema_editor):
+    """Fill the typeahead keys of existing contacts."""
+    Contact = apps.get_model('contacts', 'Contact')
+    db = schema_editor.connection.alias
+
+    batch = []
+    rows = Contact.objects.using(db).only('id', 'name', 'company').order_by()
+    for contact in rows.iterator(chunk_size=2000):
+        contact.name_key = prefix_key(contact.name)
+        contact.company_key = prefix_key(contact.company)
+        batch.append(contact)
+        if len(batch) >= 2000:
+            Contact.objects.using(db).bulk_update(batch, ['name_key', 'company_key'])
+            batch = []
+    if batch:
+        Contact.objects.using(db).bulk_update(batch, ['name_key', 'company_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0010_contact_stats_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='contact',
+            name='contacts_co_user_id_745888_idx',
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='company_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Company Key'),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='name_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Name Key'),
+        ),
+        migrations.RunPython(backfill_prefix_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['user', 'name_key'], name='contacts_co_user_id_fee69a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['user', 'company_key'], name='contacts_co_user_id_3b9e7f_idx'),
+        ),
+    ]
@@ -0,0 +1,108 @@
+from django.db import DatabaseError, migrations, transaction
+
+
+# The statements of contacts.search as they were when this migration was
+# written: later changes to it must not change what this migration creates
+
+SQLITE_INDEX = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS contacts_contact_fts USING fts5("
+    "name, phone, email, company, content='contacts_contact', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS contacts_contact_fts_ai AFTER INSERT ON contacts_contact "
+    "BEGIN INSERT INTO contacts_contact_fts(rowid, name, phone, email, company) "
+    "VALUES (new.id, new.name, new.phone, new.email, new.company); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_contact_fts_ad AFTER DELETE ON contacts_contact "
+    "BEGIN INSERT INTO contacts_contact_fts(contacts_contact_fts, rowid, name, phone, email, company) "
+    "VALUES ('delete', old.id, old.name, old.phone, old.email, old.company); END",
+    "CREATE TRIGGER IF NOT EXISTS contacts_contact_fts_au AFTER UPDATE OF name, phone, email, company "
+    "ON contacts_contact "
+    "BEGIN INSERT INTO contacts_contact_fts(contacts_contact_fts, rowid, name, phone, email, company) "
+    "VALUES ('delete', old.id, old.name, old.phone, old.email, old.company); "
+    "INSERT INTO contacts_contact_fts(rowid, name, phone, email, company) "
+    "VALUES (new.id, new.name, new.phone, new.email, new.company); END",
+    # Index the contacts written before the triggers existed
+    "INSERT INTO contacts_contact_fts(contacts_contact_fts) VALUES ('rebuild')",
+]
+SQLITE_INDEX_REVERSE = [
+    'DROP TRIGGER IF EXISTS contacts_contact_fts_ai',
+    'DROP TRIGGER IF EXISTS contacts_contact_fts_ad',
+    'DROP TRIGGER IF EXISTS contacts_contact_fts_au',
+    'DROP TABLE IF EXISTS contacts_contact_fts',
+]
+
+PG_DOCUMENT = """"name" || ' ' || "phone" || ' ' || "email" || ' ' || "company\""""
+PG_TSVECTOR_INDEX = (
+    f"CREATE INDEX IF NOT EXISTS contacts_contact_search_tsv "
+    f"ON contacts_contact USING GIN ((to_tsvector('simple', {PG_DOCUMENT})))"
+)
+PG_TRIGRAM_INDEX = (
+    f"CREATE INDEX IF NOT EXISTS contacts_contact_search_trgm "
+    f"ON contacts_contact USING GIN (({PG_DOCUMENT}) gin_trgm_ops)"
+)
+
+
+def sqlite_has_fts5_trigram(schema_editor):
+    """FTS5 with the trigram tokenizer needs SQLite 3.34+ built with FTS5."""
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.contacts_fts_probe USING fts5(x, tokenize='trigram')")
+        except DatabaseError:
+            return False
+        cursor.execute('DROP TABLE temp.contacts_fts_probe')
+    return True
+
+
+def postgresql_has_trigram(schema_editor):
+    """Install pg_trgm if possible; creating extensions needs elevated privileges."""
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if cursor.fetchone() is not None:
+            return True
+        try:
+            with transaction.atomic(using=connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except DatabaseError:
+            return False
+    return True
+
+
+class VendorRunSQL(migrations.RunSQL):
+    """
+    RunSQL for one database vendor, skipped on the others and, going
+    forwards, where ``available(schema_editor)`` is false: searches then
+    fall back to icontains (see contacts.search).
+    """
+    def __init__(self, vendor, sql, reverse_sql, available=None):
+        super().__init__(sql, reverse_sql)
+        self.vendor = vendor
+        self.available = available
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != self.vendor:
+            return
+        if self.available is not None and not self.available(schema_editor):
+            return
+        super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return f'Raw SQL operation ({self.vendor})'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0011_contact_prefix_keys'),
+    ]
+
+    operations = [
+        VendorRunSQL('sqlite', SQLITE_INDEX, SQLITE_INDEX_REVERSE, available=sqlite_has_fts5_trigram),
+        VendorRunSQL('postgresql', PG_TSVECTOR_INDEX, 'DROP INDEX IF EXISTS contacts_contact_search_tsv'),
+        VendorRunSQL(
+            'postgresql', PG_TRIGRAM_INDEX, 'DROP INDEX IF EXISTS contacts_contact_search_trgm',
+            available=postgresql_has_trigram,
+        ),
+    ]
@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.core.validators import RegexValidator
+from django.utils import timezone
 
 
 class Contact(models.Model):
@@ -32,6 +34,13 @@ class Contact(models.Model):
     company = models.CharField(max_length=100, blank=True, verbose_name='Company', db_index=True)
     notes = models.TextField(blank=True, verbose_name='Notes')
     
+    # Duplicate detection keys, derived from phone/email on save (see contacts.dedup)
+    phone_normalized = models.CharField(max_length=20, blank=True, editable=False, verbose_name='Normalized Phone')
+    email_normalized = models.CharField(max_length=254, blank=True, editable=False, verbose_name='Normalized Email')
+    # Typeahead keys, lower-cased name and company (see contacts.suggest)
+    name_key = models.CharField(max_length=100, blank=True, editable=False, verbose_name='Name Key')
+    company_key = models.CharField(max_length=100, blank=True, editable=False, verbose_name='Company Key')
+    
     # Favorites
     is_favorite = models.BooleanField(default=False, verbose_name='Favorite', db_index=True)
     
@@ -44,13 +53,57 @@ class Contact(models.Model):
         verbose_name_plural = 'Contacts'
         ordering = ['-is_favorite', '-created_at']  # Favorites first
         indexes = [
-            models.Index(fields=['user', '-is_favorite', '-created_at']),
+            # id breaks created_at ties for keyset pagination
+            models.Index(fields=['user', '-is_favorite', '-created_at', '-id']),
             models.Index(fields=['user', 'name']),
+            # Typeahead prefix scans (see contacts.suggest)
+            models.Index(fields=['user', 'name_key']),
+            models.Index(fields=['user', 'company_key']),
+            models.Index(fields=['user', 'phone_normalized']),
+            models.Index(fields=['user', 'email_normalized']),
+            # Delta sync: contacts changed since a sync token (see contacts.sync)
+            models.Index(fields=['user', 'updated_at']),
         ]
     
     def __str__(self):
         return f'{self.name} ({self.phone})'
     
+    def normalize(self):
+        """Refresh the duplicate detection and typeahead keys."""
+        from .dedup import normalize_email, normalize_phone
+        from .suggest import prefix_key
+        self.phone_normalized = normalize_phone(self.phone)
+        self.email_normalized = normalize_email(self.email)
+        self.name_key = prefix_key(self.name)
+        self.company_key = prefix_key(self.company)
+    
+    def save(self, *args, **kwargs):
+        self.normalize()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'phone' in update_fields:
+                update_fields.add('phone_normalized')
+            if 'email' in update_fields:
+                update_fields.add('email_normalized')
+            if 'name' in update_fields:
+                update_fields.add('name_key')
+            if 'company' in update_fields:
+                update_fields.add('company_key')
+            kwargs['update_fields'] = update_fields
+        
+        # Keep the row and the ContactStats update from signals in one transaction
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so signal receivers can compute changes
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
     def get_initials(self):
         """Return initials for avatar display."""
         parts = self.name.split()
@@ -58,3 +111,156 @@ class Contact(models.Model):
             return f"{parts[0][0]}{parts[1][0]}".upper()
         return self.name[0].upper() if self.name else '?'
 
+
+class ContactTombstone(models.Model):
+    """
+    A deleted contact, kept so delta sync clients learn about the removal
+    (see contacts.sync). Pruned after CONTACTS_SYNC_TOMBSTONE_DAYS.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='contact_tombstones',
+        verbose_name='Owner'
+    )
+    contact_id = models.BigIntegerField(verbose_name='Contact ID')
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name='Deleted At')
+    
+    class Meta:
+        verbose_name = 'Contact Tombstone'
+        verbose_name_plural = 'Contact Tombstones'
+        indexes = [
+            models.Index(fields=['user', 'deleted_at']),
+        ]
+    
+    def __str__(self):
+        return f'Contact {self.contact_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}'
+
+
+class ContactStats(models.Model):
+    """
+    Denormalized contact counters for one user.
+    Updated in the same transaction as every contact write (see contacts.stats).
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='contact_stats',
+        verbose_name='Owner'
+    )
+    total = models.IntegerField(default=0, verbose_name='Contacts')
+    favorites = models.IntegerField(default=0, verbose_name='Favorites')
+    companies = models.IntegerField(default=0, verbose_name='Distinct Companies')
+    # Contacts created per local day, {'YYYY-MM-DD': count}, recent days only
+    daily_created = models.JSONField(default=dict, blank=True, verbose_name='Created Per Day')
+    # Last-write marker of the user's contacts (see contacts.render_cache)
+    version = models.BigIntegerField(default=0, verbose_name='List Version')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Updated At')
+    
+    class Meta:
+        verbose_name = 'Contact Stats'
+        verbose_name_plural = 'Contact Stats'
+    
+    def __str__(self):
+        return f'Stats for user {self.user_id}'
+
+
+class CompanyCount(models.Model):
+    """
+    Number of contacts per company for one user.
+    Lets ContactStats.companies stay exact without a DISTINCT query.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='company_counts',
+        verbose_name='Owner'
+    )
+    company = models.CharField(max_length=100, verbose_name='Company')
+    count = models.IntegerField(default=0, verbose_name='Contacts')
+    
+    class Meta:
+        verbose_name = 'Company Count'
+        verbose_name_plural = 'Company Counts'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'company'], name='unique_company_count_per_user'),
+        ]
+    
+    def __str__(self):
+        return f'{self.company}: {self.count}'
+
+
+def import_storage():
+    return FileSystemStorage(location=settings.CONTACTS_IMPORT_ROOT)
+
+
+class ImportJob(models.Model):
+    """
+    A CSV upload waiting for, or being processed by, an import worker
+    (see contacts.jobs).
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='import_jobs',
+        verbose_name='Owner'
+    )
+    file = models.FileField(upload_to='%Y/%m/%d/', storage=import_storage, verbose_name='Upload')
+    original_name = models.CharField(max_length=255, verbose_name='File Name')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name='Status')
+    # How rows matching an existing contact are handled (see contacts.dedup)
+    duplicate_policy = models.CharField(max_length=10, default='skip', verbose_name='Duplicates')
+    
+    # Progress, committed together with each imported batch
+    size = models.BigIntegerField(default=0, verbose_name='Size (bytes)')
+    bytes_processed = models.BigIntegerField(default=0, verbose_name='Bytes Processed')
+    last_row = models.IntegerField(default=0, verbose_name='Last Row Processed')
+    imported_count = models.IntegerField(default=0, verbose_name='Imported')
+    skipped_count = models.IntegerField(default=0, verbose_name='Skipped')
+    updated_count = models.IntegerField(default=0, verbose_name='Updated')
+    duplicate_count = models.IntegerField(default=0, verbose_name='Duplicates')
+    errors = models.JSONField(default=list, blank=True, verbose_name='Row Errors')
+    error_message = models.TextField(blank=True, verbose_name='Failure')
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Created At')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Started At')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Finished At')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Updated At')
+    
+    class Meta:
+        verbose_name = 'Import Job'
+        verbose_name_plural = 'Import Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            # Worker queue scan
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f'{self.original_name} ({self.status})'
+    
+    @property
+    def progress(self):
+        """Completion as a percentage of the upload read so far."""
+        if self.status == self.DONE:
+            return 100
+        if not self.size:
+            return 0
+        return min(99, int(self.bytes_processed * 100 / self.size))
+    
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
@@ -0,0 +1,155 @@
+"""
+Keyset (cursor) pagination for the contact list.
+
+Pages follow the list order ``(-is_favorite, -created_at, -id)`` and are
+addressed by opaque ``?cursor=`` tokens holding the position of the first
+or last row shown. Each page is an index range scan on
+``(user, -is_favorite, -created_at)``, so page N costs the same as page 1 and
+no ``COUNT(*)`` is needed. Searches are ordered by rank instead, so the
+list view pages them by number.
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(Exception):
+    """Raised when a cursor token cannot be decoded."""
+
+
+def encode_cursor(direction, contact):
+    payload = [direction, contact.is_favorite, contact.created_at.isoformat(), contact.pk]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return ``(direction, (is_favorite, created_at, pk))`` for a cursor token."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, is_favorite, created_at, pk = json.loads(raw)
+        created_at = parse_datetime(created_at)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(token)
+    if direction not in ('next', 'prev') or created_at is None or not isinstance(pk, int):
+        raise InvalidCursor(token)
+    return direction, (bool(is_favorite), created_at, pk)
+
+
+class CursorPage:
+    """
+    One page of a CursorPaginator, with the attributes the list template
+    needs in place of Django's Page.
+    """
+    cursor_based = True
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        return encode_cursor('next', self.object_list[-1]) if self.has_next() else ''
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor('prev', self.object_list[0]) if self.has_previous() else ''
+
+
+class CursorPaginator:
+    """
+    Paginate ``queryset`` in list order without OFFSET.
+
+    ``is_favorite`` only has two values, so the list is walked as two
+    segments (favorites, then the rest). Within a segment the position is a
+    range on ``created_at`` with ``id`` as the tiebreaker, which the index
+    can seek to directly.
+    """
+    # Segment order when paging forwards
+    SEGMENTS = (True, False)
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def _segment(self, is_favorite, position, backwards, limit):
+        # is_favorite=<bool> compiles to a bare column test the index can't
+        # seek on; IN (%s) compiles to an equality it can.
+        queryset = self.queryset.filter(is_favorite__in=[is_favorite])
+        if position is not None:
+            created_at, pk = position
+            if backwards:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(id__gt=pk), created_at__gte=created_at
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(id__lt=pk), created_at__lte=created_at
+                )
+        ordering = ('created_at', 'id') if backwards else ('-created_at', '-id')
+        return queryset.order_by(*ordering)[:limit]
+
+    def _start(self, cursor):
+        """``(direction, segments, position)`` to read from for ``cursor``."""
+        if cursor:
+            direction, (is_favorite, created_at, pk) = decode_cursor(cursor)
+            position = (created_at, pk)
+        else:
+            direction, is_favorite, position = 'next', self.SEGMENTS[0], None
+
+        segments = self.SEGMENTS[::-1] if direction == 'prev' else self.SEGMENTS
+        return direction, segments[segments.index(is_favorite):], position
+
+    def _page(self, rows, direction, cursor):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'prev':
+            rows.reverse()
+            return CursorPage(rows, has_next=True, has_previous=has_more)
+        return CursorPage(rows, has_next=has_more, has_previous=bool(cursor))
+
+    def page(self, cursor=None):
+        """Return the CursorPage for ``cursor`` (the first page if empty)."""
+        direction, segments, position = self._start(cursor)
+        limit = self.per_page + 1  # One extra row tells us if there is more
+
+        rows = []
+        for segment in segments:
+            rows += self._segment(segment, position, direction == 'prev', limit - len(rows))
+            if len(rows) >= limit:
+                break
+            position = None  # Later segments start from their beginning
+        return self._page(rows, direction, cursor)
+
+    async def apage(self, cursor=None):
+        """Async version of page()."""
+        direction, segments, position = self._start(cursor)
+        limit = self.per_page + 1
+
+        rows = []
+        for segment in segments:
+            queryset = self._segment(segment, position, direction == 'prev', limit - len(rows))
+            rows += [row async for row in queryset]
+            if len(rows) >= limit:
+                break
+            position = None
+        return self._page(rows, direction, cursor)
@@ -0,0 +1,137 @@
+"""
+Rendered-HTML caches for the contact list.
+
+Cards: each contact card is cached under the contact's id and
+``updated_at``, so a card is rendered once per change of the contact; the
+cards of a page are read with a single ``get_many``.
+
+Pages: the whole list page is cached per user, keyed by the request's
+search, filter and page plus the user's last-write marker. The marker is
+``ContactStats.version``, which every write to a user's contacts bumps in
+its own transaction, so the new marker becomes visible to every process
+exactly when the write does, and all of that user's cached pages become
+unreachable at once. It is the write time in nanoseconds (kept
+increasing), so it also serves as the pages' Last-Modified
+(``contacts.conditional``). Views read the marker before the contacts and
+from the same database: a page read from a lagging replica
+(``zenvio.routers``) is cached under the marker the replica had, never
+under a newer one. Pages with pending flash messages are neither served
+from nor stored in the cache.
+
+Both are rendered with ``CSRF_PLACEHOLDER`` as the CSRF token, and the
+request's own token is put into the final HTML with ``with_csrf_token``.
+Hits and misses are counted in the request instrumentation.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import instrumentation, stats
+from .models import ContactStats
+
+
+CARD_TEMPLATE = 'contacts/_contact_card.html'
+# Bump when _contact_card.html changes so cards cached by older code are ignored
+CARD_VERSION = 1
+CSRF_PLACEHOLDER = 'csrf-token-placeholder-7f3c9a'
+# Request parameters the list page depends on
+PAGE_PARAMETERS = ('search', 'filter', 'page', 'cursor')
+
+
+def get_cache():
+    return caches[settings.CONTACTS_RENDER_CACHE]
+
+
+def card_key(contact):
+    return f'contacts:card:{CARD_VERSION}:{contact.pk}:{contact.updated_at.timestamp()}'
+
+
+def render_cards(contacts):
+    """The HTML of each contact's card, rendering only uncached ones."""
+    cache = get_cache()
+    keys = {card_key(contact): contact for contact in contacts}
+    cached = cache.get_many(keys)
+    rendered = {}
+    for key, contact in keys.items():
+        if key not in cached:
+            rendered[key] = render_to_string(CARD_TEMPLATE, {'contact': contact, 'csrf_token': CSRF_PLACEHOLDER})
+    if rendered:
+        cache.set_many(rendered, settings.CONTACTS_CARD_CACHE_TIMEOUT)
+
+    instrumentation.count('card_hits', len(cached))
+    instrumentation.count('card_misses', len(rendered))
+    return [mark_safe(cached.get(key) or rendered[key]) for key in keys]
+
+
+def with_csrf_token(request, html):
+    return html.replace(CSRF_PLACEHOLDER, get_token(request))
+
+
+def has_pending_messages(request):
+    return len(messages.get_messages(request)) > 0
+
+
+def version_time(version):
+    """When the write that set ``version`` was made."""
+    return datetime.fromtimestamp(int(version, 16) / 1e9, tz=timezone.utc)
+
+
+def list_version(user_id):
+    """The user's last-write marker, as hex."""
+    version = ContactStats.objects.filter(pk=user_id).values_list('version', flat=True).first()
+    return f'{version or 0:x}'
+
+
+async def alist_version(user_id):
+    version = await ContactStats.objects.filter(pk=user_id).values_list('version', flat=True).afirst()
+    return f'{version or 0:x}'
+
+
+def page_key(request, mode, version):
+    """Cache key of the list page ``request`` asks for."""
+    params = urlencode([(name, request.GET.get(name, '')) for name in PAGE_PARAMETERS])
+    digest = hashlib.sha1(f'{mode}?{params}'.encode()).hexdigest()
+    return f'contacts:list-page:{request.user.pk}:{version}:{digest}'
+
+
+def get_page(key):
+    html = get_cache().get(key)
+    instrumentation.count('page_hits' if html is not None else 'page_misses')
+    return html
+
+
+async def aget_page(key):
+    html = await get_cache().aget(key)
+    instrumentation.count('page_hits' if html is not None else 'page_misses')
+    return html
+
+
+def set_page(key, html):
+    get_cache().set(key, html, settings.CONTACTS_PAGE_CACHE_TIMEOUT)
+
+
+def invalidate_pages(user_id, using=DEFAULT_DB_ALIAS):
+    """
+    Drop the user's cached list pages by bumping their marker.
+    Must run in the same transaction as the write.
+    """
+    def bump():
+        return ContactStats.objects.using(using).filter(pk=user_id).update(
+            version=Greatest(F('version') + 1, Value(time.time_ns())),
+        )
+
+    if not bump():
+        # No counters row yet: contacts written before ContactStats existed
+        stats.rebuild_stats(user_id, using)
+        bump()
@@ -0,0 +1,233 @@
+"""
+Full-text search over contact name, phone, email and company.
+
+SQLite uses an FTS5 table with the trigram tokenizer, which matches
+substrings case-insensitively exactly like the old ``icontains`` filters.
+PostgreSQL uses GIN indexes on the concatenated columns: a pg_trgm index
+for substring matching (falling back to word-prefix tsvector matching when
+the extension is unavailable) and a tsvector index.
+
+The indexes are maintained by the database itself (triggers on SQLite,
+expression indexes on PostgreSQL), so saves, deletes, bulk imports and
+queryset updates all stay in sync. Migration 0012 creates them where the
+database supports them. On SQLite, a migration that rebuilds the contacts
+table (most field changes do) drops its triggers: run ``manage.py
+rebuild_search_index``, which repairs and repopulates the index with
+``ensure_search_index``, after it.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+
+FTS_TABLE = 'contacts_contact_fts'
+CONTACT_TABLE = 'contacts_contact'
+SEARCH_COLUMNS = ('name', 'phone', 'email', 'company')
+
+# Trigram matching needs at least three characters
+MIN_INDEXED_QUERY_LENGTH = 3
+
+
+# Per-alias cache of the installed search index kind; "none yet" is not
+# cached, so an index installed while the process runs is picked up
+_index_state = {}
+
+
+def _pg_document(table=None):
+    prefix = f'"{table}".' if table else ''
+    return " || ' ' || ".join(f'{prefix}"{column}"' for column in SEARCH_COLUMNS)
+
+
+def _pg_tsvector(table=None):
+    return f"to_tsvector('simple', {_pg_document(table)})"
+
+
+def _sqlite_statements():
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    delete_old = (
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {CONTACT_TABLE} "
+        f"BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {CONTACT_TABLE} "
+        f"BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {columns} ON {CONTACT_TABLE} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def _ensure_sqlite(connection, rebuild):
+    triggers = {f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au'}
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        if cursor.fetchone() is None:
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                    f"{', '.join(SEARCH_COLUMNS)}, content='{CONTACT_TABLE}', content_rowid='id', "
+                    f"tokenize='trigram')"
+                )
+            except DatabaseError:
+                # FTS5 or the trigram tokenizer (SQLite 3.34+) is not available
+                return None
+            rebuild = True
+
+        # Triggers are dropped whenever Django rebuilds the contacts table
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [CONTACT_TABLE]
+        )
+        if not triggers.issubset(row[0] for row in cursor.fetchall()):
+            for statement in _sqlite_statements():
+                cursor.execute(statement)
+            rebuild = True
+
+        if rebuild:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return 'fts5'
+
+
+def _ensure_postgresql(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        has_trigram = cursor.fetchone() is not None
+        if not has_trigram:
+            try:
+                with transaction.atomic(using=connection.alias):
+                    cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+                has_trigram = True
+            except DatabaseError:
+                # Creating extensions needs elevated privileges
+                pass
+
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {CONTACT_TABLE}_search_tsv "
+            f"ON {CONTACT_TABLE} USING GIN (({_pg_tsvector()}))"
+        )
+        if has_trigram:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {CONTACT_TABLE}_search_trgm "
+                f"ON {CONTACT_TABLE} USING GIN (({_pg_document()}) gin_trgm_ops)"
+            )
+    return 'trigram' if has_trigram else 'tsvector'
+
+
+def ensure_search_index(using='default', rebuild=False):
+    """
+    Install (or repair) the search index for database ``using``.
+    ``rebuild`` repopulates the SQLite FTS table from the contacts table.
+    Returns the index kind in use, or None when only icontains is available.
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        kind = _ensure_sqlite(connection, rebuild)
+    elif connection.vendor == 'postgresql':
+        kind = _ensure_postgresql(connection)
+    else:
+        kind = None
+    _index_state[using] = kind
+    return kind
+
+
+def search_index_kind(using='default'):
+    """Return the installed index kind for ``using`` (cached per process once found)."""
+    if _index_state.get(using) is None:
+        connection = connections[using]
+        kind = None
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                kind = 'fts5' if cursor.fetchone() else None
+            elif connection.vendor == 'postgresql':
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                kind = 'trigram' if cursor.fetchone() else 'tsvector'
+        _index_state[using] = kind
+    return _index_state[using]
+
+
+async def asearch_index_kind(using='default'):
+    """Async search_index_kind(); once an index is found, calls no longer query."""
+    if _index_state.get(using) is None:
+        return await sync_to_async(search_index_kind)(using)
+    return _index_state[using]
+
+
+def icontains_filter(query):
+    """The original unindexed search predicate."""
+    return (
+        Q(name__icontains=query) |
+        Q(phone__icontains=query) |
+        Q(email__icontains=query) |
+        Q(company__icontains=query)
+    )
+
+
+def _fts5_phrase(query):
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _like_pattern(query):
+    return '%' + re.sub(r'([\\%_])', r'\\\1', query) + '%'
+
+
+def _tsquery(query):
+    words = re.findall(r'\w+', query)
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def search_rank(query):
+    """
+    Relevance of a matching row, higher is better: name prefix, then a word
+    in the name, then anywhere in the name, then company, then email/phone.
+    Only evaluated for rows that already matched the index.
+    """
+    return Case(
+        When(name__istartswith=query, then=Value(4)),
+        When(name__icontains=' ' + query, then=Value(3)),
+        When(name__icontains=query, then=Value(2)),
+        When(company__icontains=query, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def search_filter(query, using='default'):
+    """Return the indexed filter for ``query`` on database ``using``."""
+    kind = search_index_kind(using)
+
+    if kind == 'fts5' and len(query) >= MIN_INDEXED_QUERY_LENGTH:
+        return Q(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [_fts5_phrase(query)]
+        ))
+
+    if kind == 'trigram' and len(query) >= MIN_INDEXED_QUERY_LENGTH:
+        return Q(id__in=RawSQL(
+            f'SELECT id FROM {CONTACT_TABLE} WHERE {_pg_document()} ILIKE %s', [_like_pattern(query)]
+        ))
+
+    if kind == 'tsvector' and _tsquery(query):
+        return Q(id__in=RawSQL(
+            f"SELECT id FROM {CONTACT_TABLE} WHERE {_pg_tsvector()} @@ to_tsquery('simple', %s)",
+            [_tsquery(query)],
+        ))
+
+    return icontains_filter(query)
+
+
+def search_contacts(queryset, query):
+    """
+    Filter ``queryset`` to contacts matching ``query`` and annotate a
+    ``search_rank`` (higher is better). Ordering is left to the caller.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    return queryset.filter(search_filter(query, queryset.db)).annotate(search_rank=search_rank(query))
@@ -0,0 +1,123 @@
+"""
+Signals for contact writes.
+
+The receivers keep the per-user counters in ``contacts.stats`` current,
+inside the transaction of the write, and drop the user's cached list pages
+(``contacts.render_cache``) when it commits. Deletions leave tombstones
+for delta sync (``contacts.sync``). Bulk writes that bypass model signals
+(CSV import) send ``contacts_bulk_created`` instead. Deleting a user drops
+their cached counters.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from . import render_cache, stats, sync
+from .models import Contact
+
+
+# Sent after bulk_create with ``user`` and the list of created ``contacts``
+contacts_bulk_created = Signal()
+# Sent after bulk_update with ``user`` and the updated ``contacts``
+contacts_bulk_updated = Signal()
+
+STATE_FIELDS = ('user_id', 'is_favorite', 'company', 'created_at')
+
+
+def stored_state(contact):
+    """The contact's state as last loaded or saved, or None if unknown."""
+    loaded = getattr(contact, '_loaded_values', None)
+    if loaded is None or any(field not in loaded for field in STATE_FIELDS):
+        return None
+    return tuple(loaded[field] for field in STATE_FIELDS)
+
+
+def current_state(contact):
+    return tuple(getattr(contact, field) for field in STATE_FIELDS)
+
+
+def remember_state(contact):
+    contact._loaded_values = dict(zip(STATE_FIELDS, current_state(contact)))
+
+
+def add_state(delta, state, sign):
+    _, is_favorite, company, created_at = state
+    created_day = timezone.localdate(created_at) if created_at else None
+    delta.add(is_favorite, company, created_day, sign)
+
+
+@receiver(post_save, sender=Contact)
+def contact_saved(sender, instance, created, using, **kwargs):
+    new = current_state(instance)
+    old = None if created else stored_state(instance)
+
+    if not created and old is None:
+        # Saved from a partially loaded instance; the old values are unknown
+        stats.rebuild_stats(instance.user_id, using)
+    elif old != new:
+        changes = {}
+        if old is not None:
+            add_state(changes.setdefault(old[0], stats.StatsDelta()), old, -1)
+        add_state(changes.setdefault(new[0], stats.StatsDelta()), new, 1)
+        for user_id, delta in changes.items():
+            stats.apply_delta(user_id, delta, using)
+
+    for user_id in {instance.user_id, old[0] if old else instance.user_id}:
+        render_cache.invalidate_pages(user_id, using)
+    remember_state(instance)
+
+
+@receiver(post_delete, sender=Contact)
+def contact_deleted(sender, instance, using, origin=None, **kwargs):
+    if isinstance(origin, get_user_model()):
+        # Deleting the user cascades to its counters as well
+        return
+
+    render_cache.invalidate_pages(instance.user_id, using)
+    sync.record_deletions(instance.user_id, [instance.pk], using)
+    state = stored_state(instance)
+    if state is None:
+        stats.rebuild_stats(instance.user_id, using)
+        return
+    delta = stats.StatsDelta()
+    add_state(delta, state, -1)
+    stats.apply_delta(state[0], delta, using)
+
+
+@receiver(contacts_bulk_created)
+def contacts_imported(sender, user, contacts, using='default', **kwargs):
+    delta = stats.StatsDelta()
+    for contact in contacts:
+        add_state(delta, current_state(contact), 1)
+    stats.apply_delta(user.pk, delta, using)
+    render_cache.invalidate_pages(user.pk, using)
+
+
+@receiver(contacts_bulk_updated)
+def contacts_changed(sender, user, contacts, using='default', **kwargs):
+    delta = stats.StatsDelta()
+    unknown = False
+    for contact in contacts:
+        old, new = stored_state(contact), current_state(contact)
+        if old is None:
+            unknown = True
+        elif old != new:
+            add_state(delta, old, -1)
+            add_state(delta, new, 1)
+        remember_state(contact)
+
+    if unknown:
+        stats.rebuild_stats(user.pk, using)
+    else:
+        stats.apply_delta(user.pk, delta, using)
+    render_cache.invalidate_pages(user.pk, using)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, using, **kwargs):
+    transaction.on_commit(partial(stats.invalidate, instance.pk), using=using)
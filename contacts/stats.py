@@ -0,0 +1,304 @@
+"""
+Per-user contact statistics.
+
+Counters are stored durably in ``ContactStats``: total, favorites, distinct
+companies (backed by ``CompanyCount``) and contacts created per day. Signal
+handlers in ``contacts.signals`` turn every write into a ``StatsDelta`` that
+is applied inside the writing transaction, so the counters are always exact.
+
+Reads go through Django's cache (CONTACTS_STATS_CACHE) when it is shared
+between processes, e.g. ``CACHE_BACKEND=file``: when a transaction that
+changed a user's counters commits, the new values are written to the cache,
+so pages serve the counters without querying the database and fall back to
+a single primary-key lookup on a miss. Hits and misses are counted per view
+(``stats_cache_hits`` / ``stats_cache_misses``, see ``manage.py
+perf_report``). With a per-process cache (locmem, the default) other
+processes would keep serving stale copies, so pages read the row instead.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import instrumentation
+from .models import CompanyCount, Contact, ContactStats
+
+
+RECENT_DAYS = 7
+# Day buckets older than this are dropped from ContactStats.daily_created
+DAYS_KEPT = 31
+
+
+def get_cache():
+    return caches[settings.CONTACTS_STATS_CACHE]
+
+
+def is_cached():
+    """Whether counters are cached: only in a cache every process reads."""
+    return instrumentation.is_shared(get_cache())
+
+
+def cache_key(user_id):
+    return f'contacts:stats:{user_id}'
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def window_start(days):
+    """First local date of a window of ``days`` days ending today."""
+    return timezone.localdate() - timedelta(days=days - 1)
+
+
+class StatsDelta:
+    """
+    Change to one user's counters. Contacts are added to or removed from a
+    delta by their (is_favorite, company, created day) state.
+    """
+    def __init__(self):
+        self.total = 0
+        self.favorites = 0
+        self.companies = Counter()
+        self.days = Counter()
+
+    def add(self, is_favorite, company, created_day, sign=1):
+        self.total += sign
+        if is_favorite:
+            self.favorites += sign
+        if company:
+            self.companies[company] += sign
+        if created_day is not None:
+            self.days[created_day.isoformat()] += sign
+
+    def merge(self, other):
+        self.total += other.total
+        self.favorites += other.favorites
+        self.companies.update(other.companies)
+        self.days.update(other.days)
+
+    def __bool__(self):
+        return bool(
+            self.total or self.favorites or
+            any(self.companies.values()) or any(self.days.values())
+        )
+
+
+def _prune_days(days):
+    start = window_start(DAYS_KEPT).isoformat()
+    return {day: count for day, count in days.items() if day >= start and count > 0}
+
+
+def snapshot(stats):
+    """Cacheable copy of a ContactStats row."""
+    return {
+        'total': stats.total,
+        'favorites': stats.favorites,
+        'companies': stats.companies,
+        'days': dict(stats.daily_created),
+    }
+
+
+def summarize(entry):
+    """Turn a snapshot into the counters the templates display."""
+    start = window_start(RECENT_DAYS).isoformat()
+    return {
+        'total': entry['total'],
+        'favorites': entry['favorites'],
+        'companies': entry['companies'],
+        'recent': sum(count for day, count in entry['days'].items() if day >= start),
+    }
+
+
+def compute_stats(user_id, using=DEFAULT_DB_ALIAS):
+    """
+    Count ``user_id``'s contacts from scratch.
+    Returns ``(ContactStats, {company: count})``; the row is not saved.
+    """
+    contacts = Contact.objects.using(using).filter(user_id=user_id).order_by()
+    totals = contacts.aggregate(
+        total=Count('id'),
+        favorites=Count('id', filter=Q(is_favorite=True)),
+    )
+    companies = dict(
+        contacts.exclude(company='').values_list('company').annotate(count=Count('id'))
+    )
+    days = (
+        contacts.filter(created_at__gte=start_of_day(window_start(DAYS_KEPT)))
+        .annotate(day=TruncDate('created_at'))
+        .values_list('day')
+        .annotate(count=Count('id'))
+    )
+    stats = ContactStats(
+        user_id=user_id,
+        total=totals['total'],
+        favorites=totals['favorites'],
+        companies=len(companies),
+        daily_created={day.isoformat(): count for day, count in days},
+    )
+    return stats, companies
+
+
+def _create_row(user_id, using):
+    """
+    Create ``user_id``'s counters row if it doesn't exist yet. Returns
+    whether this call created it. A concurrent transaction inserting the
+    same row waits for this one and then finds it, instead of failing.
+    """
+    _, created = ContactStats.objects.using(using).get_or_create(pk=user_id)
+    return created
+
+
+def rebuild_stats(user_id, using=DEFAULT_DB_ALIAS):
+    """Recount ``user_id``'s contacts and overwrite the stored counters."""
+    with transaction.atomic(using=using):
+        _create_row(user_id, using)
+        # Lock the row before counting, so concurrent writes queue behind the recount
+        version = (
+            ContactStats.objects.using(using).select_for_update()
+            .values_list('version', flat=True).get(pk=user_id)
+        )
+        stats, companies = compute_stats(user_id, using)
+        # Keep the list-version marker; it must never go back
+        stats.version = version
+        CompanyCount.objects.using(using).filter(user_id=user_id).delete()
+        CompanyCount.objects.using(using).bulk_create([
+            CompanyCount(user_id=user_id, company=company, count=count)
+            for company, count in companies.items()
+        ])
+        stats.save(using=using)
+        instrumentation.count('stats_rebuilds')
+        cache_on_commit(user_id, stats, using)
+    return stats
+
+
+def verify_stats(user_id, using=DEFAULT_DB_ALIAS):
+    """
+    Compare the stored counters with a fresh count.
+    Returns a list of ``(field, stored, actual)`` for every difference.
+    """
+    expected, companies = compute_stats(user_id, using)
+    stored = ContactStats.objects.using(using).filter(pk=user_id).first() or ContactStats(user_id=user_id)
+    stored_companies = dict(
+        CompanyCount.objects.using(using).filter(user_id=user_id).values_list('company', 'count')
+    )
+
+    differences = []
+    for field in ('total', 'favorites', 'companies'):
+        if getattr(stored, field) != getattr(expected, field):
+            differences.append((field, getattr(stored, field), getattr(expected, field)))
+    if _prune_days(stored.daily_created) != expected.daily_created:
+        differences.append(('daily_created', _prune_days(stored.daily_created), expected.daily_created))
+    if stored_companies != companies:
+        differences.append(('company_counts', len(stored_companies), len(companies)))
+    return differences
+
+
+def _apply_company_changes(user_id, changes, using):
+    """Update CompanyCount rows; return the change in distinct companies."""
+    distinct = 0
+    for company, change in changes.items():
+        if not change:
+            continue
+        counts = CompanyCount.objects.using(using).filter(user_id=user_id, company=company)
+        if change > 0:
+            if not counts.update(count=F('count') + change):
+                CompanyCount.objects.using(using).create(user_id=user_id, company=company, count=change)
+                distinct += 1
+        else:
+            counts.update(count=F('count') + change)
+            deleted, _ = counts.filter(count__lte=0).delete()
+            distinct -= deleted
+    return distinct
+
+
+def apply_delta(user_id, delta, using=DEFAULT_DB_ALIAS):
+    """
+    Apply ``delta`` to ``user_id``'s stored counters.
+    Must run in the same transaction as the write it describes.
+    """
+    if not delta:
+        return
+
+    with transaction.atomic(using=using):
+        stats = (
+            ContactStats.objects.using(using)
+            .select_for_update()
+            .filter(pk=user_id)
+            .first()
+        )
+        if stats is None:
+            if _create_row(user_id, using):
+                # The recount already includes the write being recorded
+                rebuild_stats(user_id, using)
+                return
+            # Another transaction's first write created (and counted) it first
+            stats = ContactStats.objects.using(using).select_for_update().get(pk=user_id)
+
+        stats.companies += _apply_company_changes(user_id, delta.companies, using)
+        stats.total += delta.total
+        stats.favorites += delta.favorites
+        days = Counter(stats.daily_created)
+        days.update(delta.days)
+        stats.daily_created = _prune_days(days)
+        stats.save(using=using)
+        cache_on_commit(user_id, stats, using)
+
+
+def cache_on_commit(user_id, stats, using=DEFAULT_DB_ALIAS):
+    """
+    Cache ``stats`` for ``user_id`` once the current transaction commits;
+    until then other processes keep reading the committed counters.
+    """
+    if is_cached():
+        transaction.on_commit(
+            partial(get_cache().set, cache_key(user_id), snapshot(stats), settings.CONTACTS_STATS_TIMEOUT),
+            using=using,
+        )
+
+
+def invalidate(user_id):
+    """Drop the cached counters so the next read loads them again."""
+    if is_cached():
+        get_cache().delete(cache_key(user_id))
+
+
+def get_contact_stats(user):
+    """
+    Return ``{'total', 'favorites', 'companies', 'recent'}`` for ``user``,
+    from the cache when possible.
+    """
+    cached = is_cached()
+    if cached:
+        entry = get_cache().get(cache_key(user.pk))
+        if entry is not None:
+            instrumentation.count('stats_cache_hits')
+            return summarize(entry)
+        instrumentation.count('stats_cache_misses')
+    # No row means no contact was ever written for this user
+    entry = snapshot(ContactStats.objects.filter(pk=user.pk).first() or ContactStats(user_id=user.pk))
+    if cached:
+        get_cache().set(cache_key(user.pk), entry, settings.CONTACTS_STATS_TIMEOUT)
+    return summarize(entry)
+
+
+async def aget_contact_stats(user):
+    """Async version of get_contact_stats()."""
+    cached = is_cached()
+    if cached:
+        entry = await get_cache().aget(cache_key(user.pk))
+        if entry is not None:
+            instrumentation.count('stats_cache_hits')
+            return summarize(entry)
+        instrumentation.count('stats_cache_misses')
+    stats = await ContactStats.objects.filter(pk=user.pk).afirst() or ContactStats(user_id=user.pk)
+    entry = snapshot(stats)
+    if cached:
+        await get_cache().aset(cache_key(user.pk), entry, settings.CONTACTS_STATS_TIMEOUT)
+    return summarize(entry)
@@ -0,0 +1,168 @@
+"""
+Typeahead suggestions for the contact list search box.
+
+``suggest(user_id, query)`` returns the first contacts whose name, company
+or email starts with ``query``, ignoring case: name matches first, then
+company, then email. Matching uses lower-cased copies of the columns kept
+on each contact (``name_key``, ``company_key``, ``email_normalized``), each
+read with one range scan on a per-user index: a prefix ``p`` is the range
+``[p, p')`` where ``p'`` is ``p`` with its last character incremented,
+which the database answers from the index, unlike ``LIKE``
+(case-insensitive, so unindexed, on SQLite) or the search index (which has
+no order to stop early in).
+
+Results are cached in-process per user and last-write marker
+(``ContactStats.version``, see ``contacts.render_cache``). The marker is
+read from the database on every request, so a write in any process makes
+every process's cached results unreachable. When all matches of a prefix
+are cached, the matches of a longer prefix are filtered from them without
+a query, so typing a name costs a few queries rather than a few per
+keystroke.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import instrumentation, render_cache
+from .models import Contact
+
+
+SUGGEST_FIELDS = ('id', 'name', 'company', 'email', 'name_key', 'company_key', 'email_normalized')
+# Columns matched, in the order their matches are listed
+MATCH_COLUMNS = ('name_key', 'company_key', 'email_normalized')
+MAX_QUERY_LENGTH = 100
+
+
+class PrefixCache:
+    """Thread-safe LRU of ``(rows, complete)`` per user, marker, column and prefix."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_cache = PrefixCache(settings.CONTACTS_SUGGEST_CACHE_SIZE)
+
+
+def prefix_key(value):
+    """The lower-cased copy of ``value`` that prefixes are matched against."""
+    return value.lower()[:100]
+
+
+def prefix_range(column, prefix):
+    """Lookups selecting the values of ``column`` that start with ``prefix``."""
+    if prefix[-1] == '\U0010ffff':
+        return {f'{column}__gte': prefix}
+    return {f'{column}__gte': prefix, f'{column}__lt': prefix[:-1] + chr(ord(prefix[-1]) + 1)}
+
+
+class Lookup:
+    """
+    The suggestions for one query. Per column, the rows come from the cache
+    (``cached``) or from the ``queryset`` range scan (``store``), and
+    ``add`` collects them until there are ``limit``.
+    """
+    def __init__(self, user_id, query, version, limit=None):
+        self.user_id = user_id
+        self.query = query
+        self.version = version
+        self.limit = limit or settings.CONTACTS_SUGGEST_LIMIT
+        self.results = {}
+
+    @property
+    def full(self):
+        return len(self.results) >= self.limit
+
+    def key(self, column, prefix):
+        return (self.user_id, self.version, column, prefix)
+
+    def cached(self, column):
+        """The rows of ``column`` matching the query from the cache, or None."""
+        for length in range(len(self.query), 0, -1):
+            entry = _cache.get(self.key(column, self.query[:length]))
+            if entry is None:
+                continue
+            rows, complete = entry
+            if length == len(self.query):
+                return rows
+            if complete:
+                # Every match of the shorter prefix is cached; narrow them down
+                rows = [row for row in rows if row[column].startswith(self.query)]
+                _cache.set(self.key(column, self.query), (rows, True))
+                return rows
+        return None
+
+    def queryset(self, column):
+        return (
+            Contact.objects.filter(user_id=self.user_id, **prefix_range(column, self.query))
+            .order_by(column, 'id')
+            .values(*SUGGEST_FIELDS)[:self.limit]
+        )
+
+    def store(self, column, rows):
+        """Cache the rows of the range scan of ``column``."""
+        _cache.set(self.key(column, self.query), (rows, len(rows) < self.limit))
+        return rows
+
+    def add(self, rows):
+        for row in rows:
+            if self.full:
+                break
+            self.results.setdefault(row['id'], row)
+
+    def suggestions(self):
+        return [
+            {field: row[field] for field in ('id', 'name', 'company', 'email')}
+            for row in self.results.values()
+        ]
+
+
+def suggest(user_id, query, limit=None):
+    """Contacts of ``user_id`` with a name, company or email starting with ``query``."""
+    if not query:
+        return []
+    lookup = Lookup(user_id, prefix_key(query), render_cache.list_version(user_id), limit)
+    for column in MATCH_COLUMNS:
+        if lookup.full:
+            break
+        rows = lookup.cached(column)
+        instrumentation.count('suggest_hits' if rows is not None else 'suggest_misses')
+        if rows is None:
+            rows = lookup.store(column, list(lookup.queryset(column)))
+        lookup.add(rows)
+    return lookup.suggestions()
+
+
+async def asuggest(user_id, query, limit=None):
+    if not query:
+        return []
+    lookup = Lookup(user_id, prefix_key(query), await render_cache.alist_version(user_id), limit)
+    for column in MATCH_COLUMNS:
+        if lookup.full:
+            break
+        rows = lookup.cached(column)
+        instrumentation.count('suggest_hits' if rows is not None else 'suggest_misses')
+        if rows is None:
+            rows = lookup.store(column, [row async for row in lookup.queryset(column)])
+        lookup.add(rows)
+    return lookup.suggestions()
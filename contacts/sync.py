@@ -0,0 +1,172 @@
+"""
+Delta sync: the contacts changed, and the ids deleted, since a sync token.
+
+A sync without a token returns every contact; each response carries the
+token for the next one in its ``X-Sync-Token`` header. Changes are found
+with a range scan on ``(user, updated_at)`` and deletions are read from
+ContactTombstone rows, so a sync costs what changed rather than the size
+of the book.
+
+A response covers writes up to CONTACTS_SYNC_SETTLE_SECONDS ago, which is
+where its token points: ``updated_at`` is set before a transaction commits,
+and the settle window keeps a write still committing at sync time from
+falling before the next token unseen. Tombstones are kept for
+CONTACTS_SYNC_TOMBSTONE_DAYS; an older token gets a 410 and the client
+starts over with a full sync.
+"""
+import base64
+import binascii
+import csv
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .formats import Echo
+from .models import Contact, ContactTombstone
+
+
+SYNC_FIELDS = (
+    'id', 'name', 'phone', 'email', 'company', 'notes',
+    'is_favorite', 'created_at', 'updated_at',
+)
+SYNC_HEADER = [
+    'Op', 'Id', 'Name', 'Phone', 'Email', 'Company', 'Notes',
+    'Favorite', 'Created At', 'Updated At',
+]
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class InvalidToken(Exception):
+    """Raised when a sync token cannot be decoded."""
+
+
+class ExpiredToken(Exception):
+    """Raised for a token older than the tombstones that are kept."""
+
+
+def encode_token(moment):
+    raw = json.dumps([moment.isoformat()]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token):
+    """The moment a sync token points at. An ISO datetime is accepted too."""
+    try:
+        moment = parse_datetime(token)
+        if moment is None:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            moment = parse_datetime(json.loads(raw)[0])
+    except (binascii.Error, ValueError, TypeError, IndexError):
+        raise InvalidToken(token)
+    if moment is None:
+        raise InvalidToken(token)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Changes:
+    """
+    What ``user``'s sync client needs after ``since`` (None for a full
+    sync): contacts updated in ``[since, until)`` and tombstones of
+    contacts deleted in the same range.
+    """
+    def __init__(self, user, since=None):
+        now = timezone.now()
+        if since is not None and since < now - timedelta(days=settings.CONTACTS_SYNC_TOMBSTONE_DAYS):
+            raise ExpiredToken(since)
+        self.user = user
+        self.since = since
+        self.until = now - timedelta(seconds=settings.CONTACTS_SYNC_SETTLE_SECONDS)
+
+    @property
+    def full(self):
+        return self.since is None
+
+    @property
+    def token(self):
+        return encode_token(self.until)
+
+    def contacts(self):
+        queryset = Contact.objects.filter(user=self.user)
+        if not self.full:
+            queryset = queryset.filter(updated_at__gte=self.since, updated_at__lt=self.until)
+        return queryset.order_by('updated_at', 'id').values(*SYNC_FIELDS)
+
+    def tombstones(self):
+        if self.full:
+            return ContactTombstone.objects.none()
+        return ContactTombstone.objects.filter(
+            user=self.user, deleted_at__gte=self.since, deleted_at__lt=self.until,
+        ).order_by('deleted_at', 'id').values_list('contact_id', 'deleted_at')
+
+    def records(self, chunk_size=None):
+        """``('upsert', values)`` for each changed contact, then ``('delete', values)``."""
+        chunk_size = chunk_size or settings.CONTACTS_EXPORT_CHUNK_SIZE
+        for values in self.contacts().iterator(chunk_size=chunk_size):
+            yield 'upsert', values
+        for contact_id, deleted_at in self.tombstones().iterator(chunk_size=chunk_size):
+            yield 'delete', {'id': contact_id, 'deleted_at': deleted_at}
+
+
+def csv_row(op, values):
+    if op == 'delete':
+        # Updated At holds the deletion time
+        return [op, values['id'], '', '', '', '', '', '', '', values['deleted_at'].isoformat()]
+    return [
+        op,
+        values['id'],
+        values['name'],
+        values['phone'],
+        values['email'],
+        values['company'],
+        values['notes'],
+        'Yes' if values['is_favorite'] else 'No',
+        values['created_at'].isoformat(),
+        values['updated_at'].isoformat(),
+    ]
+
+
+def ndjson_line(op, values):
+    return json.dumps({'op': op, **values}, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream(changes, format, chunk_size=None):
+    """Yield ``changes`` as CSV or NDJSON text, one chunk of rows at a time."""
+    chunk_size = chunk_size or settings.CONTACTS_EXPORT_CHUNK_SIZE
+    writer = csv.writer(Echo())
+    if format == 'csv':
+        yield writer.writerow(SYNC_HEADER)
+
+    lines = []
+    for op, values in changes.records(chunk_size):
+        lines.append(writer.writerow(csv_row(op, values)) if format == 'csv' else ndjson_line(op, values))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def record_deletions(user_id, contact_ids, using=DEFAULT_DB_ALIAS):
+    """Add tombstones for ``contact_ids``, in the deleting transaction."""
+    now = timezone.now()
+    ContactTombstone.objects.using(using).bulk_create(
+        [ContactTombstone(user_id=user_id, contact_id=pk, deleted_at=now) for pk in contact_ids]
+    )
+
+
+def prune_tombstones(days=None):
+    """Delete tombstones older than ``days`` (CONTACTS_SYNC_TOMBSTONE_DAYS)."""
+    days = settings.CONTACTS_SYNC_TOMBSTONE_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = ContactTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
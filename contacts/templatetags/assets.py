@@ -0,0 +1,30 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from contacts.assets import critical_css
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def stylesheet(context, name):
+    """
+    Link the static stylesheet ``name``. Once collectstatic has built its
+    critical CSS (see contacts/assets.py), the page's critical rules are
+    inlined and the stylesheet is loaded without blocking rendering.
+    """
+    url = static(name)
+    css = None if settings.DEBUG else critical_css(name, context.template.origin.template_name)
+    if css is None:
+        return format_html('<link href="{}" rel="stylesheet">', url)
+    return format_html(
+        '<style>{}</style>\n'
+        '    <link href="{}" rel="preload" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        '    <noscript><link href="{}" rel="stylesheet"></noscript>',
+        # Built from our own stylesheet; escaping would break quoted values
+        mark_safe(css), url, url,
+    )
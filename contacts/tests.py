@@ -1,3 +1,1133 @@
-from django.test import TestCase
+import csv
+import gzip
+import importlib
+import io
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, transaction
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from zenvio import routers, warmup
+
+from . import assets, render_cache, stats
+from . import urls as contacts_urls
+from .async_views import AsyncContactListAPIView, AsyncContactListView
+from .bulk import apply_bulk_action, select_contacts
+from .charsets import SNIFF_SIZE, sniff_encoding
+from .dedup import find_clusters, merge_cluster, normalize_email, normalize_phone
+from .formats import EXPORT_HEADER
+from .importers import ContactImporter, CSVImportError
+from .jobs import claim, create_job, process, revive, run_job
+from .models import Contact, ContactStats, ContactTombstone, ImportJob
+from .pagination import CursorPaginator
+from .search import icontains_filter, search_contacts, search_index_kind
+from .stats import aget_contact_stats, get_contact_stats, rebuild_stats, verify_stats
+from .suggest import suggest
+from .sync import encode_token
+
+
+def make_user(username='alice'):
+    return get_user_model().objects.create_user(
+        username=username, email=f'{username}@example.com', password='test-password',
+    )
+
+
+def make_contacts(user, count, **fields):
+    return [
+        Contact.objects.create(user=user, name=f'Contact {i:03d}', phone=f'+1555000{i:04d}', **fields)
+        for i in range(count)
+    ]
+
+
+class ImportReader(list):
+    """A parsed upload, as the format readers yield it."""
+
+    def __init__(self, fieldnames, rows):
+        super().__init__(rows)
+        self.fieldnames = fieldnames
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        contacts = make_contacts(self.user, 25)
+        now = timezone.now()
+        for i, contact in enumerate(contacts):
+            # Ties on created_at, and favorites spread through the list
+            Contact.objects.filter(pk=contact.pk).update(
+                created_at=now - timedelta(minutes=i // 3), is_favorite=i % 4 == 0,
+            )
+        self.queryset = Contact.objects.filter(user=self.user)
+        self.expected = list(self.queryset.order_by('-is_favorite', '-created_at', '-id').values_list('pk', flat=True))
+
+    def test_forward_pages_neither_skip_nor_repeat(self):
+        paginator = CursorPaginator(self.queryset, 4)
+        seen, cursor = [], ''
+        while True:
+            page = paginator.page(cursor)
+            seen += [contact.pk for contact in page]
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.expected)
+
+    def test_backward_pages_neither_skip_nor_repeat(self):
+        paginator = CursorPaginator(self.queryset, 4)
+        page = paginator.page('')
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+        seen = [contact.pk for contact in page]
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            seen = [contact.pk for contact in page] + seen
+        self.assertEqual(seen, self.expected)
+
+    @override_settings(CONTACTS_LIST_PAGINATION='cursor', CONTACTS_PAGE_CACHE_TIMEOUT=0)
+    def test_search_is_paged_by_number_in_rank_order(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('contacts:contact_list'), {'search': 'Contact 01'})
+        self.assertFalse(getattr(response.context['page_obj'], 'cursor_based', False))
+        ranked = search_contacts(self.queryset, 'Contact 01').order_by('-search_rank', '-is_favorite', '-created_at')
+        self.assertEqual(list(response.context['contacts']), list(ranked[:12]))
+
+        response = self.client.get(reverse('contacts:contact_list'))
+        self.assertTrue(response.context['page_obj'].cursor_based)
+
+
+class ContactStatsTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+
+    def test_process_local_cache_is_not_used(self):
+        make_contacts(self.user, 3)
+        self.assertEqual(get_contact_stats(self.user)['total'], 3)
+        # Another process's write is visible at once
+        ContactStats.objects.filter(pk=self.user.pk).update(total=7)
+        self.assertEqual(get_contact_stats(self.user)['total'], 7)
+
+    def test_user_without_contacts_has_zero_counters(self):
+        self.assertEqual(
+            get_contact_stats(self.user), {'total': 0, 'favorites': 0, 'companies': 0, 'recent': 0},
+        )
+
+
+class SharedStatsCacheTests(TestCase):
+    def setUp(self):
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        shared_cache = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location.name,
+        }})
+        shared_cache.enable()
+        self.addCleanup(shared_cache.disable)
+        self.user = make_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_contacts(self.user, 3)
+
+    def test_committed_writes_are_cached(self):
+        with self.assertNumQueries(0), mock.patch('contacts.stats.instrumentation.count') as count:
+            self.assertEqual(get_contact_stats(self.user)['total'], 3)
+        count.assert_called_once_with('stats_cache_hits')
+        with self.captureOnCommitCallbacks(execute=True):
+            make_contacts(self.user, 1, is_favorite=True)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_contact_stats(self.user)['favorites'], 1)
+
+    def test_uncommitted_writes_are_not_cached(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            make_contacts(self.user, 1)
+        self.assertEqual(get_contact_stats(self.user)['total'], 3)
+
+    def test_miss_reads_the_row_once(self):
+        stats.invalidate(self.user.pk)
+        with mock.patch('contacts.stats.instrumentation.count') as count:
+            self.assertEqual(get_contact_stats(self.user)['total'], 3)
+            with self.assertNumQueries(0):
+                self.assertEqual(get_contact_stats(self.user)['total'], 3)
+        self.assertEqual(count.call_args_list, [mock.call('stats_cache_misses'), mock.call('stats_cache_hits')])
+
+    async def test_async_reads(self):
+        self.assertEqual((await aget_contact_stats(self.user))['total'], 3)
+
+    def test_deleted_user_is_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertIsNone(stats.get_cache().get(stats.cache_key(self.user.pk)))
+
+
+class SignalMaintainedStatsTests(TestCase):
+    """The ContactStats row equals a fresh count after every kind of write."""
+
+    def setUp(self):
+        self.user = make_user()
+
+    def assertCounters(self, **expected):
+        self.assertEqual(verify_stats(self.user.pk), [])
+        counters = get_contact_stats(self.user)
+        self.assertEqual({name: counters[name] for name in expected}, expected)
+
+    def test_create_edit_and_delete(self):
+        first = Contact.objects.create(user=self.user, name='Ann', phone='+15550000001', company='Acme')
+        second = Contact.objects.create(user=self.user, name='Bob', phone='+15550000002', is_favorite=True)
+        self.assertCounters(total=2, favorites=1, companies=1, recent=2)
+
+        second.company = 'Globex'
+        second.is_favorite = False
+        second.save()
+        self.assertCounters(total=2, favorites=0, companies=2)
+
+        first.delete()
+        self.assertCounters(total=1, favorites=0, companies=1)
+
+    def test_partial_update_fields(self):
+        contact = Contact.objects.create(user=self.user, name='Ann', phone='+15550000001')
+        contact = Contact.objects.only('id', 'user', 'name').get(pk=contact.pk)
+        contact.name = 'Anne'
+        contact.save(update_fields=['name'])
+        self.assertCounters(total=1, favorites=0)
+
+    def test_first_writes_racing_to_create_the_row(self):
+        make_contacts(self.user, 2)
+        # Contacts written before the user had a counters row
+        ContactStats.objects.filter(pk=self.user.pk).delete()
+        create_row = stats._create_row
+
+        def created_by_another_transaction(user_id, using):
+            # It committed the row, counting only its own write, while this one waited
+            ContactStats.objects.create(
+                pk=user_id, total=2, daily_created={timezone.localdate().isoformat(): 2},
+            )
+            return create_row(user_id, using)
+
+        with mock.patch('contacts.stats._create_row', side_effect=created_by_another_transaction) as create:
+            make_contacts(self.user, 1, is_favorite=True)
+        create.assert_called_once()
+        self.assertCounters(total=3, favorites=1, recent=3)
+
+    def test_import_and_merge(self):
+        rows = [
+            {'Name': 'Ann', 'Phone': '+15550000001', 'Company': 'Acme'},
+            {'Name': 'Ann Again', 'Phone': '+15550000009', 'Email': 'ann@example.com'},
+            {'Name': 'Bob', 'Phone': '+15550000002', 'Email': 'ANN@example.com'},
+        ]
+        reader = ImportReader(['Name', 'Phone', 'Email', 'Company'], rows)
+        ContactImporter(self.user, duplicates='create').run(reader)
+        self.assertCounters(total=3, companies=1)
+
+        merge_cluster(list(Contact.objects.filter(user=self.user, email__iexact='ann@example.com').order_by('pk')))
+        self.assertCounters(total=2, companies=1)
+
+
+class BulkActionTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.other = make_user('bob')
+        self.contacts = make_contacts(self.user, 6, company='Acme')
+        self.others = make_contacts(self.other, 2)
+
+    def apply(self, action, contacts, **kwargs):
+        queryset = select_contacts(self.user, ids=[contact.pk for contact in contacts])
+        return apply_bulk_action(self.user, queryset, action, **kwargs)
+
+    def test_favorite_and_set_company_keep_counters_exact(self):
+        self.assertEqual(self.apply('favorite', self.contacts[:4]), 4)
+        self.assertEqual(self.apply('favorite', self.contacts[:5]), 1)
+        self.assertEqual(self.apply('set_company', self.contacts[:2], company='Globex'), 2)
+        self.assertEqual(verify_stats(self.user.pk), [])
+        self.assertEqual(get_contact_stats(self.user)['favorites'], 5)
+        self.assertEqual(get_contact_stats(self.user)['companies'], 2)
+
+    def test_delete_removes_rows_and_records_tombstones(self):
+        deleted = self.contacts[:3]
+        self.assertEqual(self.apply('delete', [*deleted, *self.others]), 3)
+        self.assertFalse(Contact.objects.filter(pk__in=[contact.pk for contact in deleted]).exists())
+        self.assertEqual(Contact.objects.filter(user=self.other).count(), 2)
+        self.assertEqual(
+            set(ContactTombstone.objects.filter(user=self.user).values_list('contact_id', flat=True)),
+            {contact.pk for contact in deleted},
+        )
+        self.assertEqual(verify_stats(self.user.pk), [])
+        self.assertEqual(get_contact_stats(self.user)['total'], 3)
+
+
+class ImportJobTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.upload = SimpleUploadedFile('people.csv', b'Name,Phone\nAnn,+15550000001\nBob,+15550000002\n')
+
+    def tearDown(self):
+        for job in ImportJob.objects.all():
+            job.file.delete(save=False)
+
+    @override_settings(CONTACTS_IMPORT_MODE='sync')
+    def test_sync_mode_imports_within_the_request(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('contacts:contact_import'), {'csv_file': self.upload})
+        job = ImportJob.objects.get(user=self.user)
+        self.assertRedirects(response, reverse('contacts:import_job', args=[job.pk]))
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual(Contact.objects.filter(user=self.user).count(), 2)
+
+    @override_settings(CONTACTS_IMPORT_MODE='thread', CONTACTS_IMPORT_STALE_AFTER=600)
+    def test_status_poll_restarts_a_stalled_job(self):
+        job = create_job(self.user, self.upload)
+        ImportJob.objects.filter(pk=job.pk).update(status=ImportJob.RUNNING)
+        self.client.force_login(self.user)
+        url = reverse('contacts:import_job_status', args=[job.pk])
+
+        with mock.patch('contacts.jobs.get_executor') as get_executor:
+            self.client.get(url)
+            get_executor.return_value.submit.assert_not_called()
+
+            # Its process died ten minutes ago
+            ImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(seconds=601))
+            self.assertEqual(self.client.get(url).json()['status'], ImportJob.PENDING)
+            get_executor.return_value.submit.assert_called_once_with(run_job, job.pk)
+
+        process(claim(job.pk))
+        self.assertEqual(ImportJob.objects.get(pk=job.pk).status, ImportJob.DONE)
+        self.assertEqual(Contact.objects.filter(user=self.user).count(), 2)
+
+    @override_settings(CONTACTS_IMPORT_MODE='queue')
+    def test_queue_mode_leaves_stalled_jobs_to_the_worker(self):
+        job = create_job(self.user, self.upload)
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.RUNNING, updated_at=timezone.now() - timedelta(days=1),
+        )
+        self.assertFalse(revive(ImportJob.objects.get(pk=job.pk)))
+
+
+class PerfReportCommandTests(TestCase):
+    def test_refuses_a_process_local_cache(self):
+        with self.assertRaisesMessage(CommandError, 'CACHE_BACKEND=file'):
+            call_command('perf_report', stdout=io.StringIO())
+
+    def test_reads_a_shared_cache(self):
+        with tempfile.TemporaryDirectory() as location:
+            caches = {'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+            }}
+            with override_settings(CACHES=caches):
+                stdout = io.StringIO()
+                call_command('perf_report', stdout=stdout, stderr=io.StringIO())
+        self.assertIn('No requests recorded.', stdout.getvalue())
+
+
+class SeedContactsCommandTests(TestCase):
+    def test_refuses_to_run_without_debug(self):
+        with self.assertRaisesMessage(CommandError, 'DEBUG=True'):
+            call_command('seed_contacts', '--per-user', '1', stdout=io.StringIO())
+        self.assertFalse(get_user_model().objects.exists())
+
+    @override_settings(DEBUG=True)
+    def test_generates_and_prints_a_password(self):
+        stdout = io.StringIO()
+        call_command('seed_contacts', '--users', '2', '--per-user', '3', stdout=stdout)
+        password = stdout.getvalue().rsplit(': ', 1)[1].strip()
+        self.assertNotEqual(password, 'seed-password')
+        user = get_user_model().objects.get(username='seed-1')
+        self.assertTrue(user.check_password(password))
+        self.assertEqual(Contact.objects.filter(user=user).count(), 3)
+
+    @override_settings(DEBUG=True)
+    def test_uses_the_given_password(self):
+        stdout = io.StringIO()
+        call_command('seed_contacts', '--per-user', '0', '--password', 'given-password', stdout=stdout)
+        self.assertNotIn('given-password', stdout.getvalue())
+        self.assertTrue(get_user_model().objects.get(username='seed-0').check_password('given-password'))
+
+
+@override_settings(CONTACTS_PAGE_CACHE_TIMEOUT=300)
+class ListPageCacheTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.contacts = make_contacts(self.user, 2)
+        self.client.force_login(self.user)
+        self.url = reverse('contacts:contact_list')
+
+    def test_marker_is_stored_with_the_counters(self):
+        version = render_cache.list_version(self.user.pk)
+        self.assertEqual(int(version, 16), ContactStats.objects.get(pk=self.user.pk).version)
+        self.contacts[0].save()
+        self.assertGreater(int(render_cache.list_version(self.user.pk), 16), int(version, 16))
+        # A recount keeps it
+        version = render_cache.list_version(self.user.pk)
+        rebuild_stats(self.user.pk)
+        self.assertEqual(render_cache.list_version(self.user.pk), version)
+
+    def test_write_by_another_process_replaces_cached_pages(self):
+        self.assertContains(self.client.get(self.url), 'Contact 001')
+        self.assertContains(self.client.get(self.url), 'Contact 001')
+        # What another process's write leaves in the database: the contact and
+        # the bumped marker, and nothing in this process's cache
+        with transaction.atomic():
+            Contact.objects.filter(pk=self.contacts[1].pk).update(name='Renamed', updated_at=timezone.now())
+            render_cache.invalidate_pages(self.user.pk)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Renamed')
+        self.assertNotContains(response, 'Contact 001')
+
+    def test_marker_row_is_created_for_older_contacts(self):
+        ContactStats.objects.filter(pk=self.user.pk).delete()
+        self.assertEqual(render_cache.list_version(self.user.pk), '0')
+        with transaction.atomic():
+            render_cache.invalidate_pages(self.user.pk)
+        self.assertNotEqual(render_cache.list_version(self.user.pk), '0')
+        self.assertEqual(verify_stats(self.user.pk), [])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.contact = make_contacts(self.user, 1)[0]
+        self.client.force_login(self.user)
+
+    def assertRevalidates(self, url, write):
+        # The first response sets the CSRF cookie the validators cover
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        write()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def write_elsewhere(self):
+        """What a write in another process leaves behind: rows, no cache entries."""
+        with transaction.atomic():
+            Contact.objects.filter(pk=self.contact.pk).update(name='Renamed', updated_at=timezone.now())
+            render_cache.invalidate_pages(self.user.pk)
+
+    def test_list_page(self):
+        self.assertRevalidates(reverse('contacts:contact_list'), self.write_elsewhere)
+
+    def test_list_page_after_a_write(self):
+        self.assertRevalidates(
+            reverse('contacts:contact_list'),
+            lambda: Contact.objects.create(user=self.user, name='New', phone='+15550009999'),
+        )
+
+    def test_home_page(self):
+        self.assertRevalidates(reverse('home'), self.write_elsewhere)
+
+    def test_detail_page(self):
+        self.assertRevalidates(reverse('contacts:contact_detail', args=[self.contact.pk]), self.write_elsewhere)
+
+
+@override_settings(DB_REPLICA_ALIASES=['replica1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+    Which database each read of a request goes to. Outside a TestCase
+    transaction, and without querying: no replica exists here.
+    """
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = routers.ReplicaRouter()
+
+    def run_request(self, method, url, view=None, cookies=None):
+        """Pass a request through ReplicaMiddleware; return (read aliases, response)."""
+        reads = {}
+
+        def get_response(request):
+            middleware.process_view(request, None, (), {})
+            reads['contact'] = Contact.objects.all().db
+            reads['marker'] = ContactStats.objects.filter(pk=1).db
+            reads['user'] = get_user_model().objects.all().db
+            if view is not None:
+                view()
+                reads['after_write'] = Contact.objects.all().db
+            return HttpResponse()
+
+        middleware = routers.ReplicaMiddleware(get_response)
+        request = getattr(self.factory, method)(url)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(url)
+        return reads, middleware(request)
+
+    def test_list_page_and_its_marker_read_from_the_same_replica(self):
+        reads, response = self.run_request('get', reverse('contacts:contact_list'))
+        self.assertEqual(reads['contact'], 'replica1')
+        self.assertEqual(reads['marker'], 'replica1')
+        self.assertEqual(reads['user'], 'default')
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_other_views_and_methods_read_the_primary(self):
+        reads, _ = self.run_request('get', reverse('contacts:contact_import'))
+        self.assertEqual(reads['contact'], 'default')
+        reads, _ = self.run_request('post', reverse('contacts:contact_list'))
+        self.assertEqual(reads['contact'], 'default')
+
+    def test_write_pins_the_browser_to_the_primary(self):
+        # What saving a contact asks the router
+        write = lambda: self.router.db_for_write(Contact)
+        reads, response = self.run_request('get', reverse('contacts:contact_list'), view=write)
+        # The rest of the request reads its own write
+        self.assertEqual(reads['after_write'], 'default')
+        pin = response.cookies[routers.PIN_COOKIE].value
+
+        reads, _ = self.run_request('get', reverse('contacts:contact_list'), cookies={routers.PIN_COOKIE: pin})
+        self.assertEqual(reads['contact'], 'default')
+        self.assertEqual(reads['marker'], 'default')
+
+        expired = str(int(float(pin)) - settings.DB_REPLICA_PIN_SECONDS - 1)
+        reads, _ = self.run_request('get', reverse('contacts:contact_list'), cookies={routers.PIN_COOKIE: expired})
+        self.assertEqual(reads['contact'], 'replica1')
+
+
+class SuggestTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.mcdonald = Contact.objects.create(
+            user=self.user, name='McDonald', phone='+15550000001', company='ACME corp', email='Ron@Example.com',
+        )
+        self.other = Contact.objects.create(user=self.user, name='Ann Mack', phone='+15550000002', company='Macro')
+
+    def names(self, query):
+        return [row['name'] for row in suggest(self.user.pk, query)]
+
+    def test_matches_ignore_case(self):
+        for query in ('mcdonald', 'MCD', 'McD', 'mCdOnAlD'):
+            self.assertEqual(self.names(query), ['McDonald'])
+        self.assertEqual(self.names('acme C'), ['McDonald'])
+        self.assertEqual(self.names('RON@'), ['McDonald'])
+
+    def test_names_before_companies(self):
+        Contact.objects.create(user=self.user, name='Macy', phone='+15550000003')
+        self.assertEqual(self.names('mac'), ['Macy', 'Ann Mack'])
+
+    def test_longer_prefix_narrows_cached_matches(self):
+        self.assertEqual(self.names('m'), ['McDonald', 'Ann Mack'])
+        # Only the marker is read
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names('mcd'), ['McDonald'])
+
+    def test_write_in_another_process_shows_at_once(self):
+        self.assertEqual(self.names('zed'), [])
+        # Rows and marker written without this process's knowledge
+        with transaction.atomic():
+            Contact.objects.filter(pk=self.other.pk).update(name='Zed', name_key='zed')
+            render_cache.invalidate_pages(self.user.pk)
+        self.assertEqual(self.names('zed'), ['Zed'])
+
+    def test_renamed_contact_and_bulk_company_keep_keys(self):
+        self.other.name = 'Zoe'
+        self.other.save(update_fields=['name'])
+        self.assertEqual(self.names('zoe'), ['Zoe'])
+        apply_bulk_action(self.user, select_contacts(self.user, ids=[self.other.pk]), 'set_company', company='Initech')
+        self.assertEqual(self.names('initech'), ['Zoe'])
+
+
+class CriticalCSSTests(SimpleTestCase):
+    def test_list_page_covers_the_cards_rendered_in_python(self):
+        self.assertIn(render_cache.CARD_TEMPLATE, settings.ASSET_PAGE_PARTIALS['contacts/contact_list.html'])
+        _, critical = assets.build_css(assets.read(Path(finders.find('css/styles.css'))))
+        for selector in ('.feature-card-custom', '.contact-avatar'):
+            with self.subTest(selector=selector):
+                self.assertIn(selector, critical['contacts/contact_list.html'])
+        # Not needed by a page that shows no cards
+        self.assertNotIn('.contact-avatar{', critical['accounts/login.html'])
+
+
+def import_file(user, name, data, duplicates=None):
+    """Import the upload ``name`` holding ``data`` as a job, in this thread."""
+    job = create_job(user, SimpleUploadedFile(name, data), duplicates)
+    process(claim(job.pk))
+    job.refresh_from_db()
+    job.file.delete(save=False)
+    return job
+
+
+def contact_values(user):
+    return sorted(Contact.objects.filter(user=user).values_list('name', 'phone', 'email', 'company', 'notes'))
+
+
+class FormatRoundTripTests(TestCase):
+    """Exports in every format import back into the same contacts."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.other = make_user('bob')
+        Contact.objects.create(
+            user=self.user, name='Zoë Ångström', phone='+15550000001', email='zoe@example.com',
+            company='Acme, Inc; Ltd', notes='Line one\nLine two: "quoted", back\\slash',
+        )
+        Contact.objects.create(user=self.user, name='李小龍', phone='+15550000002')
+        Contact.objects.create(user=self.user, name='Plain Name', phone='5550000003', company='Globex')
+        self.client.force_login(self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('contacts:contact_export'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def assertRoundTrips(self, filename, data):
+        job = import_file(self.other, filename, data)
+        self.assertEqual((job.status, job.imported_count, job.skipped_count), (ImportJob.DONE, 3, 0), job.errors)
+        self.assertEqual(contact_values(self.other), contact_values(self.user))
+
+    def test_csv(self):
+        self.assertRoundTrips('contacts.csv', self.export())
+
+    def test_ndjson(self):
+        self.assertRoundTrips('contacts.ndjson', self.export(format='ndjson'))
+
+    def test_vcard_4(self):
+        self.assertRoundTrips('contacts.vcf', self.export(format='vcf'))
+
+    def test_vcard_3(self):
+        self.assertRoundTrips('contacts.vcf', self.export(format='vcf3'))
+
+    def test_gzip_download(self):
+        data = self.export(format='ndjson', compress='gzip')
+        self.assertEqual(gzip.decompress(data), self.export(format='ndjson'))
+        self.assertRoundTrips('contacts.ndjson.gz', data)
+
+    def test_gzip_without_gz_name(self):
+        # Recognized by its magic bytes
+        self.assertRoundTrips('contacts.csv', gzip.compress(self.export()))
+
+    @override_settings(CONTACTS_IMPORT_MAX_FILE_SIZE=100)
+    def test_gzip_limit_applies_to_the_uncompressed_size(self):
+        data = gzip.compress(b'Name,Phone\n' + b'Ann,+15550000001\n' * 50)
+        self.assertLess(len(data), 100)
+        job = import_file(self.other, 'contacts.csv.gz', data)
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertIn('uncompressed', job.error_message)
+
+    def test_unparsable_records_are_reported_per_row(self):
+        data = b'{"Name": "Ann", "Phone": "+15550000001"}\nnot json\n{"Name": "Bob", "Phone": "+15550000002"}\n'
+        job = import_file(self.other, 'contacts.ndjson', data)
+        self.assertEqual((job.imported_count, job.skipped_count), (2, 1))
+        self.assertTrue(job.errors[0].startswith('Row 2:'), job.errors)
+
+
+class EncodingDetectionTests(TestCase):
+    TEXT = 'Name,Phone,Company\nJosé Müller,+15550000001,Café “Crème”\nBob,+15550000002,€uro Ltd\n'
+
+    def setUp(self):
+        self.user = make_user()
+
+    def imported(self, name, data):
+        job = import_file(self.user, name, data)
+        self.assertEqual(job.status, ImportJob.DONE, job.error_message)
+        return sorted(Contact.objects.filter(user=self.user).values_list('name', 'company'))
+
+    def test_encodings(self):
+        expected = [('Bob', '€uro Ltd'), ('José Müller', 'Café “Crème”')]
+        for encoding in ('utf-8', 'utf-8-sig', 'utf-16', 'utf-16-le', 'utf-16-be', 'cp1252'):
+            with self.subTest(encoding=encoding):
+                self.assertEqual(self.imported('people.csv', self.TEXT.encode(encoding)), expected)
+                Contact.objects.filter(user=self.user).delete()
+
+    def test_gzip_utf_16(self):
+        data = gzip.compress(self.TEXT.encode('utf-16'))
+        self.assertEqual(len(self.imported('people.csv.gz', data)), 2)
+
+    def test_cp1252_bytes_after_the_sniffed_chunk(self):
+        # Valid UTF-8 for the whole first chunk, then a row saved as cp1252
+        filler = ''.join(f'Contact {i:05d},+1555{i:07d},\n' for i in range(SNIFF_SIZE // 25))
+        data = ('Name,Phone,Company\n' + filler).encode('utf-8') + 'Zoë,+15559999999,Café\n'.encode('cp1252')
+        self.assertEqual(sniff_encoding(data[:SNIFF_SIZE]), 'utf-8')
+        self.imported('people.csv', data)
+        self.assertTrue(Contact.objects.filter(user=self.user, name='Zoë', company='Café').exists())
+
+    def test_character_cut_by_the_sniffed_chunk(self):
+        head = ('x' * (SNIFF_SIZE - 1) + 'é').encode('utf-8')[:SNIFF_SIZE]
+        self.assertEqual(sniff_encoding(head), 'utf-8')
+
+
+class ContactAPITests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.contact = Contact.objects.create(
+            user=self.user, name='Ann', phone='+15550000001', email='ann@example.com', company='Acme',
+        )
+        self.client.force_login(self.user)
+        self.url = reverse('contacts:api_contact_detail', args=[self.contact.pk])
+
+    def patch(self, data, **headers):
+        return self.client.patch(self.url, json.dumps(data), content_type='application/json', headers=headers)
+
+    def test_sparse_fields(self):
+        response = self.client.get(self.url, {'fields': 'name,phone'})
+        self.assertEqual(response.json(), {'name': 'Ann', 'phone': '+15550000001'})
+        response = self.client.get(self.url, {'fields': 'name,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_etag_and_304(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 304)
+        self.patch({'company': 'Globex'})
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_stale_if_match_is_refused(self):
+        etag = self.client.get(self.url)['ETag']
+        # Someone else edits the contact in between
+        response = self.patch({'company': 'Globex'}, if_match=etag)
+        self.assertEqual(response.status_code, 200)
+        fresh = response['ETag']
+
+        response = self.patch({'company': 'Initech'}, if_match=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Contact.objects.get(pk=self.contact.pk).company, 'Globex')
+        self.assertEqual(self.client.delete(self.url, headers={'If-Match': etag}).status_code, 412)
+        self.assertTrue(Contact.objects.filter(pk=self.contact.pk).exists())
+
+        self.assertEqual(self.client.delete(self.url, headers={'If-Match': fresh}).status_code, 204)
+        self.assertFalse(Contact.objects.filter(pk=self.contact.pk).exists())
+
+    def test_validation_errors(self):
+        response = self.patch({'phone': 'not a phone', 'is_favorite': 'yes'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'phone', 'is_favorite'})
+
+    def test_other_users_contacts_are_not_found(self):
+        self.client.force_login(make_user('bob'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.patch({'name': 'Mine'}).status_code, 404)
+
+    def test_anonymous_requests_get_401(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_list_pages_with_cursors(self):
+        make_contacts(self.user, 5)
+        url, seen = reverse('contacts:api_contact_list') + '?limit=2&fields=id', []
+        while url:
+            data = self.client.get(url).json()
+            seen += [row['id'] for row in data['results']]
+            url = data['next']
+        self.assertEqual(sorted(seen), sorted(Contact.objects.filter(user=self.user).values_list('pk', flat=True)))
+        self.assertEqual(len(seen), 6)
+
+
+@override_settings(CONTACTS_DEFAULT_COUNTRY_CODE='1')
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+
+    def test_normalized_keys(self):
+        for raw in ('+1 (555) 000-0001', '555-000-0001', '0015550000001', '+15550000001'):
+            with self.subTest(raw=raw):
+                self.assertEqual(normalize_phone(raw), '+15550000001')
+        self.assertEqual(normalize_email('  Ann@Example.COM '), 'ann@example.com')
+
+    def test_clusters_join_through_either_key(self):
+        ann = Contact.objects.create(user=self.user, name='Ann', phone='+15550000001')
+        # Same phone, written differently, and an email...
+        ann2 = Contact.objects.create(user=self.user, name='Ann B', phone='5550000001', email='ann@example.com')
+        # ...which links a third contact with another phone
+        ann3 = Contact.objects.create(user=self.user, name='A. B.', phone='+15550000009', email='ANN@example.com')
+        Contact.objects.create(user=self.user, name='Bob', phone='+15550000002')
+        Contact.objects.create(user=make_user('bob'), name='Ann', phone='+15550000001')
+        self.assertEqual(find_clusters(Contact.objects.filter(user=self.user)), [[ann.pk, ann2.pk, ann3.pk]])
+
+    def test_merge_fills_blanks_and_keeps_favorites(self):
+        first = Contact.objects.create(user=self.user, name='Ann', phone='+15550000001', notes='Met at expo')
+        second = Contact.objects.create(
+            user=self.user, name='Ann B', phone='+15550000001', email='ann@example.com',
+            company='Acme', notes='Prefers email', is_favorite=True,
+        )
+        merged = merge_cluster([first, second])
+        merged.refresh_from_db()
+        self.assertEqual(
+            (merged.name, merged.email, merged.company, merged.notes, merged.is_favorite),
+            ('Ann', 'ann@example.com', 'Acme', 'Met at expo\nPrefers email', True),
+        )
+        self.assertFalse(Contact.objects.filter(pk=second.pk).exists())
+
+    def test_import_policies(self):
+        existing = Contact.objects.create(user=self.user, name='Ann', phone='+15550000001', company='Acme')
+        # Valid for the form, and the same number once normalized
+        row = {'Name': 'Ann Smith', 'Phone': '5550000001', 'Company': 'Globex', 'Email': 'ann@example.com'}
+        expected = {
+            'skip': ('Ann', 'Acme', ''),
+            'merge': ('Ann', 'Acme', 'ann@example.com'),
+            'update': ('Ann Smith', 'Globex', 'ann@example.com'),
+        }
+        for policy, values in expected.items():
+            with self.subTest(policy=policy):
+                Contact.objects.filter(pk=existing.pk).update(name='Ann', company='Acme', email='', email_normalized='')
+                result = ContactImporter(self.user, duplicates=policy).run(ImportReader(list(row), [row]))
+                self.assertEqual(result.imported_count, 0)
+                contact = Contact.objects.get(user=self.user)
+                self.assertEqual((contact.name, contact.company, contact.email), values)
+
+        result = ContactImporter(self.user, duplicates='create').run(ImportReader(list(row), [row]))
+        self.assertEqual(result.imported_count, 1)
+        self.assertEqual(verify_stats(self.user.pk), [])
+
+    def test_duplicate_rows_within_a_file(self):
+        rows = [
+            {'Name': 'Ann', 'Phone': '+15550000001'},
+            {'Name': 'Ann again', 'Phone': '0015550000001'},
+        ]
+        result = ContactImporter(self.user, duplicates='skip').run(ImportReader(['Name', 'Phone'], rows))
+        self.assertEqual((result.imported_count, result.duplicate_count), (1, 1))
+
+
+@override_settings(CONTACTS_SYNC_SETTLE_SECONDS=0)
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.contacts = make_contacts(self.user, 3)
+        make_contacts(make_user('bob'), 1)
+        self.client.force_login(self.user)
+        self.url = reverse('contacts:api_contact_sync')
+
+    def sync(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        return [json.loads(line) for line in lines], response['X-Sync-Token']
+
+    def test_changes_and_deletions_since_the_token(self):
+        records, token = self.sync()
+        self.assertEqual(sorted(record['id'] for record in records), sorted(c.pk for c in self.contacts))
+
+        edited, deleted, bulk_deleted = self.contacts
+        edited.company = 'Acme'
+        edited.save()
+        deleted_pk = deleted.pk
+        deleted.delete()
+        created = Contact.objects.create(user=self.user, name='New', phone='+15550009999')
+        apply_bulk_action(self.user, select_contacts(self.user, ids=[bulk_deleted.pk]), 'delete')
+
+        records, token = self.sync(since=token)
+        self.assertEqual(
+            sorted((record['op'], record['id']) for record in records),
+            sorted([('upsert', edited.pk), ('upsert', created.pk),
+                    ('delete', deleted_pk), ('delete', bulk_deleted.pk)]),
+        )
+        self.assertEqual(self.sync(since=token)[0], [])
+
+    def test_csv_format(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][:2], ['Op', 'Id'])
+        self.assertEqual(len(rows), 4)
+
+    def test_bad_and_expired_tokens(self):
+        self.assertEqual(self.client.get(self.url, {'since': 'garbage!'}).status_code, 400)
+        old = encode_token(timezone.now() - timedelta(days=settings.CONTACTS_SYNC_TOMBSTONE_DAYS + 1))
+        self.assertEqual(self.client.get(self.url, {'since': old}).status_code, 410)
+
+
+class ContactImporterTests(TestCase):
+    HEADERS = ['Name', 'Phone', 'Email', 'Company', 'Notes']
+
+    def setUp(self):
+        self.user = make_user()
+
+    def rows(self, count):
+        return [{'Name': f'Row {i}', 'Phone': f'+1555000{i:04d}'} for i in range(count)]
+
+    def test_batches_and_row_errors(self):
+        rows = self.rows(5)
+        rows[1]['Phone'] = 'call me'
+        rows[3]['Name'] = ''
+        importer = ContactImporter(self.user, batch_size=2, duplicates='create')
+        result = importer.run(ImportReader(self.HEADERS, rows))
+        self.assertEqual((result.imported_count, result.skipped_count), (3, 2))
+        # Row 1 is the header line
+        self.assertEqual([error.split(':')[0] for error in result.errors], ['Row 3', 'Row 5'])
+        self.assertEqual(Contact.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(verify_stats(self.user.pk), [])
+
+    def test_missing_columns(self):
+        with self.assertRaisesMessage(CSVImportError, 'Phone'):
+            ContactImporter(self.user).run(ImportReader(['Name', 'Email'], []))
+        self.assertFalse(Contact.objects.exists())
+
+    def test_rejected_batch_is_retried_row_by_row(self):
+        with mock.patch.object(Contact.objects, 'bulk_create', side_effect=DatabaseError):
+            result = ContactImporter(self.user, duplicates='create').run(ImportReader(self.HEADERS, self.rows(3)))
+        self.assertEqual(result.imported_count, 3)
+        self.assertEqual(Contact.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(verify_stats(self.user.pk), [])
+
+    def test_checkpoints_and_resume(self):
+        checkpoints = []
+        importer = ContactImporter(self.user, batch_size=2, duplicates='create')
+        importer.run(
+            ImportReader(self.HEADERS, self.rows(5)[:3]),
+            on_checkpoint=lambda result, last_row: checkpoints.append((result.imported_count, last_row)),
+        )
+        self.assertEqual(checkpoints, [(2, 3), (3, 4)])
+        # Interrupted after row 4: the rerun skips what was committed
+        result = importer.run(ImportReader(self.HEADERS, self.rows(5)), resume_after=4)
+        self.assertEqual(result.imported_count, 2)
+        self.assertEqual(
+            list(Contact.objects.filter(user=self.user).order_by('name').values_list('name', flat=True)),
+            [f'Row {i}' for i in range(5)],
+        )
+
+    def test_upload_validation(self):
+        self.client.force_login(self.user)
+        url = reverse('contacts:contact_import')
+        response = self.client.post(url, {'csv_file': SimpleUploadedFile('people.xlsx', b'x')})
+        self.assertContains(response, 'Please upload a CSV')
+        with override_settings(CONTACTS_IMPORT_MAX_FILE_SIZE=10):
+            response = self.client.post(url, {'csv_file': SimpleUploadedFile('people.csv', b'Name,Phone\n' * 2)})
+        self.assertContains(response, 'File size exceeds')
+        self.assertFalse(ImportJob.objects.exists())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        make_contacts(self.user, 5, company='Acme')
+        make_contacts(make_user('bob'), 2)
+        self.client.force_login(self.user)
+        self.url = reverse('contacts:contact_export')
+
+    def test_streams_the_users_contacts_in_chunks(self):
+        with override_settings(CONTACTS_EXPORT_CHUNK_SIZE=2):
+            response = self.client.get(self.url)
+            chunks = list(response.streaming_content)
+        # Header, then 2 + 2 + 1 rows
+        self.assertEqual(len(chunks), 4)
+        rows = list(csv.reader(b''.join(chunks).decode().splitlines()))
+        self.assertEqual(rows[0], EXPORT_HEADER)
+        self.assertEqual([row[0] for row in rows[1:]], [f'Contact {i:03d}' for i in range(5)])
+        self.assertIn('attachment; filename="zenvio_contacts.csv"', response['Content-Disposition'])
+
+    @override_settings(CONTACTS_EXPORT_STREAMING=False)
+    def test_buffered_response(self):
+        response = self.client.get(self.url)
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.content.decode().splitlines()), 6)
+
+    def test_gzip_content_encoding(self):
+        plain = b''.join(self.client.get(self.url).streaming_content)
+        response = self.client.get(self.url, headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}).status_code, 404)
+
+
+class SearchTests(TestCase):
+    QUERIES = ('ann', 'ANN', 'smi', 'acme', 'example.com', '5550', '00001', 'an', 'x', 'o\'b', '"q', '100%', 'zzz')
+
+    def setUp(self):
+        self.user = make_user()
+        for name, phone, email, company in [
+            ('Ann Smith', '+15550000001', 'ann@example.com', 'Acme'),
+            ('Joanna Banner', '+15550000002', '', 'Smithson & Co'),
+            ("Kate O'Brien", '+15550000003', 'kate@obrien.ie', '100% "Quality"'),
+            ('Bob', '+15550000004', 'bob@example.com', ''),
+        ]:
+            Contact.objects.create(user=self.user, name=name, phone=phone, email=email, company=company)
+        make_contacts(make_user('bob'), 2, company='Acme')
+        self.queryset = Contact.objects.filter(user=self.user)
+
+    def assertMatchesUnindexed(self):
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(
+                    set(search_contacts(self.queryset, query)),
+                    set(self.queryset.filter(icontains_filter(query))),
+                )
+
+    def test_index_matches_like_icontains(self):
+        # None (icontains) only where the database has no full-text support
+        self.assertIn(search_index_kind(), ('fts5', 'trigram', 'tsvector', None))
+        self.assertMatchesUnindexed()
+
+    def test_index_follows_every_kind_of_write(self):
+        Contact.objects.filter(name='Bob').update(name='Annabel')
+        Contact.objects.get(name='Ann Smith').delete()
+        apply_bulk_action(self.user, self.queryset.filter(name__startswith='Kate'), 'set_company', company='Acme')
+        ContactImporter(self.user).run(ImportReader(['Name', 'Phone'], [{'Name': 'Anne', 'Phone': '+15550000009'}]))
+        self.assertMatchesUnindexed()
+
+    @skipUnless(connection.vendor == 'sqlite', 'The FTS5 index is SQLite only')
+    def test_migrations_install_the_index(self):
+        # Also in a process that looked before the index existed
+        with mock.patch.dict('contacts.search._index_state', {'default': None}):
+            self.assertEqual(search_index_kind(), 'fts5')
+
+    @skipUnless(connection.vendor == 'sqlite', 'The FTS5 index is SQLite only')
+    def test_rebuild_command_repairs_the_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER contacts_contact_fts_ai')
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        Contact.objects.create(user=self.user, name='Zed Annex', phone='+15550000010')
+        self.assertIn('Zed Annex', [contact.name for contact in search_contacts(self.queryset, 'annex')])
+
+    def test_rank_puts_name_prefixes_first(self):
+        ranked = search_contacts(self.queryset, 'ann').order_by('-search_rank', 'name')
+        self.assertEqual([contact.name for contact in ranked], ['Ann Smith', 'Joanna Banner'])
+        ranked = search_contacts(self.queryset, 'smith').order_by('-search_rank', 'name')
+        self.assertEqual([contact.name for contact in ranked], ['Ann Smith', 'Joanna Banner'])
+
+
+class ContactAdminTests(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='test-password',
+        )
+        self.owner = make_user()
+        make_contacts(self.owner, 3, company='Acme')
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:contacts_contact_changelist')
+
+    def changelist_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        before = self.changelist_queries()
+        make_contacts(make_user('bob'), 5)
+        self.assertEqual(self.changelist_queries(), before)
+
+    def test_owner_filter_lists_only_the_selected_owner(self):
+        other = make_user('bob')
+        response = self.client.get(self.url, {'owner': self.owner.pk})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        choices = response.context['cl'].filter_specs[-1].lookup_choices
+        self.assertEqual(choices, [(str(self.owner.pk), str(self.owner))])
+        self.assertNotContains(response, f'owner={other.pk}')
+
+    def test_invalid_owner(self):
+        response = self.client.get(self.url, {'owner': 'x'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_unfiltered_count_is_estimated_on_large_tables(self):
+        with mock.patch('contacts.admin.estimated_count', return_value=250000):
+            response = self.client.get(self.url)
+            self.assertEqual(response.context['cl'].result_count, 250000)
+            # Filtered changelists are counted exactly
+            response = self.client.get(self.url, {'owner': self.owner.pk})
+            self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_search_uses_the_search_index(self):
+        Contact.objects.create(user=self.owner, name='Zed Example', phone='+15559999999')
+        response = self.client.get(self.url, {'q': 'zed'})
+        self.assertEqual([contact.name for contact in response.context['cl'].result_list], ['Zed Example'])
+
+    def test_export_action_streams_the_selection(self):
+        selected = Contact.objects.order_by('pk')[:2]
+        response = self.client.post(self.url, {
+            'action': 'export_csv', '_selected_action': [contact.pk for contact in selected],
+        })
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['Owner', *EXPORT_HEADER])
+        self.assertEqual([row[:2] for row in rows[1:]], [['alice', contact.name] for contact in selected])
+
+
+@override_settings(CONTACTS_ASYNC_VIEWS=True)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Cleanups run last first: reload after the settings are restored
+        cls.addClassCleanup(cls.reload_urls)
+        super().setUpClass()
+        # The URLconfs pick the views when imported
+        cls.reload_urls()
+
+    @staticmethod
+    def reload_urls():
+        importlib.reload(contacts_urls)
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    def setUp(self):
+        self.user = make_user()
+        self.contact, _ = make_contacts(self.user, 2, company='Acme')
+        make_contacts(make_user('bob'), 1)
+
+    async def test_urls_use_the_async_views(self):
+        self.assertIs(resolve(reverse('contacts:contact_list')).func.view_class, AsyncContactListView)
+        self.assertIs(resolve(reverse('contacts:api_contact_list')).func.view_class, AsyncContactListAPIView)
+
+    async def test_login_required(self):
+        response = await self.async_client.get(reverse('contacts:contact_list'))
+        self.assertEqual(response.status_code, 302)
+        response = await self.async_client.get(reverse('contacts:api_contact_stats'))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_list_and_detail_pages(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('contacts:contact_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([contact.name for contact in response.context['contacts']], ['Contact 001', 'Contact 000'])
+
+        url = reverse('contacts:contact_detail', args=[self.contact.pk])
+        etag = (await self.async_client.get(url))['ETag']
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_api(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('contacts:api_contact_list'), {'fields': 'name'})
+        self.assertEqual(response.json()['results'], [{'name': 'Contact 001'}, {'name': 'Contact 000'}])
+        response = await self.async_client.get(reverse('contacts:api_contact_detail', args=[self.contact.pk]))
+        self.assertEqual(response.json()['company'], 'Acme')
+        response = await self.async_client.get(reverse('contacts:api_contact_stats'))
+        self.assertEqual(response.json()['total'], 2)
+        response = await self.async_client.get(reverse('contacts:api_contact_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_toggle_favorite(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            reverse('contacts:toggle_favorite', args=[self.contact.pk]),
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+        self.assertTrue(response.json()['is_favorite'])
+        response = await self.async_client.post(reverse('contacts:api_toggle_favorite', args=[self.contact.pk]))
+        self.assertFalse(response.json()['is_favorite'])
+        await self.contact.arefresh_from_db()
+        self.assertFalse(self.contact.is_favorite)
+
+    async def test_export(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('contacts:contact_export'))
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.decode().splitlines()), 3)
+
+
+class WarmUpTests(SimpleTestCase):
+    def test_warm_up_compiles_the_hot_templates_without_queries(self):
+        loader = engines['django'].engine.template_loaders[0]
+        loader.reset()
+        # Any database access fails in a SimpleTestCase
+        warmup.warm_up()
+        cached = {key.split('-')[0] for key in loader.get_template_cache}
+        self.assertTrue(set(warmup.HOT_TEMPLATES) <= cached)
+
+    @override_settings(WARM_START=True)
+    def test_warm_start_freezes_and_reenables_collection(self):
+        with mock.patch.object(warmup, 'warm_up', return_value=0.01) as warm_up, \
+                mock.patch.object(warmup, 'gc') as gc:
+            warmup.warm_start()
+        warm_up.assert_called_once_with()
+        gc.freeze.assert_called_once_with()
+        gc.enable.assert_called_once_with()
+
+    @override_settings(WARM_START=False)
+    def test_warm_start_off(self):
+        with mock.patch.object(warmup, 'warm_up') as warm_up, mock.patch.object(warmup, 'gc') as gc:
+            warmup.warm_start()
+        warm_up.assert_not_called()
+        gc.freeze.assert_not_called()
+        gc.enable.assert_called_once_with()
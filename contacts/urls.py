@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     ContactListView,
@@ -7,8 +8,35 @@ from .views import (
     ContactDeleteView,
     ToggleFavoriteView,
     ExportContactsView,
-    ImportContactsView
+    ImportContactsView,
+    ContactSuggestView,
+    ImportJobView,
+    ImportJobStatusView,
+    BulkActionView,
+    PerfReportView
 )
+from .api import (
+    ContactListAPIView,
+    ContactDetailAPIView,
+    ContactFavoriteAPIView,
+    ContactBulkAPIView,
+    ContactStatsAPIView,
+    ContactSyncAPIView
+)
+
+# Async hot paths for ASGI deployments (see contacts/async_views.py)
+if settings.CONTACTS_ASYNC_VIEWS:
+    from .async_views import (
+        AsyncContactListView as ContactListView,
+        AsyncContactDetailView as ContactDetailView,
+        AsyncToggleFavoriteView as ToggleFavoriteView,
+        AsyncExportContactsView as ExportContactsView,
+        AsyncContactSuggestView as ContactSuggestView,
+        AsyncContactListAPIView as ContactListAPIView,
+        AsyncContactDetailAPIView as ContactDetailAPIView,
+        AsyncContactFavoriteAPIView as ContactFavoriteAPIView,
+        AsyncContactStatsAPIView as ContactStatsAPIView
+    )
 
 app_name = 'contacts'
 
@@ -17,8 +45,21 @@ urlpatterns = [
     path('add/', ContactCreateView.as_view(), name='contact_create'),
     path('export/', ExportContactsView.as_view(), name='contact_export'),
     path('import/', ImportContactsView.as_view(), name='contact_import'),
+    path('suggest/', ContactSuggestView.as_view(), name='contact_suggest'),
+    path('import/<int:pk>/', ImportJobView.as_view(), name='import_job'),
+    path('import/<int:pk>/status/', ImportJobStatusView.as_view(), name='import_job_status'),
+    path('bulk/', BulkActionView.as_view(), name='contact_bulk'),
+    path('perf/', PerfReportView.as_view(), name='perf_report'),
     path('<int:pk>/', ContactDetailView.as_view(), name='contact_detail'),
     path('<int:pk>/edit/', ContactUpdateView.as_view(), name='contact_update'),
     path('<int:pk>/delete/', ContactDeleteView.as_view(), name='contact_delete'),
     path('<int:pk>/favorite/', ToggleFavoriteView.as_view(), name='toggle_favorite'),
+    
+    # JSON API
+    path('api/contacts/', ContactListAPIView.as_view(), name='api_contact_list'),
+    path('api/contacts/bulk/', ContactBulkAPIView.as_view(), name='api_contact_bulk'),
+    path('api/contacts/stats/', ContactStatsAPIView.as_view(), name='api_contact_stats'),
+    path('api/contacts/sync/', ContactSyncAPIView.as_view(), name='api_contact_sync'),
+    path('api/contacts/<int:pk>/', ContactDetailAPIView.as_view(), name='api_contact_detail'),
+    path('api/contacts/<int:pk>/favorite/', ContactFavoriteAPIView.as_view(), name='api_toggle_favorite'),
 ]
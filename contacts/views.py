@@ -1,44 +1,123 @@
+import re
+from functools import partial
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView, View
-from django.urls import reverse_lazy
-from django.db.models import Q
-from django.http import HttpResponse, JsonResponse
-import csv
+from django.urls import reverse, reverse_lazy
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
 
-from .models import Contact
+from .models import Contact, ImportJob
 from .forms import ContactForm
+from .dedup import POLICIES, POLICY_CHOICES
+from .jobs import create_job, enqueue, revive
+from .exporters import gzip_stream, stream_export
+from .formats import FORMATS, for_filename
+from .search import search_contacts
+from .pagination import CursorPaginator, InvalidCursor
+from .stats import get_contact_stats
+from .suggest import MAX_QUERY_LENGTH, suggest
+from .conditional import ConditionalGetMixin, page_validators
+from . import instrumentation, render_cache
+from .bulk import BulkActionError, apply_bulk_action, select_contacts
 
 
-class ContactListView(LoginRequiredMixin, ListView):
+class ContactListView(ConditionalGetMixin, LoginRequiredMixin, ListView):
     """
     Display list of all contacts for the logged-in user.
     Includes search and filter functionality.
+    Paginates by page number or, with CONTACTS_LIST_PAGINATION='cursor',
+    by keyset cursor; ranked search results are always paged by number.
+    Answers conditional GETs from the user's last-write marker, and serves
+    cards and whole pages from the render cache (contacts/render_cache.py)
+    when possible.
     """
     model = Contact
     template_name = 'contacts/contact_list.html'
     context_object_name = 'contacts'
     paginate_by = 12
+    pagination_mode = None
+    validators = None
+    page_cache_key = None
+    
+    def get(self, request, *args, **kwargs):
+        # The marker is read before the contacts and from the same database,
+        # so a page rendered while a write commits, or from a lagging replica,
+        # is labelled with the marker its data had
+        version = render_cache.list_version(request.user.pk)
+        not_modified = self.prepare_caching(version, render_cache.has_pending_messages(request))
+        if not_modified is not None:
+            return not_modified
+        
+        html = render_cache.get_page(self.page_cache_key) if self.page_cache_key else None
+        if html is not None:
+            return self.cached_response(html)
+        return self.cache_response(super().get(request, *args, **kwargs))
+    
+    def prepare_caching(self, version, has_messages):
+        """
+        Set the page's validators and page cache key for the last-write
+        marker ``version``, and return a 304 if the browser's copy is
+        current. Flash messages are shown once, so pages with pending
+        messages are neither validated nor cached.
+        """
+        if has_messages:
+            return None
+        mode = self.get_pagination_mode()
+        self.validators = page_validators(self.request, mode, version, modified=render_cache.version_time(version))
+        if settings.CONTACTS_PAGE_CACHE_TIMEOUT:
+            self.page_cache_key = render_cache.page_key(self.request, mode, version)
+        return self.not_modified_response(self.validators)
+    
+    def cached_response(self, html):
+        response = HttpResponse(render_cache.with_csrf_token(self.request, html))
+        return self.add_cache_headers(response, self.validators)
+    
+    def cache_response(self, response):
+        """Store the page once rendered, then put the request's CSRF token in."""
+        def finish(response):
+            html = response.content.decode(response.charset)
+            if self.page_cache_key:
+                render_cache.set_page(self.page_cache_key, html)
+            response.content = render_cache.with_csrf_token(self.request, html)
+        response.add_post_render_callback(finish)
+        return self.add_cache_headers(response, self.validators)
+    
+    def get_pagination_mode(self):
+        if self.request.GET.get('search'):
+            # Cursors follow the list order; ranked search results are paged by number
+            return 'page'
+        return self.pagination_mode or settings.CONTACTS_LIST_PAGINATION
+    
+    def paginate_queryset(self, queryset, page_size):
+        if self.get_pagination_mode() != 'cursor':
+            return super().paginate_queryset(queryset, page_size)
+        
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor', ''))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        return (paginator, page, page.object_list, page.has_other_pages())
     
     def get_queryset(self):
         queryset = Contact.objects.filter(user=self.request.user)
         search_query = self.request.GET.get('search', '')
         filter_type = self.request.GET.get('filter', '')
         
-        if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) |
-                Q(phone__icontains=search_query) |
-                Q(email__icontains=search_query) |
-                Q(company__icontains=search_query)
-            )
-        
         # Filter by favorites
         if filter_type == 'favorites':
             queryset = queryset.filter(is_favorite=True)
         
+        if search_query:
+            # Indexed full-text search, best matches first
+            queryset = search_contacts(queryset, search_query)
+            return queryset.order_by('-search_rank', '-is_favorite', '-created_at')
+        
         return queryset.order_by('-is_favorite', '-created_at')
     
     def get_context_data(self, **kwargs):
@@ -46,15 +125,18 @@ class ContactListView(LoginRequiredMixin, ListView):
         context['search_query'] = self.request.GET.get('search', '')
         context['filter_type'] = self.request.GET.get('filter', '')
         
-        # Optimize: Use aggregation instead of separate queries
-        from django.db.models import Count, Q
-        stats = Contact.objects.filter(user=self.request.user).aggregate(
-            total=Count('id'),
-            favorites=Count('id', filter=Q(is_favorite=True))
-        )
+        stats = self.get_stats()
         context['total_contacts'] = stats['total']
         context['favorites_count'] = stats['favorites']
+        # Rendered lazily, when the template asks for them
+        context['cards'] = partial(render_cache.render_cards, context['contacts'])
+        # Cached HTML holds a placeholder; cache_response() puts the real token in
+        context['csrf_token'] = render_cache.CSRF_PLACEHOLDER
         return context
+    
+    def get_stats(self):
+        # Counters come from the stats cache or the per-user ContactStats row
+        return get_contact_stats(self.request.user)
 
 
 class ContactCreateView(LoginRequiredMixin, CreateView):
@@ -79,14 +161,25 @@ class ContactCreateView(LoginRequiredMixin, CreateView):
         return context
 
 
-class ContactDetailView(LoginRequiredMixin, DetailView):
+class ContactDetailView(ConditionalGetMixin, LoginRequiredMixin, DetailView):
     """
     Display details of a single contact.
+    Answers conditional GETs from the contact's updated_at.
     """
     model = Contact
     template_name = 'contacts/contact_detail.html'
     context_object_name = 'contact'
     
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        return self.conditional_render(self.get_validators(render_cache.has_pending_messages(request)))
+    
+    def get_validators(self, has_messages):
+        if has_messages:
+            return None
+        contact = self.object
+        return page_validators(self.request, contact.pk, contact.updated_at.isoformat(), modified=contact.updated_at)
+    
     def get_queryset(self):
         return Contact.objects.filter(user=self.request.user)
 
@@ -139,8 +232,10 @@ class ToggleFavoriteView(LoginRequiredMixin, View):
     def post(self, request, pk):
         contact = get_object_or_404(Contact, pk=pk, user=request.user)
         contact.is_favorite = not contact.is_favorite
-        contact.save(update_fields=['is_favorite'])  # Optimize: only update one field
-        
+        contact.save(update_fields=['is_favorite', 'updated_at'])  # Optimize: only update changed fields
+        return self.toggled_response(request, contact)
+    
+    def toggled_response(self, request, contact):
         # Check if AJAX request
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
@@ -157,138 +252,212 @@ class ToggleFavoriteView(LoginRequiredMixin, View):
         return redirect(request.META.get('HTTP_REFERER', 'contacts:contact_list'))
 
 
+class BulkActionView(LoginRequiredMixin, View):
+    """
+    Apply one action to the contacts selected on the list page, or to
+    every contact matching its search and filter.
+    """
+    SUCCESS_MESSAGES = {
+        'favorite': '{count} contact(s) added to favorites!',
+        'unfavorite': '{count} contact(s) removed from favorites!',
+        'delete': '{count} contact(s) deleted successfully!',
+        'set_company': '{count} contact(s) moved to "{company}"!',
+    }
+    
+    def post(self, request):
+        action = request.POST.get('action', '')
+        company = request.POST.get('company', '')
+        try:
+            if request.POST.get('scope') == 'matching':
+                contacts = select_contacts(
+                    request.user,
+                    search=request.POST.get('search', ''),
+                    filter_type=request.POST.get('filter', ''),
+                )
+            else:
+                contacts = select_contacts(request.user, ids=request.POST.getlist('ids'))
+            count = apply_bulk_action(request.user, contacts, action, company=company)
+        except BulkActionError as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, self.SUCCESS_MESSAGES[action].format(count=count, company=company.strip()))
+        
+        # Redirect back to referring page or contact list
+        return redirect(request.META.get('HTTP_REFERER', 'contacts:contact_list'))
+
+
 class ExportContactsView(LoginRequiredMixin, View):
     """
-    Export all user contacts to CSV file.
+    Export all user contacts as ``?format=`` csv (default), ndjson, vcf
+    (vCard 4.0) or vcf3 (vCard 3.0).
+    ``?compress=gzip`` downloads a .gz file; otherwise the response is
+    gzip-encoded on the wire when the client accepts it and
+    CONTACTS_EXPORT_GZIP is on.
+    Streams the file by default; set CONTACTS_EXPORT_STREAMING=False to
+    build the whole response in memory instead.
     """
+    streaming = None
+    # The format's extension is appended
+    filename = 'zenvio_contacts'
+    
     def get(self, request):
-        contacts = Contact.objects.filter(user=request.user).order_by('name')
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="zenvio_contacts.csv"'
-        
-        writer = csv.writer(response)
-        # Header row
-        writer.writerow(['Name', 'Phone', 'Email', 'Company', 'Notes', 'Favorite', 'Created At'])
-        
-        # Data rows
-        for contact in contacts:
-            writer.writerow([
-                contact.name,
-                contact.phone,
-                contact.email,
-                contact.company,
-                contact.notes,
-                'Yes' if contact.is_favorite else 'No',
-                contact.created_at.strftime('%Y-%m-%d %H:%M')
-            ])
-        
+        format = self.get_format()
+        compression = self.get_compression()
+        content = stream_export(self.get_export_queryset(), format)
+        if compression:
+            content = gzip_stream(content)
+        return self.export_response(content, format, compression)
+    
+    def get_export_queryset(self):
+        queryset = Contact.objects.filter(user=self.request.user).order_by('name')
+        # Bound now: the response streams after the request's database routing ends
+        return queryset.using(queryset.db)
+    
+    def get_format(self):
+        format = FORMATS.get(self.request.GET.get('format') or 'csv')
+        if format is None:
+            raise Http404('Unknown export format.')
+        return format
+    
+    def get_compression(self):
+        """'file' (a .gz download), 'encoding' (Content-Encoding: gzip) or None."""
+        if self.request.GET.get('compress') == 'gzip':
+            return 'file'
+        if settings.CONTACTS_EXPORT_GZIP and re.search(r'\bgzip\b', self.request.headers.get('Accept-Encoding', '')):
+            return 'encoding'
+        return None
+    
+    def use_streaming(self):
+        return settings.CONTACTS_EXPORT_STREAMING if self.streaming is None else self.streaming
+    
+    def export_response(self, content, format, compression):
+        response_class = StreamingHttpResponse if self.use_streaming() else HttpResponse
+        filename = f'{self.filename}.{format.extensions[0]}'
+        if compression == 'file':
+            response = response_class(content, content_type='application/gzip')
+            filename += '.gz'
+        else:
+            response = response_class(content, content_type=format.content_type)
+        if compression == 'encoding':
+            response['Content-Encoding'] = 'gzip'
+        if settings.CONTACTS_EXPORT_GZIP:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
 
 
 class ImportContactsView(LoginRequiredMixin, View):
     """
-    Import contacts from CSV file.
-    Supports CSV files with headers: Name, Phone, Email, Company, Notes
+    Import contacts from a CSV file with headers Name, Phone, Email,
+    Company, Notes, or an NDJSON or vCard file (see contacts.formats),
+    optionally gzip-compressed.
+    The upload is saved as an ImportJob and imported in the background
+    (see contacts.jobs); the job page polls ImportJobStatusView.
     """
     template_name = 'contacts/contact_import.html'
-    MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB limit
+    
+    def get_context_data(self, **kwargs):
+        return {
+            'max_file_size_mb': settings.CONTACTS_IMPORT_MAX_FILE_SIZE // (1024 * 1024),
+            'recent_jobs': ImportJob.objects.filter(user=self.request.user)[:5],
+            'duplicate_choices': POLICY_CHOICES,
+            'default_duplicates': settings.CONTACTS_IMPORT_DUPLICATES,
+            **kwargs,
+        }
     
     def get(self, request):
-        return render(request, self.template_name)
+        return render(request, self.template_name, self.get_context_data())
     
     def post(self, request):
         csv_file = request.FILES.get('csv_file')
         
         # Validate file presence
         if not csv_file:
-            messages.error(request, 'Please select a CSV file to upload.')
-            return render(request, self.template_name)
+            messages.error(request, 'Please select a file to upload.')
+            return render(request, self.template_name, self.get_context_data())
         
         # Validate file extension
-        if not csv_file.name.lower().endswith('.csv'):
-            messages.error(request, 'Please upload a valid CSV file.')
-            return render(request, self.template_name)
+        if for_filename(csv_file.name) is None:
+            messages.error(request, 'Please upload a CSV, NDJSON or vCard file (optionally gzip-compressed).')
+            return render(request, self.template_name, self.get_context_data())
         
         # Validate file size
-        if csv_file.size > self.MAX_FILE_SIZE:
-            messages.error(request, 'File size exceeds 5MB limit.')
-            return render(request, self.template_name)
+        if csv_file.size > settings.CONTACTS_IMPORT_MAX_FILE_SIZE:
+            messages.error(request, f'File size exceeds {settings.CONTACTS_IMPORT_MAX_FILE_SIZE // (1024 * 1024)}MB limit.')
+            return render(request, self.template_name, self.get_context_data())
         
-        # Parse CSV
-        try:
-            # Decode with proper encoding handling
-            try:
-                decoded_file = csv_file.read().decode('utf-8').splitlines()
-            except UnicodeDecodeError:
-                try:
-                    csv_file.seek(0)
-                    decoded_file = csv_file.read().decode('latin-1').splitlines()
-                except UnicodeDecodeError:
-                    messages.error(request, 'File encoding error. Please use UTF-8 encoded CSV.')
-                    return render(request, self.template_name)
-            
-            reader = csv.DictReader(decoded_file)
-            
-            # Validate headers
-            required_headers = {'Name', 'Phone'}
-            if reader.fieldnames is None:
-                messages.error(request, 'CSV file appears to be empty.')
-                return render(request, self.template_name)
-            
-            available_headers = set(reader.fieldnames)
-            if not required_headers.issubset(available_headers):
-                missing = required_headers - available_headers
-                messages.error(request, f'CSV missing required columns: {", ".join(missing)}')
-                return render(request, self.template_name)
-            
-            imported_count = 0
-            skipped_count = 0
-            errors = []
-            
-            for row_num, row in enumerate(reader, start=2):  # Start at 2 (1 for header)
-                # Validate required fields
-                name = row.get('Name', '').strip()[:100]  # Enforce max length
-                phone = row.get('Phone', '').strip()[:20]
-                
-                if not name or not phone:
-                    skipped_count += 1
-                    errors.append(f"Row {row_num}: Missing name or phone")
-                    continue
-                
-                # Create contact
-                try:
-                    Contact.objects.create(
-                        user=request.user,
-                        name=name,
-                        phone=phone,
-                        email=row.get('Email', '').strip()[:254],  # Email max length
-                        company=row.get('Company', '').strip()[:100],
-                        notes=row.get('Notes', '').strip()
-                    )
-                    imported_count += 1
-                except Exception as e:
-                    skipped_count += 1
-                    errors.append(f"Row {row_num}: {str(e)}")
-            
-            # Show summary
-            if imported_count > 0:
-                messages.success(request, f'Successfully imported {imported_count} contact(s)!')
-            
-            if skipped_count > 0:
-                messages.warning(request, f'Skipped {skipped_count} row(s) due to errors.')
-                # Show first 5 errors
-                for error in errors[:5]:
-                    messages.error(request, error)
-                if len(errors) > 5:
-                    messages.info(request, f'...and {len(errors) - 5} more errors.')
-            
-            return redirect('contacts:contact_list')
-            
-        except csv.Error as e:
-            messages.error(request, f'CSV parsing error: {str(e)}')
-            return render(request, self.template_name)
-        except Exception as e:
-            messages.error(request, f'Unexpected error: {str(e)}')
-            return render(request, self.template_name)
+        duplicates = request.POST.get('duplicates') or None
+        if duplicates is not None and duplicates not in POLICIES:
+            messages.error(request, 'Please choose how to handle duplicates.')
+            return render(request, self.template_name, self.get_context_data())
+        
+        job = create_job(request.user, csv_file, duplicates)
+        enqueue(job)
+        return redirect('contacts:import_job', pk=job.pk)
+
+
+class ImportJobView(ImportContactsView):
+    """
+    Progress page for one import job.
+    """
+    http_method_names = ['get', 'head', 'options']
+    
+    def get(self, request, pk):
+        job = get_object_or_404(ImportJob, pk=pk, user=request.user)
+        return render(request, self.template_name, self.get_context_data(job=job))
 
+
+class ImportJobStatusView(LoginRequiredMixin, View):
+    """
+    Import job progress as JSON, polled by the job page, which also
+    restarts a stalled job (see contacts.jobs.revive).
+    """
+    def get(self, request, pk):
+        job = get_object_or_404(ImportJob, pk=pk, user=request.user)
+        if revive(job):
+            job.refresh_from_db()
+        return JsonResponse({
+            'id': job.pk,
+            'status': job.status,
+            'finished': job.finished,
+            'progress': job.progress,
+            'imported_count': job.imported_count,
+            'skipped_count': job.skipped_count,
+            'updated_count': job.updated_count,
+            'duplicate_count': job.duplicate_count,
+            'errors': job.errors[:5],
+            'error_message': job.error_message,
+        })
+
+
+class ContactSuggestView(LoginRequiredMixin, View):
+    """
+    Typeahead suggestions for the search box as JSON: contacts whose name,
+    company or email starts with ``?q=`` (see contacts/suggest.py).
+    """
+    def get_query(self):
+        return self.request.GET.get('q', '').strip()[:MAX_QUERY_LENGTH]
+
+    def suggest_response(self, query, suggestions):
+        for suggestion in suggestions:
+            suggestion['url'] = reverse('contacts:contact_detail', args=[suggestion['id']])
+        return JsonResponse({'query': query, 'results': suggestions})
+
+    def get(self, request):
+        query = self.get_query()
+        return self.suggest_response(query, suggest(request.user.pk, query))
+
+
+class PerfReportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Per-view query counts and latency percentiles from the
+    instrumentation middleware, as JSON. Staff only.
+    """
+    def test_func(self):
+        return self.request.user.is_staff
+    
+    def get(self, request):
+        return JsonResponse({
+            'enabled': settings.CONTACTS_PERF_ENABLED,
+            'views': instrumentation.report(),
+        })
@@ -7,10 +7,19 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
+import gc
 import os
 
+# Start-up creates long-lived objects rather than garbage; warm_start() re-enables this
+gc.disable()
+
 from django.core.asgi import get_asgi_application
 
+from zenvio.warmup import warm_start
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zenvio.settings')
 
 application = get_asgi_application()
+
+# Cold start work done before the first request; see zenvio/warmup.py
+warm_start()
@@ -0,0 +1,156 @@
+"""
+Read replicas for the read-heavy views.
+
+DB_REPLICAS (zenvio/settings.py) adds a database alias per replica: a copy
+of ``default`` kept up to date by the database server (PostgreSQL streaming
+replication), or a copied SQLite file to try it out. ``ReplicaMiddleware``
+lets GET and HEAD requests to the views in DB_REPLICA_VIEWS (the contact
+list and detail pages, the home page stats and the export) read from one
+replica, picked at random per request. ``ReplicaRouter`` sends those reads
+there. Everything else reads and writes ``default``: other views, other
+methods, reads inside a transaction, management commands and import jobs.
+
+Read-your-writes: a request that writes answers with a cookie pinning the
+browser to ``default`` for DB_REPLICA_PIN_SECONDS, so the pages it loads
+next show the write even while the replicas catch up. Keep the pin longer
+than the replicas' lag. Other browsers of the same user may see the
+replica's older copy until it catches up, but not for longer: the
+last-write marker that keys cached list pages and ETags is read from the
+same replica as the page (contacts.render_cache), so a lagging replica's
+pages are cached and validated under the marker it had, never under the
+newer one. Sessions and users are always read from ``default``: every
+request reads them, and a stale copy would log the user out.
+
+The request instrumentation (contacts.instrumentation) counts each
+request's queries per alias as ``db_queries_<alias>``, shown by
+``manage.py perf_report``.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PIN_COOKIE = 'db_pin'
+# Read on every request, so always from the primary (with AUTH_USER_MODEL)
+PRIMARY_APPS = ('auth', 'sessions')
+READ_METHODS = ('GET', 'HEAD')
+
+_routing = ContextVar('zenvio_db_routing', default=None)
+
+
+class Routing:
+    """
+    Where the current request reads from. A mutable object rather than
+    ContextVar values, so writes made in sync_to_async threads are seen.
+    """
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or routing.replica is None:
+            return None
+        if model._meta.app_label in PRIMARY_APPS or model._meta.label == settings.AUTH_USER_MODEL:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # A transaction reads its own writes
+            return None
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+            # The rest of the request reads what it wrote
+            routing.replica = None
+        # Explicitly: an instance read from a replica would otherwise be saved there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DB_REPLICA_ALIASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas get their schema from the primary
+        if db in settings.DB_REPLICA_ALIASES:
+            return False
+        return None
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def pin(response):
+    seconds = settings.DB_REPLICA_PIN_SECONDS
+    response.set_cookie(
+        PIN_COOKIE, str(int(time.time()) + seconds), max_age=seconds,
+        secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+    )
+
+
+class ReplicaMiddleware:
+    """
+    Route the reads of DB_REPLICA_VIEWS to a replica, and pin browsers that
+    just wrote to the primary. Not used without DB_REPLICAS.
+    Runs natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DB_REPLICA_ALIASES:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        routing = Routing()
+        token = _routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(routing, response)
+
+    async def __acall__(self, request):
+        routing = Routing()
+        token = _routing.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(routing, response)
+
+    def finish(self, routing, response):
+        if routing.wrote:
+            pin(response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routing = _routing.get()
+        if (
+            routing is not None
+            and not routing.wrote
+            and request.method in READ_METHODS
+            and request.resolver_match.view_name in settings.DB_REPLICA_VIEWS
+            and not is_pinned(request)
+        ):
+            routing.replica = random.choice(settings.DB_REPLICA_ALIASES)
@@ -5,6 +5,7 @@ ZENVIO Contact Management System
 
 from pathlib import Path
 import os
+import tempfile
 from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -26,7 +27,6 @@ ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost,127.0.0.1,.vercel.app
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -42,13 +42,22 @@ INSTALLED_APPS = [
     'contacts',
 ]
 
+# Serve the Django admin at /admin/. Deployments that don't use it can turn it
+# off to shorten cold starts: the admin, its ModelAdmins and its template tag
+# libraries (imported with the first template) are then never loaded.
+ADMIN_ENABLED = config('ADMIN_ENABLED', default=True, cast=bool)
+if ADMIN_ENABLED:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
+
 MIDDLEWARE = [
+    'contacts.instrumentation.InstrumentationMiddleware',  # Opt-in, see CONTACTS_PERF_ENABLED
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files in production
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.CachedAuthenticationMiddleware',  # See AUTH_USER_CACHE_TIMEOUT
+    'zenvio.routers.ReplicaMiddleware',  # Opt-in, see DB_REPLICAS
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -73,14 +82,109 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'zenvio.wsgi.application'
 
+# Do the first request's one-time work (URL resolvers, template compilation,
+# lazily imported modules) when zenvio.wsgi or zenvio.asgi is imported, which
+# serverless hosts run before handing over the first request (see
+# zenvio/warmup.py and `manage.py importtime`)
+WARM_START = config('WARM_START', default=True, cast=bool)
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE: 'sqlite' (default) or 'postgresql'
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+# Seconds a connection is kept open across requests (0 closes it after each request)
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+
+if DB_ENGINE == 'postgresql':
+    # psycopg connection pool (Django 5.1+, needs psycopg[pool]); replaces CONN_MAX_AGE
+    DB_POOL = config('DB_POOL', default=False, cast=bool)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='zenvio'),
+            'USER': config('DB_USER', default=''),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default=''),
+            'PORT': config('DB_PORT', default=''),
+            'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                    'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+                    'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    # WAL lets readers run alongside the single writer; synchronous=NORMAL is
+    # durable under WAL except for the last commits on power loss.
+    # Transactions start with BEGIN IMMEDIATE so a writer waits for the lock
+    # (busy_timeout) up front instead of failing with "database is locked"
+    # when a read transaction tries to upgrade.
+    SQLITE_PRAGMAS = {
+        'journal_mode': config('DB_SQLITE_JOURNAL_MODE', default='WAL'),
+        'synchronous': config('DB_SQLITE_SYNCHRONOUS', default='NORMAL'),
+        'busy_timeout': config('DB_SQLITE_BUSY_TIMEOUT', default=5000, cast=int),  # ms
+        'cache_size': -config('DB_SQLITE_CACHE_SIZE', default=64000, cast=int),  # KiB
+        'mmap_size': config('DB_SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),  # bytes
+        'temp_store': 'MEMORY',
+    }
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+                'transaction_mode': config('DB_SQLITE_TRANSACTION_MODE', default='IMMEDIATE'),
+            },
+        }
+    }
+
+# Read replicas (see zenvio/routers.py): the hosts (PostgreSQL) or database
+# files (SQLite, e.g. a copy of db.sqlite3 to try it out) of copies of the
+# default database, added as the aliases replica1, replica2, ...
+DB_REPLICAS = config('DB_REPLICAS', default='', cast=Csv())
+DB_REPLICA_ALIASES = []
+for index, replica in enumerate(DB_REPLICAS, 1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST' if DB_ENGINE == 'postgresql' else 'NAME': replica,
+        # Tests read the test database instead
+        'TEST': {'MIRROR': 'default'},
+    }
+    DB_REPLICA_ALIASES.append(f'replica{index}')
+DATABASE_ROUTERS = ['zenvio.routers.ReplicaRouter']
+# Views whose GET requests read from a replica
+DB_REPLICA_VIEWS = [
+    'home',
+    'contacts:contact_list',
+    'contacts:contact_detail',
+    'contacts:contact_export',
+]
+# Seconds a browser reads from the primary after one of its requests wrote, so
+# it sees its writes; keep it above the replicas' lag
+DB_REPLICA_PIN_SECONDS = config('DB_REPLICA_PIN_SECONDS', default=10, cast=int)
+
+# Cache
+# locmem by default; CACHE_BACKEND=file shares entries between worker processes
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': config(
+            'CACHE_LOCATION',
+            default=os.path.join(tempfile.gettempdir(), 'zenvio-cache') if CACHE_BACKEND == 'file' else 'zenvio',
+        ),
     }
 }
 
@@ -123,8 +227,26 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles_build' / 'static'
 
-# WhiteNoise configuration for efficient static file serving
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # Built by collectstatic: fingerprinted, gzip and Brotli variants, project
+    # stylesheets minified and purged (see contacts/assets.py); served by WhiteNoise
+    'staticfiles': {
+        'BACKEND': 'contacts.assets.AssetStorage',
+    },
+}
+# Stylesheets collectstatic minifies, purges of selectors no template uses and
+# extracts critical CSS from, inlined by {% stylesheet %}
+ASSET_BUILD_CSS = ['css/styles.css']
+# Classes only scripts add (Bootstrap's), kept when purging
+ASSET_PURGE_SAFELIST = ['show', 'showing', 'hiding', 'collapsing']
+# Templates a page renders from Python (render_to_string) rather than with
+# {% include %}, which its critical CSS must cover too
+ASSET_PAGE_PARTIALS = {
+    'contacts/contact_list.html': ['contacts/_contact_card.html'],  # contacts.render_cache.CARD_TEMPLATE
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -135,6 +257,22 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
+# Sessions: 'db' (a query per request), 'cached_db' (the cache in front of the
+# table), 'cache' (the cache only) or 'signed_cookies' (no storage; the session
+# is a signed, readable cookie). The cache engines need a cache shared by all
+# workers (CACHE_BACKEND=file): with locmem a session only exists in one process.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[config('SESSION_BACKEND', default='db')]
+# Seconds a worker reuses a logged-in user instead of loading it per request
+# (see accounts/middleware.py); a password change or deactivation reaches other
+# workers within this time. 0 disables the cache.
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=0, cast=int)
+
 # Authentication Settings
 LOGIN_URL = 'accounts:login'
 LOGIN_REDIRECT_URL = 'contacts:contact_list'
@@ -152,3 +290,71 @@ MESSAGE_TAGS = {
     messages.WARNING: 'warning',
     messages.ERROR: 'danger',
 }
+
+# Contacts
+# Rows written per bulk_create call during CSV import
+CONTACTS_IMPORT_BATCH_SIZE = config('CONTACTS_IMPORT_BATCH_SIZE', default=1000, cast=int)
+# How uploads are imported: 'thread' (background thread pool in the web process),
+# 'queue' (left for `manage.py run_import_worker`) or 'sync' (inside the request).
+# 'sync' on Vercel (which sets VERCEL): threads stop when the response is sent,
+# and a worker can't read uploads saved in another instance's /tmp.
+CONTACTS_IMPORT_MODE = config('CONTACTS_IMPORT_MODE', default='sync' if config('VERCEL', default='') else 'thread')
+CONTACTS_IMPORT_WORKERS = config('CONTACTS_IMPORT_WORKERS', default=2, cast=int)
+# Running jobs without progress for this many seconds are taken to have died
+# with their process and are requeued (see contacts/jobs.py)
+CONTACTS_IMPORT_STALE_AFTER = config('CONTACTS_IMPORT_STALE_AFTER', default=600, cast=int)
+# Applies to the uncompressed content of gzip uploads too
+CONTACTS_IMPORT_MAX_FILE_SIZE = config('CONTACTS_IMPORT_MAX_FILE_SIZE', default=5 * 1024 * 1024, cast=int)
+# What an import does with rows matching an existing contact by phone/email:
+# 'skip', 'update', 'merge' or 'create' (see contacts/dedup.py)
+CONTACTS_IMPORT_DUPLICATES = config('CONTACTS_IMPORT_DUPLICATES', default='skip')
+# Prefixed to 10-digit national numbers when normalizing phones for matching
+CONTACTS_DEFAULT_COUNTRY_CODE = config('CONTACTS_DEFAULT_COUNTRY_CODE', default='1')
+# Uploaded files waiting to be imported; must be shared with the worker
+CONTACTS_IMPORT_ROOT = config('CONTACTS_IMPORT_ROOT', default=os.path.join(tempfile.gettempdir(), 'zenvio-imports'))
+# Stream exports instead of buffering them (disable on hosts without streaming support)
+CONTACTS_EXPORT_STREAMING = config('CONTACTS_EXPORT_STREAMING', default=True, cast=bool)
+CONTACTS_EXPORT_CHUNK_SIZE = config('CONTACTS_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+# Gzip exports on the wire for clients sending Accept-Encoding: gzip (disable
+# when a proxy in front already compresses responses)
+CONTACTS_EXPORT_GZIP = config('CONTACTS_EXPORT_GZIP', default=True, cast=bool)
+# Delta sync (contacts/sync.py): a sync covers writes up to this many seconds
+# ago, so transactions still committing are picked up by the next sync
+CONTACTS_SYNC_SETTLE_SECONDS = config('CONTACTS_SYNC_SETTLE_SECONDS', default=10, cast=int)
+# Deleted contacts are reported to sync clients for this long; older tokens
+# need a full sync. Prune with `manage.py prune_sync_tombstones`.
+CONTACTS_SYNC_TOMBSTONE_DAYS = config('CONTACTS_SYNC_TOMBSTONE_DAYS', default=30, cast=int)
+# Contact list pagination: 'page' (numbered pages) or 'cursor' (keyset, no COUNT)
+CONTACTS_LIST_PAGINATION = config('CONTACTS_LIST_PAGINATION', default='page')
+# Serve the list, detail, favorite, export, suggest and read API views with async views
+# (contacts/async_views.py). Enable only when running under ASGI (uvicorn).
+CONTACTS_ASYNC_VIEWS = config('CONTACTS_ASYNC_VIEWS', default=False, cast=bool)
+# Per-user contact counters (see contacts/stats.py); only cached when the cache is
+# shared between processes (CACHE_BACKEND=file), otherwise read from the database
+CONTACTS_STATS_CACHE = 'default'
+CONTACTS_STATS_TIMEOUT = config('CONTACTS_STATS_TIMEOUT', default=3600, cast=int)
+# Rendered contact cards and list pages (see contacts/render_cache.py). Pages are
+# cached per user until the next write to their contacts; 0 disables the page cache.
+CONTACTS_RENDER_CACHE = 'default'
+CONTACTS_CARD_CACHE_TIMEOUT = config('CONTACTS_CARD_CACHE_TIMEOUT', default=24 * 3600, cast=int)
+CONTACTS_PAGE_CACHE_TIMEOUT = config('CONTACTS_PAGE_CACHE_TIMEOUT', default=300, cast=int)
+# Search box typeahead (see contacts/suggest.py): suggestions per request, and
+# prefix results kept per process
+CONTACTS_SUGGEST_LIMIT = config('CONTACTS_SUGGEST_LIMIT', default=8, cast=int)
+CONTACTS_SUGGEST_CACHE_SIZE = config('CONTACTS_SUGGEST_CACHE_SIZE', default=5000, cast=int)
+# The admin's unfiltered contact list shows the database's row estimate instead
+# of counting the table once it has at least this many rows (see contacts/admin.py)
+CONTACTS_ADMIN_ESTIMATED_COUNT_MIN = config('CONTACTS_ADMIN_ESTIMATED_COUNT_MIN', default=100000, cast=int)
+# Part of the list, detail and home pages' ETags (contacts/conditional.py), so
+# browsers refetch pages after a deploy; Vercel provides the commit SHA
+CONTACTS_RELEASE = config('CONTACTS_RELEASE', default=config('VERCEL_GIT_COMMIT_SHA', default=''))
+# Request instrumentation (see contacts/instrumentation.py): per-view query counts
+# and timings, reported at /contacts/perf/ (staff) and by `manage.py perf_report`
+CONTACTS_PERF_ENABLED = config('CONTACTS_PERF_ENABLED', default=False, cast=bool)
+# Add a Server-Timing header (db, tpl, view, total) to every response
+CONTACTS_PERF_SERVER_TIMING = config('CONTACTS_PERF_SERVER_TIMING', default=False, cast=bool)
+# Seconds between writes of each process's stats to the cache
+CONTACTS_PERF_FLUSH_INTERVAL = config('CONTACTS_PERF_FLUSH_INTERVAL', default=10, cast=int)
+# `manage.py perf_report` reads the stats from this cache, so it needs a shared
+# backend (CACHE_BACKEND=file); with locmem only /contacts/perf/ works
+CONTACTS_PERF_CACHE = 'default'
@@ -1,33 +1,43 @@
 """
 ZENVIO URL Configuration
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 from django.views.generic import TemplateView
-from contacts.models import Contact
 from django.utils import timezone
-from datetime import timedelta
+from contacts import render_cache
+from contacts.conditional import ConditionalGetMixin, page_validators
+from contacts.stats import get_contact_stats, start_of_day
 
 
-class HomeView(TemplateView):
-    """Home page view with real user stats."""
+class HomeView(ConditionalGetMixin, TemplateView):
+    """
+    Home page view with real user stats.
+    Answers conditional GETs from the user's last-write marker.
+    """
     template_name = 'home.html'
     
+    def get(self, request, *args, **kwargs):
+        return self.conditional_render(self.get_validators(), **kwargs)
+    
+    def get_validators(self):
+        if not self.request.user.is_authenticated or render_cache.has_pending_messages(self.request):
+            return None
+        version = render_cache.list_version(self.request.user.pk)
+        # "Recent" counts the last few days, so the page also changes daily
+        today = timezone.localdate()
+        modified = max(render_cache.version_time(version), start_of_day(today))
+        return page_validators(self.request, version, today.isoformat(), modified=modified)
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
         if self.request.user.is_authenticated:
-            user_contacts = Contact.objects.filter(user=self.request.user)
-            
-            # Total contacts count
-            context['total_contacts'] = user_contacts.count()
-            
-            # Recent contacts (last 7 days)
-            week_ago = timezone.now() - timedelta(days=7)
-            context['recent_contacts'] = user_contacts.filter(created_at__gte=week_ago).count()
-            
-            # Unique companies as "groups"
-            context['groups_count'] = user_contacts.exclude(company='').values('company').distinct().count()
+            # From the stats cache, or one lookup of the per-user counters row
+            stats = get_contact_stats(self.request.user)
+            context['total_contacts'] = stats['total']
+            context['recent_contacts'] = stats['recent']
+            context['groups_count'] = stats['companies']
         else:
             context['total_contacts'] = 0
             context['recent_contacts'] = 0
@@ -37,8 +47,12 @@ class HomeView(TemplateView):
 
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('', HomeView.as_view(), name='home'),
     path('accounts/', include('accounts.urls')),
     path('contacts/', include('contacts.urls')),
 ]
+
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
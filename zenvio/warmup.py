@@ -0,0 +1,104 @@
+"""
+Cold start warm-up for the WSGI and ASGI entry points.
+
+A serverless function (vercel.json runs zenvio/wsgi.py) imports its entry
+point once per instance and then serves requests. Django does part of its
+start-up lazily, on the first request: importing the URLconf, the views and
+the modules named in settings (session serializer, message storage, cache
+backend, context processors, the SQL compiler), building the URL resolvers
+reverse() uses, importing every installed template tag library and
+compiling templates. ``warm_up()`` does that work while the entry point is
+imported, which the platform runs before the first request is handed over,
+so the first request costs about what the following ones do.
+
+Templates are compiled into the cached template loader (Django's default
+loaders), which keeps them for the life of the process. Nothing is read
+from the database: a connection opened here could end up shared by the
+workers of a server that forks after importing the application.
+
+The entry points disable garbage collection while they import: start-up
+creates hundreds of thousands of long-lived objects, which the collector
+would otherwise scan several times over. ``warm_start()`` then freezes
+them (``gc.freeze()``), so the collections run while serving requests don't
+scan them either, and turns collection back on.
+"""
+import gc
+import logging
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template import engines
+from django.template.loader import get_template
+from django.urls import get_resolver, reverse
+from django.utils import formats
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+# What the contact list, detail and home pages render, and the URLs they link to
+HOT_TEMPLATES = [
+    'base.html',
+    'home.html',
+    'contacts/contact_list.html',
+    'contacts/_contact_card.html',
+    'contacts/contact_detail.html',
+]
+HOT_URLS = [
+    ('home', []),
+    ('accounts:login', []),
+    ('accounts:logout', []),
+    ('accounts:register', []),
+    ('contacts:contact_list', []),
+    ('contacts:contact_create', []),
+    ('contacts:contact_export', []),
+    ('contacts:contact_import', []),
+    ('contacts:contact_suggest', []),
+    ('contacts:contact_bulk', []),
+    ('contacts:contact_detail', [1]),
+    ('contacts:contact_update', [1]),
+    ('contacts:contact_delete', [1]),
+    ('contacts:toggle_favorite', [1]),
+]
+
+
+def import_request_modules():
+    """Import the modules Django only loads when a request first needs them."""
+    import_module(settings.SESSION_ENGINE)
+    import_string(settings.SESSION_SERIALIZER)
+    import_string(settings.MESSAGE_STORAGE)
+    for alias in settings.CACHES:
+        caches[alias]
+    for alias in connections:
+        connections[alias].ops.compiler('SQLCompiler')
+    for engine in engines.all():
+        engine.engine.template_context_processors
+    formats.get_format('DATETIME_FORMAT')
+
+
+def warm_up():
+    """Do the first request's one-time work now. Returns the seconds it took."""
+    start = time.perf_counter()
+    get_resolver().reverse_dict
+    for name, args in HOT_URLS:
+        # Also builds the namespace's resolver and compiles the pattern
+        reverse(name, args=args)
+    import_request_modules()
+    for name in HOT_TEMPLATES:
+        get_template(name)
+    return time.perf_counter() - start
+
+
+def warm_start():
+    """
+    Warm up when WARM_START is on and re-enable garbage collection, which
+    the entry points disabled while importing.
+    """
+    if settings.WARM_START:
+        elapsed = warm_up()
+        gc.freeze()
+        logger.info('Warmed up in %.1f ms.', elapsed * 1000)
+    gc.enable()
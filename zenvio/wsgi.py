@@ -7,10 +7,19 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
+# Start-up creates long-lived objects rather than garbage; warm_start() re-enables this
+gc.disable()
+
 from django.core.wsgi import get_wsgi_application
 
+from zenvio.warmup import warm_start
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zenvio.settings')
 
 application = get_wsgi_application()
+
+# Cold start work done before the first request; see zenvio/warmup.py
+warm_start()